@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+HNM Bench - Offline benchmark for the local and remote HNM bots
+
+Puts stub versions of the system tools the bots call (df, lscpu, ps, sar,
+journalctl, multipath, ssh, ...) first on PATH, with a configurable latency
+and output size, then drives the bot collectors non-interactively and
+reports per-collector, per-command and end-to-end full_report timings plus
+peak memory. Needs nothing but a POSIX shell and coreutils, no network.
+
+Usage:
+    python3 benchmarks/hnm_bench.py
+    python3 benchmarks/hnm_bench.py --bot local --repeat 5 --workers 8
+    python3 benchmarks/hnm_bench.py --latency 0.02 --slow multipath=2 --slow sar=1
+    python3 benchmarks/hnm_bench.py --output-size 65536 --json bench.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOTS = {
+    'local': (os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py'), 'Hnm_Linux_Bot'),
+    'remote': (os.path.join(ROOT, 'hnm_remote_bot_production', 'hnm_remote_bot.py'), 'Hnm_Remote_Bot'),
+}
+
+# Tools replaced by stubs; everything else (sh, cat, grep, head, ...) stays real
+STUB_TOOLS = (
+    'df', 'free', 'uptime', 'who', 'last', 'lastb', 'lscpu', 'ps', 'top', 'sar',
+    'journalctl', 'systemctl', 'chkconfig', 'service', 'ip', 'ifconfig', 'route',
+    'ss', 'netstat', 'ufw', 'firewall-cmd', 'rcSuSEfirewall2', 'iptables', 'apt',
+    'apt-get', 'zypper', 'dnf', 'yum', 'uname', 'hostname', 'dmidecode', 'hponcfg',
+    'ipmitool', 'lsblk', 'pvs', 'vgs', 'lvs', 'iscsiadm', 'sanlun', 'multipath',
+    'nisdomainname', 'ntpq', 'chronyc', 'crontab', 'pcs', 'crm', 'cmviewcl',
+    'hastatus',
+)
+
+# Collectors that run without prompting for input
+COLLECTORS = (
+    'disk', 'memory', 'cpu', 'processes', 'users', 'services', 'network', 'logs',
+    'uptime', 'ports', 'firewall', 'updates', 'system', 'lvm', 'netconfig',
+    'userconfig', 'samba', 'cluster', 'performance',
+)
+
+STUB_SCRIPT = """#!/bin/sh
+sleep {latency}
+cat '{payload}'
+"""
+
+# Runs the "remote" command locally, so remote collectors hit the same stubs
+SSH_STUB_SCRIPT = """#!/bin/sh
+sleep {latency}
+for arg; do
+    case "$arg" in
+        -O|-N) exit 0 ;;
+    esac
+done
+for last; do :; done
+exec /bin/sh -c "$last"
+"""
+
+
+def write_stubs(directory, latency, slow, output_size, ssh_latency):
+    """Create the stub binaries and their canned output in directory"""
+    for tool in STUB_TOOLS:
+        payload = os.path.join(directory, tool + '.out')
+        line = f"{tool} stub output line for benchmarking hnm bots\n"
+        with open(payload, 'w') as f:
+            f.write((line * (output_size // len(line) + 1))[:output_size])
+        path = os.path.join(directory, tool)
+        with open(path, 'w') as f:
+            f.write(STUB_SCRIPT.format(latency=slow.get(tool, latency), payload=payload))
+        os.chmod(path, 0o755)
+    path = os.path.join(directory, 'ssh')
+    with open(path, 'w') as f:
+        f.write(SSH_STUB_SCRIPT.format(latency=ssh_latency))
+    os.chmod(path, 0o755)
+
+
+def load_bot(kind):
+    """Import a bot script by path and return its class"""
+    path, class_name = BOTS[kind]
+    spec = importlib.util.spec_from_file_location(f"hnm_bench_{kind}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, class_name)
+
+
+def make_bot(kind, workers):
+    bot = load_bot(kind)(workers=workers)
+    if kind == 'local':
+        return bot
+    bot.remote_host = 'bench-host'
+    bot.remote_user = 'bench'
+    bot.connected = True
+    return bot
+
+
+def reset(bot, state_dir):
+    """Drop anything that would make a repeat run cheaper than the first"""
+    # Result and file caches
+    for name in ('cache', 'files'):
+        cache = getattr(bot, name, None)
+        if cache is not None:
+            cache.clear()
+    # Rebuilt on first use: process table snapshot, capability index, log
+    # cursors, measured bandwidth (remote compression)
+    for name in ('_process_snapshot', '_capabilities', '_log_follower', 'bandwidth'):
+        if hasattr(bot, name):
+            setattr(bot, name, None)
+    # Persisted between runs: log cursors and the report archive
+    shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def summarize(samples):
+    return {
+        'runs': len(samples),
+        'min_s': round(min(samples), 4),
+        'median_s': round(statistics.median(samples), 4),
+        'max_s': round(max(samples), 4),
+    }
+
+
+def bench_collectors(bot, repeat, state_dir):
+    results = {}
+    for name in COLLECTORS:
+        if name not in bot.commands:
+            continue
+        samples = []
+        for _ in range(repeat):
+            reset(bot, state_dir)
+            started = time.perf_counter()
+            bot.commands[name]()
+            samples.append(time.perf_counter() - started)
+        results[name] = summarize(samples)
+    return results
+
+
+def bench_full_report(bot, repeat, workdir, state_dir):
+    samples = []
+    peak_python = 0
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            for _ in range(repeat):
+                reset(bot, state_dir)
+                tracemalloc.start()
+                started = time.perf_counter()
+                with redirect_stdout(devnull):
+                    bot.full_report()
+                samples.append(time.perf_counter() - started)
+                peak_python = max(peak_python, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+    finally:
+        os.chdir(cwd)
+    result = summarize(samples)
+    result['peak_python_bytes'] = peak_python
+    return result
+
+
+def run_bench(kind, args, workdir, state_dir):
+    bot = make_bot(kind, args.workers)
+    collectors = bench_collectors(bot, args.repeat, state_dir)
+    full_report = bench_full_report(bot, args.repeat, workdir, state_dir)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'bot': kind,
+        'collectors': collectors,
+        'full_report': full_report,
+        'commands': bot.stats.rows(),
+        'peak_rss_kb': usage.ru_maxrss,
+    }
+
+
+def render(result, top):
+    output = f"=== {result['bot']} bot ===\n"
+    output += f"\n# Collectors (seconds)\n{'COLLECTOR':<14}{'MIN':>9}{'MEDIAN':>9}{'MAX':>9}\n"
+    for name, row in result['collectors'].items():
+        output += f"{name:<14}{row['min_s']:>9.3f}{row['median_s']:>9.3f}{row['max_s']:>9.3f}\n"
+    report = result['full_report']
+    output += "\n# full_report\n"
+    output += f"runs: {report['runs']}  min: {report['min_s']:.3f}s  median: {report['median_s']:.3f}s  "
+    output += f"max: {report['max_s']:.3f}s\n"
+    output += f"peak Python allocations: {report['peak_python_bytes'] / 1024:.0f} KiB  "
+    output += f"peak RSS: {result['peak_rss_kb'] / 1024:.1f} MiB\n"
+    output += f"\n# Slowest commands (by p90, ms)\n{'COUNT':>6}{'P50':>9}{'P90':>9}{'MAX':>9}  COMMAND\n"
+    for row in sorted(result['commands'], key=lambda r: r['p90_ms'], reverse=True)[:top]:
+        output += f"{row['count']:>6}{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['max_ms']:>9.1f}  {row['command'][:70]}\n"
+    return output
+
+
+def parse_slow(values):
+    slow = {}
+    for value in values:
+        tool, _, seconds = value.partition('=')
+        try:
+            slow[tool] = float(seconds)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"--slow expects TOOL=SECONDS, got '{value}'")
+    return slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the HNM bots")
+    parser.add_argument('--bot', choices=('local', 'remote', 'both'), default='both')
+    parser.add_argument('--repeat', type=int, default=3, help="runs per collector and full_report")
+    parser.add_argument('--latency', type=float, default=0.01, help="seconds every stub tool sleeps")
+    parser.add_argument('--slow', action='append', default=[], metavar='TOOL=SECONDS',
+                        help="per-tool latency override, may be repeated")
+    parser.add_argument('--ssh-latency', type=float, default=0.05, help="seconds the ssh stub adds per call")
+    parser.add_argument('--output-size', type=int, default=2048, help="bytes each stub tool prints")
+    parser.add_argument('--workers', type=int, default=None, help="concurrent commands (ssh sessions for the remote bot) per full_report")
+    parser.add_argument('--top', type=int, default=10, help="slowest commands to list")
+    parser.add_argument('--json', metavar='FILE', help="also write the results as JSON")
+    args = parser.parse_args(argv)
+    slow = parse_slow(args.slow)
+
+    stubdir = tempfile.mkdtemp(prefix='hnm-bench-')
+    try:
+        write_stubs(stubdir, args.latency, slow, args.output_size, args.ssh_latency)
+        os.environ['PATH'] = stubdir + os.pathsep + os.environ.get('PATH', os.defpath)
+        workdir = os.path.join(stubdir, 'reports')
+        os.mkdir(workdir)
+        # Archives and log cursors go to the stub directory, not ~/.hnm_bot
+        # (the bots read this when they are loaded)
+        state_dir = os.path.join(stubdir, 'state')
+        os.environ['HNM_STATE_DIR'] = state_dir
+
+        kinds = ('local', 'remote') if args.bot == 'both' else (args.bot,)
+        results = [run_bench(kind, args, workdir, state_dir) for kind in kinds]
+    finally:
+        shutil.rmtree(stubdir, ignore_errors=True)
+
+    for result in results:
+        print(render(result, args.top))
+    if args.json:
+        document = {
+            'generated': datetime.now().isoformat(),
+            'settings': {
+                'repeat': args.repeat,
+                'latency': args.latency,
+                'slow': slow,
+                'ssh_latency': args.ssh_latency,
+                'output_size': args.output_size,
+                'workers': args.workers,
+            },
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"✓ Results saved to: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
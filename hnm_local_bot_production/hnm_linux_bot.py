@@ -4,16 +4,2226 @@ HNM Bot - Interactive assistant for Linux system administration tasks
 
 Built by: Harihar Mishra
 
+Each bot is one self-contained script (it is installed by copying that
+file), so the code both need - the typed records and their parsers,
+CommandEngine, ReportArchive, parse_since - is kept as identical copies
+in the two bots; tests/test_shared_code.py checks that they match.
 """
 
 import subprocess
 import sys
 import os
-from datetime import datetime
+import errno
+import fcntl
+import glob
+import hashlib
+import heapq
+import json
+import pwd
+import re
+import shlex
+import signal
+import socket
+import stat
+import struct
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timedelta
 
-class Hnm_Linux_Bot:
+# Worker pool size for fullreport (override with HNM_BOT_WORKERS, 1 = serial)
+DEFAULT_WORKERS = 8
+
+# Default per-command timeout outside of a report deadline (seconds)
+COMMAND_TIMEOUT = 30
+
+# Command engine: bytes per read from a child's pipes and the most output
+# kept per command (the rest is drained and counted, not stored)
+ENGINE_READ_CHUNK = 64 * 1024
+ENGINE_MAX_OUTPUT = 16 * 1024 * 1024
+
+# Total time budget for fullreport (override with HNM_REPORT_BUDGET, 0 = none)
+DEFAULT_REPORT_BUDGET = 300
+
+# Timeout ceilings per cost class while a report deadline is active (first
+# match wins, seconds). With enough history a command gets a tighter
+# timeout derived from its own p99 latency, never above its ceiling.
+COST_CLASSES = (
+    ('file', r'^cat ', 10),
+    ('fast', r'^(uname|hostname|uptime|who|last|lastb|lsblk|ip|ifconfig|route|crontab|nisdomainname)\b', 15),
+    ('probe', r'', COMMAND_TIMEOUT),
+)
+ADAPTIVE_MIN_SAMPLES = 3
+ADAPTIVE_FACTOR = 4
+ADAPTIVE_MIN_TIMEOUT = 2
+
+# Result cache freshness per command (first match wins, seconds).
+# Commands that match nothing (load, ps, who, logs, ...) are never cached.
+CACHE_POLICIES = (
+    # Static hardware data
+    (r'^(lscpu|dmidecode|hponcfg|ipmitool|cat /proc/cpuinfo)\b', 4 * 3600),
+    # Storage and network layout
+    (r'^(lsblk|df|pvs|vgs|lvs|iscsiadm|sanlun|multipath|ip|ifconfig|route)\b', 60),
+    # Cluster state
+    (r'^(pcs|crm|cmviewcl|hastatus)\b', 30),
+)
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Configuration files read by the collectors are kept until they change
+# (validated by inode, size and mtime); text and filtered views together
+# stay under this many bytes
+FILE_CACHE_MAX_BYTES = 4 * 1024 * 1024
+
+# Latency samples kept per command for the 'stats' percentiles
+STATS_MAX_SAMPLES = 512
+
+# Process table sampling: interval between the two CPU samples (seconds),
+# how long processes/cpu reuse one snapshot and the default top-N size
+PROCESS_SAMPLE_INTERVAL = 0.25
+PROCESS_SNAPSHOT_TTL = 2
+PROCESS_TOP_N = 10
+
+# watch sampler: default interval (override with HNM_WATCH_INTERVAL, 0 = do
+# not start it automatically), history kept and default summary window
+WATCH_INTERVAL = 5
+WATCH_HISTORY_SECONDS = 2 * 3600
+WATCH_DEFAULT_MINUTES = 10
+
+# Where cursors and other state between runs live (override with HNM_STATE_DIR)
+STATE_DIR = os.environ.get("HNM_STATE_DIR") or os.path.expanduser("~/.hnm_bot")
+
+# logs: lines shown, size of the recent error index, bytes read to seed a
+# file seen for the first time and the largest backlog read after a gap
+LOG_STATE_FILE = "log_cursors.json"
+LOG_FILES = {'messages': "/var/log/messages", 'syslog': "/var/log/syslog"}
+LOG_TAIL_LINES = 20
+LOG_ERROR_LINES = 10
+LOG_ERROR_INDEX = 200
+LOG_SEED_BYTES = 1024 * 1024
+LOG_MAX_CATCHUP = 64 * 1024 * 1024
+LOG_CHUNK_BYTES = 1024 * 1024
+LOG_SCAN_CHUNK_BYTES = 256 * 1024
+
+# Lines logs lists as errors: case-insensitive literals, \b anchors allowed
+LOG_ERROR_PATTERNS = ('error', 'fail', r'\boom', 'segfault')
+
+# Report archive: compression of the section blocks (HNM_ARCHIVE_CODEC=lzma
+# compresses harder at more CPU)
+ARCHIVE_DIR = "archive"
+ARCHIVE_CODEC = os.environ.get("HNM_ARCHIVE_CODEC", "gzip")
+
+# ports/network: rows shown in the top local ports / remote addresses lists
+SOCKET_TOP_N = 10
+
+# Output formats for the record-backed commands
+OUTPUT_FORMATS = ('text', 'json', 'ndjson')
+
+# Commands that prompt, exit or need a long-running session, not available to --run
+INTERACTIVE_COMMANDS = ('custom', 'watch', 'exit', 'quit')
+
+# Exit status of the batch mode (--run)
+EXIT_OK = 0
+EXIT_COLLECTOR_FAILED = 1
+EXIT_USAGE = 2
+EXIT_OUTPUT_FAILED = 3
+
+# ----------------------------------------------------------------------
+# Native /proc readers
+#
+# The frequently used collectors (memory, cpu, uptime, performance) read
+# the kernel interfaces directly instead of forking free/uptime/lscpu.
+# Each reader returns a small record; the render_* helpers produce the
+# same text layout as the shell tools.
+# ----------------------------------------------------------------------
+
+class MemInfo:
+    """Parsed /proc/meminfo (values in kB, file order preserved)"""
+    __slots__ = ('fields',)
+    
+    def __init__(self, fields):
+        self.fields = fields
+    
+    def kb(self, key):
+        return self.fields.get(key, (0, ''))[0]
+
+
+class LoadAvg:
+    """Parsed /proc/loadavg"""
+    __slots__ = ('load1', 'load5', 'load15', 'running', 'total', 'last_pid')
+    
+    def __init__(self, load1, load5, load15, running, total, last_pid):
+        self.load1 = load1
+        self.load5 = load5
+        self.load15 = load15
+        self.running = running
+        self.total = total
+        self.last_pid = last_pid
+
+
+class Uptime:
+    """Parsed /proc/uptime (seconds)"""
+    __slots__ = ('seconds', 'idle_seconds')
+    
+    def __init__(self, seconds, idle_seconds):
+        self.seconds = seconds
+        self.idle_seconds = idle_seconds
+
+
+class CpuTimes:
+    """Aggregate CPU jiffies and boot time from /proc/stat"""
+    __slots__ = ('user', 'nice', 'system', 'idle', 'iowait', 'irq',
+                 'softirq', 'steal', 'boot_time')
+    
+    def __init__(self, values, boot_time):
+        values = list(values) + [0] * (8 - len(values))
+        (self.user, self.nice, self.system, self.idle, self.iowait,
+         self.irq, self.softirq, self.steal) = values[:8]
+        self.boot_time = boot_time
+    
+    @property
+    def total(self):
+        return (self.user + self.nice + self.system + self.idle + self.iowait
+                + self.irq + self.softirq + self.steal)
+    
+    @property
+    def busy(self):
+        return self.total - self.idle - self.iowait
+
+
+class CpuInfo:
+    """CPU topology summary from /proc/cpuinfo"""
+    __slots__ = ('model_name', 'cpus', 'threads_per_core', 'cores_per_socket',
+                 'sockets')
+    
+    def __init__(self, model_name, cpus, threads_per_core, cores_per_socket, sockets):
+        self.model_name = model_name
+        self.cpus = cpus
+        self.threads_per_core = threads_per_core
+        self.cores_per_socket = cores_per_socket
+        self.sockets = sockets
+
+
+def parse_meminfo(text):
+    """Parse /proc/meminfo content into a MemInfo record"""
+    fields = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts:
+            fields[key] = (int(parts[0]), parts[1] if len(parts) > 1 else '')
+    return MemInfo(fields)
+
+
+def read_meminfo(path="/proc/meminfo"):
+    """Parse /proc/meminfo into a MemInfo record"""
+    with open(path) as f:
+        return parse_meminfo(f.read())
+
+
+def read_loadavg(path="/proc/loadavg"):
+    """Parse /proc/loadavg into a LoadAvg record"""
+    with open(path) as f:
+        parts = f.read().split()
+    running, total = parts[3].split('/')
+    return LoadAvg(float(parts[0]), float(parts[1]), float(parts[2]),
+                   int(running), int(total), int(parts[4]))
+
+
+def read_uptime(path="/proc/uptime"):
+    """Parse /proc/uptime into an Uptime record"""
+    with open(path) as f:
+        parts = f.read().split()
+    return Uptime(float(parts[0]), float(parts[1]))
+
+
+def read_cpu_times(path="/proc/stat"):
+    """Parse the aggregate cpu line and btime of /proc/stat"""
+    values = None
+    boot_time = 0
+    with open(path) as f:
+        for line in f:
+            if line.startswith("cpu "):
+                values = [int(v) for v in line.split()[1:9]]
+            elif line.startswith("btime "):
+                boot_time = int(line.split()[1])
+    if values is None:
+        raise ValueError("no cpu line in " + path)
+    return CpuTimes(values, boot_time)
+
+
+def read_cpuinfo(path="/proc/cpuinfo"):
+    """Summarise /proc/cpuinfo into a CpuInfo record"""
+    cpus = 0
+    model_name = "unknown"
+    physical_ids = set()
+    siblings = cores = 0
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            key = key.strip()
+            value = value.strip()
+            if key == "processor":
+                cpus += 1
+            elif key in ("model name", "Model Name") and model_name == "unknown":
+                model_name = value
+            elif key == "physical id":
+                physical_ids.add(value)
+            elif key == "siblings" and not siblings:
+                siblings = int(value)
+            elif key == "cpu cores" and not cores:
+                cores = int(value)
+    if not cpus:
+        raise ValueError("no processors in " + path)
+    sockets = len(physical_ids) or 1
+    cores_per_socket = cores or max(1, cpus // sockets)
+    threads_per_core = max(1, (siblings or cores_per_socket) // cores_per_socket)
+    return CpuInfo(model_name, cpus, threads_per_core, cores_per_socket, sockets)
+
+
+def count_logged_in_users(path="/var/run/utmp"):
+    """Count USER_PROCESS entries in utmp (what uptime reports as users)"""
+    record = struct.Struct("hi32s4s32s256shhiii4i20s")
+    users = 0
+    try:
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(record.size)
+                if len(data) < record.size:
+                    break
+                fields = record.unpack(data)
+                if fields[0] == 7 and fields[4].strip(b"\0"):
+                    users += 1
+    except OSError:
+        pass
+    return users
+
+
+def format_size(kb, unit):
+    """Format a kB value like free: 'h' for human readable, 'g'/'m' for fixed units"""
+    if unit == 'g':
+        return str(kb // (1024 * 1024))
+    if unit == 'm':
+        return str(kb // 1024)
+    value = float(kb * 1024)
+    if value < 1024:
+        return "{}B".format(int(value))
+    for suffix in ("Ki", "Mi", "Gi", "Ti", "Pi"):
+        value /= 1024
+        if value < 10:
+            return "{:.1f}{}".format(value, suffix)
+        if value < 1024:
+            return "{}{}".format(int(round(value)), suffix)
+    return "{}Ei".format(int(round(value / 1024)))
+
+
+def render_free(mem, unit='h'):
+    """Render a MemInfo record in the layout of 'free -h' / 'free -g'"""
+    usage = memory_record(mem)
+    
+    def row(label, values):
+        return "{:<8}".format(label) + "".join("{:>12}".format(format_size(v // 1024, unit)) for v in values) + "\n"
+    
+    output = " " * 8 + "".join("{:>12}".format(h) for h in
+                               ("total", "used", "free", "shared", "buff/cache", "available")) + "\n"
+    output += row("Mem:", (usage.total_bytes, usage.used_bytes, usage.free_bytes, usage.shared_bytes,
+                           usage.buff_cache_bytes, usage.available_bytes))
+    output += row("Swap:", (usage.swap_total_bytes, usage.swap_used_bytes, usage.swap_free_bytes))
+    return output
+
+
+def render_meminfo(mem, limit=20):
+    """Render the first lines of /proc/meminfo from a MemInfo record"""
+    lines = []
+    for key, (value, suffix) in list(mem.fields.items())[:limit]:
+        line = "{:<16}{:>8}".format(key + ":", value)
+        if suffix:
+            line += " " + suffix
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def render_uptime(uptime, load, users, now=None):
+    """Render the one-line 'uptime' summary"""
+    now = now or datetime.now()
+    days, rest = divmod(int(uptime.seconds), 86400)
+    hours, minutes = rest // 3600, (rest % 3600) // 60
+    output = " {} up ".format(now.strftime('%H:%M:%S'))
+    if days:
+        output += "{} day{}, ".format(days, "" if days == 1 else "s")
+    if hours:
+        output += "{:2d}:{:02d}, ".format(hours, minutes)
+    else:
+        output += "{} min, ".format(minutes)
+    output += "{:2d} user{},  load average: {:.2f}, {:.2f}, {:.2f}\n".format(
+        users, "" if users == 1 else "s", load.load1, load.load5, load.load15)
+    return output
+
+
+def render_boot_time(times):
+    """Render boot time in the layout of 'who -b'"""
+    boot = datetime.fromtimestamp(times.boot_time)
+    return "         system boot  {}\n".format(boot.strftime('%Y-%m-%d %H:%M'))
+
+
+def render_cpu_summary(cpu):
+    """Render the lscpu lines used by the cpu command"""
+    rows = (
+        ("CPU(s):", cpu.cpus),
+        ("Model name:", cpu.model_name),
+        ("Thread(s) per core:", cpu.threads_per_core),
+        ("Core(s) per socket:", cpu.cores_per_socket),
+        ("Socket(s):", cpu.sockets),
+    )
+    return "".join("{:<41}{}\n".format(label, value) for label, value in rows)
+
+
+# ----------------------------------------------------------------------
+# Structured records
+#
+# Parsed forms of the df, free, ss, ps, lsblk, pvs/vgs/lvs and uptime
+# results, emitted by the json/ndjson output formats.
+# ----------------------------------------------------------------------
+
+class Record:
+    """Base for the typed records behind structured output"""
+    __slots__ = ()
+    kind = 'record'
+    
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+    
+    def to_dict(self):
+        data = {'type': self.kind}
+        for name in self.__slots__:
+            data[name] = getattr(self, name)
+        return data
+
+
+class DiskUsage(Record):
+    __slots__ = ('filesystem', 'fstype', 'size_bytes', 'used_bytes', 'available_bytes',
+                 'use_percent', 'mountpoint')
+    kind = 'disk_usage'
+
+
+class MemoryUsage(Record):
+    __slots__ = ('total_bytes', 'used_bytes', 'free_bytes', 'shared_bytes', 'buff_cache_bytes',
+                 'available_bytes', 'swap_total_bytes', 'swap_used_bytes', 'swap_free_bytes')
+    kind = 'memory'
+
+
+class SocketEntry(Record):
+    __slots__ = ('netid', 'state', 'recv_q', 'send_q', 'local_address', 'local_port',
+                 'peer_address', 'peer_port')
+    kind = 'socket'
+
+
+class ProcessEntry(Record):
+    __slots__ = ('user', 'pid', 'cpu_percent', 'mem_percent', 'vsz_kb', 'rss_kb', 'tty',
+                 'stat', 'start', 'time', 'command')
+    kind = 'process'
+
+
+class BlockDevice(Record):
+    __slots__ = ('name', 'maj_min', 'size_bytes', 'read_only', 'devtype', 'mountpoint')
+    kind = 'block_device'
+
+
+class PhysicalVolume(Record):
+    __slots__ = ('pv_name', 'vg_name', 'fmt', 'attr', 'size_bytes', 'free_bytes')
+    kind = 'lvm_pv'
+
+
+class VolumeGroup(Record):
+    __slots__ = ('vg_name', 'pv_count', 'lv_count', 'attr', 'size_bytes', 'free_bytes')
+    kind = 'lvm_vg'
+
+
+class LogicalVolume(Record):
+    __slots__ = ('lv_name', 'vg_name', 'attr', 'size_bytes', 'pool_lv', 'origin')
+    kind = 'lvm_lv'
+
+
+class UptimeStatus(Record):
+    __slots__ = ('uptime_seconds', 'boot_time', 'users', 'load1', 'load5', 'load15')
+    kind = 'uptime'
+
+
+# Machine friendly variants of the text commands, parsed by the functions below
+DF_RECORDS_CMD = "df -P -T -B1 2>/dev/null"
+SS_RECORDS_CMD = "ss -tuna 2>/dev/null"
+PS_RECORDS_CMD = "ps aux --sort=-%cpu 2>/dev/null"
+LSBLK_RECORDS_CMD = "lsblk -b -P -o NAME,MAJ:MIN,SIZE,RO,TYPE,MOUNTPOINT 2>/dev/null"
+LVM_RECORDS_CMDS = (
+    (PhysicalVolume, "pvs --noheadings --units b --nosuffix --separator '|' "
+                     "-o pv_name,vg_name,pv_fmt,pv_attr,pv_size,pv_free 2>/dev/null"),
+    (VolumeGroup, "vgs --noheadings --units b --nosuffix --separator '|' "
+                  "-o vg_name,pv_count,lv_count,vg_attr,vg_size,vg_free 2>/dev/null"),
+    (LogicalVolume, "lvs --noheadings --units b --nosuffix --separator '|' "
+                    "-o lv_name,vg_name,lv_attr,lv_size,pool_lv,origin 2>/dev/null"),
+)
+
+_LSBLK_PAIR = re.compile(r'([A-Z:_-]+)="([^"]*)"')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_address(address):
+    """Split 'host:port' / '[v6]:port' as printed by ss"""
+    host, _, port = address.rpartition(':')
+    return host.strip('[]'), port
+
+
+def parse_df(text):
+    """Parse 'df -P -T -B1' output into DiskUsage records"""
+    for line in text.splitlines()[1:]:
+        parts = line.split(None, 6)
+        if len(parts) < 7:
+            continue
+        yield DiskUsage(parts[0], parts[1], _to_int(parts[2]), _to_int(parts[3]),
+                        _to_int(parts[4]), _to_int(parts[5].rstrip('%')), parts[6])
+
+
+def parse_ss(text):
+    """Parse 'ss -tuna' output into SocketEntry records"""
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 6 or parts[0] == 'Netid':
+            continue
+        local_address, local_port = _split_address(parts[4])
+        peer_address, peer_port = _split_address(parts[5])
+        yield SocketEntry(parts[0], parts[1], _to_int(parts[2]), _to_int(parts[3]),
+                          local_address, local_port, peer_address, peer_port)
+
+
+def parse_ps(text):
+    """Parse 'ps aux' output into ProcessEntry records"""
+    for line in text.splitlines()[1:]:
+        parts = line.split(None, 10)
+        if len(parts) < 11:
+            continue
+        yield ProcessEntry(parts[0], _to_int(parts[1]), _to_float(parts[2]), _to_float(parts[3]),
+                           _to_int(parts[4]), _to_int(parts[5]), parts[6], parts[7], parts[8],
+                           parts[9], parts[10])
+
+
+def parse_lsblk(text):
+    """Parse 'lsblk -b -P' key="value" output into BlockDevice records"""
+    for line in text.splitlines():
+        fields = dict(_LSBLK_PAIR.findall(line))
+        if 'NAME' not in fields:
+            continue
+        yield BlockDevice(fields['NAME'], fields.get('MAJ:MIN', fields.get('MAJ_MIN')),
+                          _to_int(fields.get('SIZE')), fields.get('RO') == '1', fields.get('TYPE'),
+                          fields.get('MOUNTPOINT') or None)
+
+
+def parse_lvm(text, record_class):
+    """Parse '|' separated pvs/vgs/lvs reports into record_class records"""
+    for line in text.splitlines():
+        parts = [part.strip() for part in line.strip().split('|')]
+        if len(parts) != len(record_class.__slots__):
+            continue
+        values = []
+        for name, part in zip(record_class.__slots__, parts):
+            if name.endswith('_bytes') or name.endswith('_count'):
+                values.append(_to_int(part.split('.')[0]))
+            else:
+                values.append(part or None)
+        yield record_class(*values)
+
+
+def memory_record(mem):
+    """MemoryUsage record from a MemInfo record (same arithmetic as render_free)"""
+    total = mem.kb("MemTotal")
+    free = mem.kb("MemFree")
+    buffers = mem.kb("Buffers")
+    cache = mem.kb("Cached") + mem.kb("SReclaimable")
+    used = total - free - buffers - cache
+    if used < 0:
+        used = total - free
+    available = mem.kb("MemAvailable") if "MemAvailable" in mem.fields else free + buffers + cache
+    swap_total = mem.kb("SwapTotal")
+    swap_free = mem.kb("SwapFree")
+    return MemoryUsage(*(value * 1024 for value in (
+        total, used, free, mem.kb("Shmem"), buffers + cache, available,
+        swap_total, swap_total - swap_free, swap_free)))
+
+
+def write_records(stream, collector, records, fmt, host=None):
+    """Write records as one JSON document or as NDJSON lines"""
+    if fmt == 'ndjson':
+        for record in records:
+            data = record.to_dict()
+            data['collector'] = collector
+            stream.write(json.dumps(data, separators=(',', ':')) + "\n")
+        return
+    document = {
+        'collector': collector,
+        'host': host,
+        'generated': datetime.now().isoformat(),
+        'records': [record.to_dict() for record in records],
+    }
+    stream.write(json.dumps(document, separators=(',', ':')) + "\n")
+
+
+def write_text_result(stream, collector, text, fmt, host=None):
+    """Write the text output of a command that has no records as json/ndjson"""
+    if fmt == 'ndjson':
+        data = {'type': 'text', 'collector': collector, 'output': text}
+    else:
+        data = {'collector': collector, 'host': host, 'generated': datetime.now().isoformat(),
+                'output': text}
+    stream.write(json.dumps(data, separators=(',', ':')) + "\n")
+
+
+
+# ----------------------------------------------------------------------
+# Native process table
+#
+# One scan of /proc/[pid]/stat and statm replaces the 'ps aux' runs of
+# the processes and cpu commands. CPU% is measured over two samples like
+# top; top-N selection uses a heap, and status/cmdline are only read for
+# the processes that are actually shown.
+# ----------------------------------------------------------------------
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+PS_HEADER = "{:<10} {:>7} {:>4} {:>4} {:>8} {:>7} {:<8} {:<4} {:>5} {:>6} {}\n".format(
+    "USER", "PID", "%CPU", "%MEM", "VSZ", "RSS", "TTY", "STAT", "START", "TIME", "COMMAND")
+# Shown as '?' in command lines like ps does, so an argv cannot break the table
+_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f]')
+
+
+class ProcStat:
+    """Per-process fields from /proc/[pid]/stat and statm"""
+    __slots__ = ('pid', 'comm', 'state', 'tty_nr', 'ticks', 'start_ticks', 'vsz_kb',
+                 'rss_kb', 'cpu_percent')
+    
+    def __init__(self, pid, comm, state, tty_nr, ticks, start_ticks, vsz_kb, rss_kb, cpu_percent=0.0):
+        self.pid = pid
+        self.comm = comm
+        self.state = state
+        self.tty_nr = tty_nr
+        self.ticks = ticks
+        self.start_ticks = start_ticks
+        self.vsz_kb = vsz_kb
+        self.rss_kb = rss_kb
+        self.cpu_percent = cpu_percent
+
+
+def _list_pids(proc):
+    return [int(name) for name in os.listdir(proc) if name.isdigit()]
+
+
+def _read_proc_stat(proc, pid):
+    """(comm, fields after the comm) of /proc/[pid]/stat, None if the process is gone"""
+    try:
+        with open(f"{proc}/{pid}/stat") as f:
+            data = f.read()
+    except OSError:
+        return None
+    head, _, rest = data.rpartition(')')
+    return head.partition('(')[2], rest.split()
+
+
+def scan_processes(interval=PROCESS_SAMPLE_INTERVAL, proc="/proc"):
+    """Sample the process table twice and return a ProcessSnapshot"""
+    first = {}
+    started = time.monotonic()
+    for pid in _list_pids(proc):
+        stat = _read_proc_stat(proc, pid)
+        if stat is not None:
+            fields = stat[1]
+            first[pid] = (int(fields[19]), int(fields[11]) + int(fields[12]))
+    time.sleep(interval)
+    elapsed = time.monotonic() - started
+    
+    processes = []
+    for pid in _list_pids(proc):
+        stat = _read_proc_stat(proc, pid)
+        if stat is None:
+            continue
+        comm, fields = stat
+        try:
+            with open(f"{proc}/{pid}/statm") as f:
+                size, resident = f.read().split()[:2]
+        except OSError:
+            continue
+        start_ticks = int(fields[19])
+        ticks = int(fields[11]) + int(fields[12])
+        previous = first.get(pid)
+        # A pid seen for the first time (or reused) started during the interval
+        base = previous[1] if previous is not None and previous[0] == start_ticks else 0
+        cpu = (ticks - base) * 100.0 / CLK_TCK / elapsed
+        processes.append(ProcStat(pid, comm, fields[0], int(fields[4]), ticks, start_ticks,
+                                  int(size) * PAGE_KB, int(resident) * PAGE_KB, cpu))
+    return ProcessSnapshot(processes, read_meminfo(f"{proc}/meminfo").kb("MemTotal"),
+                           read_cpu_times(f"{proc}/stat").boot_time, proc)
+
+
+def _tty_name(tty_nr):
+    """Controlling terminal name from the encoded tty_nr of /proc/[pid]/stat"""
+    major = (tty_nr >> 8) & 0xfff
+    minor = (tty_nr & 0xff) | ((tty_nr >> 12) & 0xfff00)
+    if 136 <= major <= 143:
+        return "pts/{}".format((major - 136) * 256 + minor)
+    if major == 4:
+        return "tty{}".format(minor) if minor < 64 else "ttyS{}".format(minor - 64)
+    return "?"
+
+
+class ProcessSnapshot:
+    """One sampled process table shared by the processes and cpu commands"""
+    
+    def __init__(self, processes, mem_total_kb, boot_time, proc="/proc"):
+        self.processes = processes
+        self.mem_total_kb = mem_total_kb or 1
+        self.boot_time = boot_time
+        self.proc = proc
+        self.taken_at = time.monotonic()
+        self._users = {}
+    
+    def top(self, key, n=PROCESS_TOP_N):
+        """The n processes with the largest key ('cpu_percent', 'rss_kb')"""
+        return heapq.nlargest(n, self.processes, key=lambda p: getattr(p, key))
+    
+    def entry(self, p):
+        """ProcessEntry for p, reading status and cmdline only now"""
+        uid = None
+        try:
+            with open(f"{self.proc}/{p.pid}/status") as f:
+                for line in f:
+                    if line.startswith("Uid:"):
+                        uid = int(line.split()[1])
+                        break
+        except OSError:
+            pass
+        try:
+            with open(f"{self.proc}/{p.pid}/cmdline", 'rb') as f:
+                command = f.read().rstrip(b"\0").replace(b"\0", b" ").decode(errors='replace')
+            command = _CONTROL_CHARS.sub('?', command)
+        except OSError:
+            command = ""
+        started = datetime.fromtimestamp(self.boot_time + p.start_ticks / CLK_TCK)
+        start = started.strftime('%H:%M') if (datetime.now() - started).days < 1 else started.strftime('%b%d')
+        seconds = p.ticks // CLK_TCK
+        return ProcessEntry(self.user_name(uid), p.pid, round(p.cpu_percent, 1),
+                            round(p.rss_kb * 100.0 / self.mem_total_kb, 1), p.vsz_kb, p.rss_kb,
+                            _tty_name(p.tty_nr), p.state, start,
+                            "{}:{:02d}".format(seconds // 60, seconds % 60),
+                            command or "[{}]".format(p.comm))
+    
+    def user_name(self, uid):
+        if uid is None:
+            return "?"
+        name = self._users.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self._users[uid] = name
+        return name
+
+
+def render_process_table(entries):
+    """Render ProcessEntry records in the layout of 'ps aux'"""
+    output = PS_HEADER
+    for e in entries:
+        output += "{:<10} {:>7} {:>4.1f} {:>4.1f} {:>8} {:>7} {:<8} {:<4} {:>5} {:>6} {}\n".format(
+            e.user[:10], e.pid, e.cpu_percent, e.mem_percent, e.vsz_kb, e.rss_kb, e.tty,
+            e.stat, e.start, e.time, e.command)
+    return output
+
+
+
+# ----------------------------------------------------------------------
+# Continuous sampling (watch)
+#
+# A daemon thread reads /proc/stat, meminfo, diskstats and net/dev every
+# few seconds and keeps derived rates in fixed-size array('d') rings, so
+# CPU/RAM/disk/network history is available without sysstat.
+# ----------------------------------------------------------------------
+
+_DISK_SKIP = re.compile(r'^(loop|ram|sr|fd|zram)\d')
+
+
+class RingBuffer:
+    """Fixed-size history of floats backed by array('d')"""
+    __slots__ = ('data', 'capacity', 'head', 'count')
+    
+    def __init__(self, capacity):
+        self.data = array('d', bytes(8 * capacity))
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+    
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+    
+    def last(self, n):
+        """The last n values, oldest first"""
+        n = min(n, self.count)
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n].tolist()
+        return self.data[start:].tolist() + self.data[:self.head].tolist()
+
+
+def read_diskstats(path="/proc/diskstats"):
+    """{device: (bytes read, bytes written)} for whole disks"""
+    disks = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 10 or _DISK_SKIP.match(parts[2]):
+                continue
+            disks[parts[2]] = (int(parts[5]) * 512, int(parts[9]) * 512)
+    return disks
+
+
+def read_net_dev(path="/proc/net/dev"):
+    """{interface: (bytes received, bytes sent)} without loopback"""
+    interfaces = {}
+    with open(path) as f:
+        for line in f.readlines()[2:]:
+            name, _, counters = line.partition(':')
+            name = name.strip()
+            parts = counters.split()
+            if name == 'lo' or len(parts) < 9:
+                continue
+            interfaces[name] = (int(parts[0]), int(parts[8]))
+    return interfaces
+
+
+class SystemSampler:
+    """Background sampler of CPU, memory, disk and network rates"""
+    
+    def __init__(self, interval=WATCH_INTERVAL, history=WATCH_HISTORY_SECONDS, proc="/proc"):
+        self.interval = interval
+        self.capacity = max(2, int(history / interval))
+        self.proc = proc
+        self.times = RingBuffer(self.capacity)
+        self.series = OrderedDict()
+        self.series['cpu busy %'] = RingBuffer(self.capacity)
+        self.series['memory used %'] = RingBuffer(self.capacity)
+        self.series['swap used %'] = RingBuffer(self.capacity)
+        self.partitions = {}
+        self.samples = 0
+        self.cost = 0.0
+        self.lock = threading.Lock()
+        self._previous = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hnm-watch", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1)
+        self._thread = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except (OSError, ValueError, IndexError):
+                pass
+            self._stop.wait(self.interval)
+    
+    def _whole_disk(self, name):
+        """True for disks, False for partitions (checked once per device)"""
+        whole = self.partitions.get(name)
+        if whole is None:
+            whole = self.partitions[name] = os.path.exists("/sys/block/" + name.replace('/', '!'))
+        return whole
+    
+    def _ring(self, name):
+        ring = self.series.get(name)
+        if ring is None:
+            ring = self.series[name] = RingBuffer(self.capacity)
+        return ring
+    
+    def sample(self):
+        """Read the counters once and append the rates since the previous sample"""
+        started = time.process_time()
+        now = time.time()
+        cpu = read_cpu_times(f"{self.proc}/stat")
+        usage = memory_record(read_meminfo(f"{self.proc}/meminfo"))
+        disks = read_diskstats(f"{self.proc}/diskstats")
+        nets = read_net_dev(f"{self.proc}/net/dev")
+        previous, self._previous = self._previous, (now, cpu, disks, nets)
+        if previous is None:
+            return
+        elapsed = now - previous[0]
+        if elapsed <= 0:
+            return
+        with self.lock:
+            self.times.append(now)
+            total = cpu.total - previous[1].total
+            self.series['cpu busy %'].append((cpu.busy - previous[1].busy) * 100.0 / total if total > 0 else 0.0)
+            self.series['memory used %'].append(usage.used_bytes * 100.0 / (usage.total_bytes or 1))
+            self.series['swap used %'].append(usage.swap_used_bytes * 100.0 / usage.swap_total_bytes
+                                              if usage.swap_total_bytes else 0.0)
+            for name, (read, written) in disks.items():
+                before = previous[2].get(name)
+                if before is None or not self._whole_disk(name):
+                    continue
+                self._ring(f"disk {name} read KiB/s").append(max(0, read - before[0]) / 1024.0 / elapsed)
+                self._ring(f"disk {name} write KiB/s").append(max(0, written - before[1]) / 1024.0 / elapsed)
+            for name, (received, sent) in nets.items():
+                before = previous[3].get(name)
+                if before is None:
+                    continue
+                self._ring(f"net {name} rx KiB/s").append(max(0, received - before[0]) / 1024.0 / elapsed)
+                self._ring(f"net {name} tx KiB/s").append(max(0, sent - before[1]) / 1024.0 / elapsed)
+            self.samples += 1
+            self.cost += time.process_time() - started
+    
+    def window(self, minutes):
+        """{series: values} for the samples of the last minutes"""
+        with self.lock:
+            cutoff = time.time() - minutes * 60
+            times = self.times.last(self.times.count)
+            n = len(times) - next((i for i, t in enumerate(times) if t >= cutoff), len(times))
+            return OrderedDict((name, ring.last(n)) for name, ring in self.series.items())
+    
+    def summary(self, minutes=WATCH_DEFAULT_MINUTES, names=None):
+        """Average and percentiles of every series over the last minutes"""
+        window = self.window(minutes)
+        count = len(window['cpu busy %'])
+        if not count:
+            return f"No watch samples yet (sampling every {self.interval:g}s)\n"
+        output = f"Last {minutes:g} min: {count} samples every {self.interval:g}s\n"
+        output += f"{'METRIC':<32}{'AVG':>10}{'P50':>10}{'P95':>10}{'MAX':>10}\n"
+        for name, values in window.items():
+            if not values or (names is not None and not name.startswith(names)):
+                continue
+            ordered = sorted(values)
+            output += "{:<32}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}\n".format(
+                name[:31], sum(values) / len(values), CommandStats.percentile(ordered, 50),
+                CommandStats.percentile(ordered, 95), ordered[-1])
+        return output
+    
+    def status(self):
+        state = "running" if self.running else "stopped"
+        cost = self.cost / self.samples * 1000 if self.samples else 0.0
+        return (f"Watch {state}: every {self.interval:g}s, {self.times.count}/{self.capacity} samples kept, "
+                f"sampler CPU {cost:.2f} ms/sample\n")
+
+
+
+# ----------------------------------------------------------------------
+# Incremental log following
+#
+# logs only reads what was appended since the previous call: the journal
+# is resumed from its cursor, files from inode + byte offset (finishing a
+# rotated file first). Cursors, the last lines and a bounded index of
+# recent error lines are persisted between runs.
+# ----------------------------------------------------------------------
+
+def compile_patterns(patterns, binary=False):
+    """One case-insensitive regex matching any of patterns (str or bytes)"""
+    pattern = "|".join(patterns)
+    return re.compile(pattern.encode() if binary else pattern, re.I)
+
+
+def scan_recent_matches(path, patterns, count, end=None, chunk=LOG_SCAN_CHUNK_BYTES):
+    """Last count lines of path[:end] matching any of patterns, oldest first
+    
+    The file is memory-mapped and searched backwards chunk by chunk. Lines
+    are located with a substring search for the literal part of each
+    pattern and only those lines are checked against the regex, so the
+    cost depends on how far back the count-th match is, not on file size.
+    """
+    import mmap
+    
+    needles = [p.replace('\\b', '').lower().encode() for p in patterns]
+    confirm = compile_patterns(patterns, binary=True)
+    found = []
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return found
+        try:
+            end = len(mm) if end is None else min(end, len(mm))
+            while end > 0 and len(found) < count:
+                # Chunks start at a line start so no line is split
+                start = mm.rfind(b'\n', 0, max(0, end - chunk)) + 1
+                data = mm[start:end].lower()
+                lines = {}
+                for needle in needles:
+                    pos = data.find(needle)
+                    while pos >= 0:
+                        line_start = data.rfind(b'\n', 0, pos) + 1
+                        line_end = data.find(b'\n', pos)
+                        if line_end < 0:
+                            line_end = len(data)
+                        lines[line_start] = line_end
+                        pos = data.find(needle, line_end)
+                for line_start in sorted(lines, reverse=True):
+                    line = mm[start + line_start:start + lines[line_start]]
+                    if confirm.search(line):
+                        found.append(line)
+                end = start
+        finally:
+            mm.close()
+    return [line.decode('utf-8', 'replace') for line in reversed(found[:count])]
+
+
+class LogFollower:
+    """Follow log files and the journal from persisted cursors"""
+    
+    def __init__(self, state_file, error_patterns=LOG_ERROR_PATTERNS):
+        self.state_file = state_file
+        self.error_patterns = error_patterns
+        self.error_pattern = compile_patterns(error_patterns)
+        try:
+            with open(state_file) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.bytes_read = 0
+    
+    def _load(self, key):
+        entry = self.state.setdefault(key, {})
+        return entry, deque(entry.get('tail', ()), LOG_TAIL_LINES), deque(entry.get('errors', ()), LOG_ERROR_INDEX)
+    
+    @staticmethod
+    def _store(entry, tail, errors):
+        entry['tail'] = list(tail)
+        entry['errors'] = list(errors)
+        return entry['tail'], entry['errors']
+    
+    def _add_lines(self, lines, tail, errors):
+        search = self.error_pattern.search
+        for line in lines:
+            tail.append(line)
+            if search(line):
+                errors.append(line)
+    
+    def save(self):
+        """Write the cursors; a failure only costs a re-read next time"""
+        try:
+            os.makedirs(os.path.dirname(self.state_file), mode=0o700, exist_ok=True)
+            temp = self.state_file + ".tmp"
+            with open(temp, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(temp, self.state_file)
+        except OSError:
+            pass
+    
+    def follow_file(self, path):
+        """(last lines, recent errors) of path after reading only the new bytes"""
+        st = os.stat(path)
+        entry, tail, errors = self._load(path)
+        offset = entry.get('offset')
+        if offset is not None and entry.get('inode') != st.st_ino:
+            rotated = self._find_rotated(path, entry.get('inode'))
+            if rotated is not None:
+                self._read_range(rotated, offset, os.stat(rotated).st_size, tail, errors)
+            offset = 0
+        align = False
+        previous = None
+        if offset is None or offset > st.st_size or st.st_size - offset > LOG_MAX_CATCHUP:
+            # First sight, truncation or a huge backlog: start near the end
+            offset = max(0, st.st_size - LOG_SEED_BYTES)
+            align = offset > 0
+            previous = self._start_reseed(tail, errors)
+        entry['inode'] = st.st_ino
+        entry['offset'] = self._read_range(path, offset, st.st_size, tail, errors, align)
+        if align and len(errors) < LOG_ERROR_LINES:
+            # Not enough errors in the seed window: look further back, up to
+            # the first complete line the seed read kept
+            older = scan_recent_matches(path, self.error_patterns, LOG_ERROR_LINES - len(errors),
+                                        self._next_line(path, offset))
+            # Oldest first, so a full index drops the oldest entries
+            merged = older + list(errors)
+            errors.clear()
+            errors.extend(merged)
+        if previous is not None:
+            self._finish_reseed(previous, tail, errors)
+        return self._store(entry, tail, errors)
+    
+    @staticmethod
+    def _start_reseed(*buffers):
+        """Empty the deques a reseed refills; returns their previous contents"""
+        previous = [list(buffer) for buffer in buffers]
+        for buffer in buffers:
+            buffer.clear()
+        return previous
+    
+    @staticmethod
+    def _finish_reseed(previous, *buffers):
+        """Put back, oldest first, the previous lines the reseed did not read again"""
+        for old, buffer in zip(previous, buffers):
+            seen = set(buffer)
+            merged = [line for line in old if line not in seen] + list(buffer)
+            buffer.clear()
+            buffer.extend(merged)
+    
+    @staticmethod
+    def _next_line(path, offset):
+        """Offset just after the first newline at or after offset (where an aligned read starts)"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                chunk = f.read(LOG_SCAN_CHUNK_BYTES)
+                if not chunk:
+                    return offset
+                cut = chunk.find(b'\n')
+                if cut >= 0:
+                    return offset + cut + 1
+                offset += len(chunk)
+    
+    @staticmethod
+    def _find_rotated(path, inode):
+        """The uncompressed rotated copy of path (syslog.1, messages-20240101) with inode"""
+        directory, name = os.path.split(path)
+        try:
+            candidates = [c for c in os.listdir(directory) if c.startswith(name) and c != name]
+        except OSError:
+            return None
+        for candidate in candidates:
+            if candidate.endswith(('.gz', '.xz', '.bz2', '.zst')):
+                continue
+            candidate = os.path.join(directory, candidate)
+            try:
+                if os.stat(candidate).st_ino == inode:
+                    return candidate
+            except OSError:
+                continue
+        return None
+    
+    def _read_range(self, path, offset, end, tail, errors, align=False):
+        """Feed the complete lines of path[offset:end]; return the offset after the last one"""
+        carry = b''
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while offset < end:
+                chunk = f.read(min(LOG_CHUNK_BYTES, end - offset))
+                if not chunk:
+                    break
+                offset += len(chunk)
+                self.bytes_read += len(chunk)
+                data = carry + chunk
+                if align:
+                    # Starting mid-file: drop the partial first line
+                    cut = data.find(b'\n')
+                    if cut < 0:
+                        carry = b''
+                        continue
+                    data = data[cut + 1:]
+                    align = False
+                stop = data.rfind(b'\n') + 1
+                carry = data[stop:]
+                self._add_lines(data[:stop].decode('utf-8', 'replace').splitlines(), tail, errors)
+        return offset - len(carry)
+    
+    def follow_journal(self, run):
+        """(last lines, recent errors, failures) of the journal
+        
+        run executes a journalctl command line and returns its
+        CommandResult; failures describes the journalctl runs that failed,
+        whose output is not taken for log lines.
+        """
+        entry, tail, errors = self._load('journal')
+        failures = []
+        for key, priority, lines, limit in (('cursor', '', tail, LOG_TAIL_LINES),
+                                            ('error_cursor', '-p err ', errors, LOG_ERROR_LINES)):
+            cursor = entry.get(key)
+            cmd = f"journalctl {priority}--no-pager --show-cursor "
+            cmd += f"--after-cursor={shlex.quote(cursor)}" if cursor else f"-n {limit}"
+            result = run(cmd)
+            output = result.output.splitlines()
+            if result.timed_out or (result.returncode != 0 and any(not line.startswith("-- ") for line in output)):
+                if not result.timed_out:
+                    # E.g. a cursor the journal no longer has: start over next time
+                    entry.pop(key, None)
+                failures.append(f"{cmd}: {output[0] if output else f'exit status {result.returncode}'}")
+                continue
+            previous = None if cursor else self._start_reseed(lines)
+            for line in output:
+                if line.startswith("-- cursor: "):
+                    entry[key] = line[len("-- cursor: "):]
+                elif not line.startswith("-- "):
+                    lines.append(line)
+            if previous is not None:
+                self._finish_reseed(previous, lines)
+        tail, errors = self._store(entry, tail, errors)
+        return tail, errors, failures
+
+
+
+# ----------------------------------------------------------------------
+# Native socket table
+#
+# ports and network stream /proc/net/tcp, tcp6, udp and udp6 line by line
+# into counters instead of running ss/netstat | grep | head. Addresses
+# are kept in their hex form while counting and decoded only for the
+# rows that are shown; socket owners come from an inode -> pid index.
+# ----------------------------------------------------------------------
+
+SOCKET_TABLES = (('tcp', 'net/tcp'), ('tcp', 'net/tcp6'), ('udp', 'net/udp'), ('udp', 'net/udp6'))
+TCP_STATES = {
+    '01': 'ESTAB', '02': 'SYN-SENT', '03': 'SYN-RECV', '04': 'FIN-WAIT-1',
+    '05': 'FIN-WAIT-2', '06': 'TIME-WAIT', '07': 'UNCONN', '08': 'CLOSE-WAIT',
+    '09': 'LAST-ACK', '0A': 'LISTEN', '0B': 'CLOSING',
+}
+
+
+def iter_proc_sockets(proc="/proc"):
+    """(netid, state, local, local port, remote, remote port, inode, send_q, recv_q)
+    per socket, addresses in /proc hex form; raises OSError without /proc/net/tcp"""
+    for netid, table in SOCKET_TABLES:
+        try:
+            f = open(f"{proc}/{table}")
+        except OSError:
+            if table == 'net/tcp':
+                raise
+            continue
+        with f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) < 10:
+                    continue
+                local, _, local_port = parts[1].partition(':')
+                remote, _, remote_port = parts[2].partition(':')
+                send_q, _, recv_q = parts[4].partition(':')
+                yield (netid, TCP_STATES.get(parts[3], parts[3]), local, int(local_port, 16),
+                       remote, int(remote_port, 16), parts[9], int(send_q, 16), int(recv_q, 16))
+
+
+def decode_address(hex_address):
+    """Text form of a /proc/net address (IPv4-mapped IPv6 shown as IPv4)
+    
+    The kernel prints the address as 32-bit words in host byte order.
+    """
+    if len(hex_address) == 8:
+        return socket.inet_ntop(socket.AF_INET, struct.pack('=I', int(hex_address, 16)))
+    words = [int(hex_address[i:i + 8], 16) for i in range(0, 32, 8)]
+    address = socket.inet_ntop(socket.AF_INET6, struct.pack('=4I', *words))
+    if address.startswith('::ffff:') and '.' in address:
+        return address[7:]
+    return address
+
+
+def socket_owners(inodes, proc="/proc"):
+    """{socket inode: 'pid/comm'} for inodes, walking /proc/[pid]/fd until all are found"""
+    wanted = {f"socket:[{inode}]": inode for inode in inodes}
+    owners = {}
+    for pid in _list_pids(proc):
+        if len(owners) == len(wanted):
+            break
+        fd_dir = f"{proc}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                inode = wanted.get(os.readlink(f"{fd_dir}/{fd}"))
+            except OSError:
+                continue
+            if inode is not None and inode not in owners:
+                try:
+                    with open(f"{proc}/{pid}/comm") as f:
+                        owners[inode] = f"{pid}/{f.read().strip()}"
+                except OSError:
+                    owners[inode] = str(pid)
+    return owners
+
+
+class SocketSummary:
+    """Counts by state, local port and remote address from one pass over the tables"""
+    
+    def __init__(self, sockets):
+        self.states = Counter()
+        self.local_ports = Counter()
+        self.remotes = Counter()
+        self.listening = []
+        for netid, state, local, local_port, remote, remote_port, inode, send_q, recv_q in sockets:
+            self.states[(netid, state)] += 1
+            if state == 'LISTEN' or (netid == 'udp' and state == 'UNCONN'):
+                self.listening.append((netid, state, local, local_port, inode, send_q, recv_q))
+            elif state == 'ESTAB':
+                # Established only, like 'ss state established' (not TIME-WAIT, SYN-SENT, ...)
+                self.local_ports[(netid, local_port)] += 1
+                self.remotes[remote] += 1
+        self.listening.sort(key=lambda s: (s[0], s[3]))
+    
+    def render_listening(self, limit=None, owners=True):
+        owner = socket_owners([s[4] for s in self.listening]) if owners else {}
+        output = "{:<6}{:<8}{:>7}{:>7}  {:<40}{}\n".format(
+            "Netid", "State", "Recv-Q", "Send-Q", "Local Address:Port", "Process")
+        for netid, state, local, port, inode, send_q, recv_q in self.listening[:limit]:
+            address = decode_address(local)
+            if ':' in address:
+                address = f"[{address}]"
+            output += "{:<6}{:<8}{:>7}{:>7}  {:<40}{}\n".format(
+                netid, state, recv_q, send_q, f"{address}:{port}", owner.get(inode, '-'))
+        if limit is not None and len(self.listening) > limit:
+            output += f"... {len(self.listening) - limit} more\n"
+        return output
+    
+    def render_states(self):
+        output = ""
+        for (netid, state), count in sorted(self.states.items()):
+            output += "{:<6}{:<12}{:>10}\n".format(netid, state, count)
+        return output or "No sockets\n"
+    
+    def render_talkers(self, top=SOCKET_TOP_N):
+        output = f"# Top local ports ({sum(self.local_ports.values())} connections)\n"
+        output += "{:<6}{:>7}{:>12}\n".format("Netid", "Port", "Count")
+        for (netid, port), count in self.local_ports.most_common(top):
+            output += "{:<6}{:>7}{:>12}\n".format(netid, port, count)
+        output += f"\n# Top remote addresses ({len(self.remotes)} distinct)\n"
+        output += "{:<40}{:>12}\n".format("Address", "Count")
+        for remote, count in self.remotes.most_common(top):
+            output += "{:<40}{:>12}\n".format(decode_address(remote), count)
+        return output
+
+
+
+# ----------------------------------------------------------------------
+# Shell-free collectors
+#
+# A collector is a list of alternatives tried in order like sh's
+# 'a || b || echo fallback'. Each alternative is a Run (an argv command,
+# written as a command line and split with shlex, no shell involved) or a
+# Read (a file, or a glob concatenated like cat, read in-process), plus
+# stages applied in-process instead of '| grep | head' pipelines.
+# ----------------------------------------------------------------------
+
+# Command lines that need a shell; anything else is split and run as argv
+SHELL_SYNTAX = re.compile(r'[|&;<>()$`\\"\'*?\[\]#~{}\n]')
+
+
+def command_line(cmd):
+    """Display/cache key of a command: the shell string or the quoted argv"""
+    if isinstance(cmd, tuple):
+        return " ".join(shlex.quote(arg) for arg in cmd)
+    return cmd
+
+
+def command_argv(cmd):
+    """argv to run cmd with: argv tuples as they are, shell syntax through sh"""
+    if isinstance(cmd, tuple):
+        return list(cmd)
+    if SHELL_SYNTAX.search(cmd):
+        return ["/bin/sh", "-c", cmd]
+    return shlex.split(cmd)
+
+
+def head(n):
+    """Stage keeping the first n lines (head -n)"""
+    stage = lambda lines: lines[:n]
+    stage.key = ('head', n)
+    return stage
+
+
+def tail(n):
+    """Stage keeping the last n lines (tail -n)"""
+    stage = lambda lines: lines[-n:] if n else []
+    stage.key = ('tail', n)
+    return stage
+
+
+def grep(pattern, invert=False, ignore_case=False):
+    """Stage keeping the lines matching a regular expression (grep -E, -v, -i)
+    
+    As the last stage it also decides success: nothing left counts as a
+    failure, so the next alternative is tried.
+    """
+    regex = re.compile(pattern, re.I if ignore_case else 0)
+    def stage(lines):
+        return [line for line in lines if bool(regex.search(line)) != invert]
+    stage.key = ('grep', pattern, invert, ignore_case)
+    stage.filters = True
+    return stage
+
+
+# grep -v '#'
+drop_comments = grep('#', invert=True)
+
+
+class Run:
+    """An argv command plus in-process stages"""
+    __slots__ = ('argv', 'stages')
+    
+    def __init__(self, command, *stages):
+        self.argv = tuple(shlex.split(command))
+        self.stages = stages
+
+
+class Read:
+    """A file (or a glob, concatenated in name order) plus in-process stages"""
+    __slots__ = ('path', 'stages')
+    
+    def __init__(self, path, *stages):
+        self.path = path
+        self.stages = stages
+
+
+def apply_stages(text, stages):
+    """text run through stages; None if a final filter left nothing"""
+    if not stages:
+        return text
+    lines = text.splitlines(True)
+    for stage in stages:
+        lines = stage(lines)
+    if not lines and getattr(stages[-1], 'filters', False):
+        return None
+    return "".join(lines)
+
+
+
+# ----------------------------------------------------------------------
+# Report archive
+#
+# Every fullreport is appended to a per-host archive: one compressed block
+# per distinct section text in reports.dat, and a line per (report,
+# section) in index.jsonl with the block's offset and length. A section
+# that did not change references the earlier block, and reading one
+# section of one report decompresses just that block. diff and history
+# work from the index.
+# ----------------------------------------------------------------------
+
+def archive_codec(name):
+    """(compress, decompress) of an archive codec, imported on first use
+    
+    Raises ImportError for an unknown codec or lzma on a Python built
+    without liblzma.
+    """
+    if name == 'gzip':
+        import gzip
+        return gzip.compress, gzip.decompress
+    if name == 'lzma':
+        import lzma
+        return lzma.compress, lzma.decompress
+    raise ImportError(f"unknown archive codec '{name}'")
+
+
+def parse_since(value):
+    """datetime for '30d', '12h', '2w', '45m' or a YYYY-MM-DD date"""
+    match = re.match(r'^(\d+)([mhdw])$', value)
+    if match:
+        unit = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}[match.group(2)]
+        return datetime.now() - timedelta(**{unit: int(match.group(1))})
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+class ReportArchive:
+    """Append-only compressed archive of the report sections of one host
+    
+    Sections rendered by another collector than the shell commands (the
+    remote python agent) are tagged with it; diff never compares versions
+    from different collectors, whose layouts differ.
+    """
+    
+    def __init__(self, root, host, codec=ARCHIVE_CODEC):
+        self.host = host
+        self.root = os.path.join(root, host)
+        self.data_file = os.path.join(self.root, "reports.dat")
+        self.index_file = os.path.join(self.root, "index.jsonl")
+        try:
+            archive_codec(codec)
+            self.codec = codec
+        except ImportError:
+            self.codec = 'gzip'
+        self.entries = []
+        self.blocks = {}
+        self._index_read = 0
+        self._read_index()
+    
+    def _read_index(self):
+        """Load the index entries appended since the last read"""
+        try:
+            with open(self.index_file, 'rb') as f:
+                f.seek(self._index_read)
+                lines = f.read()
+        except OSError:
+            return
+        self._index_read += len(lines)
+        for line in lines.splitlines():
+            try:
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue  # torn write at the end of the index
+            self.entries.append(entry)
+            self.blocks[entry['sha256']] = entry
+    
+    def save(self, generated, sections, collectors=None):
+        """Append a report; returns (snapshot, number of newly stored sections)
+        
+        sections is an iterable of (name, text), each stored as it comes
+        (a generator need not hold the whole report). collectors maps
+        section names to their collector when not 'shell'.
+        """
+        collectors = collectors or {}
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        stamp = generated.isoformat(timespec='seconds')
+        compress = archive_codec(self.codec)[0]
+        entries = []
+        new = 0
+        # Blocks first, index last: an interrupted save leaves no dangling entries.
+        # Other processes may save reports of the same host, so every append
+        # holds an exclusive flock on the data file
+        with open(self.data_file, 'ab') as data:
+            for name, text in sections:
+                raw = text.encode()
+                digest = hashlib.sha256(raw).hexdigest()
+                block = self.blocks.get(digest)
+                if block is None:
+                    payload = compress(raw)
+                    fcntl.flock(data, fcntl.LOCK_EX)
+                    try:
+                        offset = data.seek(0, os.SEEK_END)
+                        data.write(payload)
+                        data.flush()
+                    finally:
+                        fcntl.flock(data, fcntl.LOCK_UN)
+                    block = {'codec': self.codec, 'offset': offset, 'length': len(payload)}
+                    new += 1
+                entry = {'host': self.host, 'report': None, 'generated': stamp, 'section': name,
+                         'sha256': digest, 'codec': block['codec'], 'offset': block['offset'],
+                         'length': block['length'], 'size': len(raw)}
+                if name in collectors:
+                    entry['collector'] = collectors[name]
+                entries.append(entry)
+                self.blocks[digest] = entry
+            fcntl.flock(data, fcntl.LOCK_EX)
+            try:
+                # Reports another process saved meanwhile take the numbers before this one
+                self._read_index()
+                report = self.entries[-1]['report'] + 1 if self.entries else 1
+                for entry in entries:
+                    entry['report'] = report
+                lines = "".join(json.dumps(entry, separators=(',', ':')) + "\n" for entry in entries).encode()
+                with open(self.index_file, 'a+b') as index:
+                    if index.seek(0, os.SEEK_END):
+                        index.seek(-1, os.SEEK_END)
+                        if index.read(1) != b"\n":
+                            lines = b"\n" + lines  # start after a torn last line
+                    index.write(lines)
+                self._index_read += len(lines)
+            finally:
+                fcntl.flock(data, fcntl.LOCK_UN)
+        self.entries.extend(entries)
+        return self._snapshot(entries), new
+    
+    @staticmethod
+    def _snapshot(entries):
+        return {'host': entries[0]['host'] if entries else None,
+                'generated': entries[0]['generated'] if entries else None,
+                'sections': [[entry['section'], entry['sha256']] for entry in entries],
+                'collectors': {entry['section']: entry.get('collector', 'shell') for entry in entries}}
+    
+    def snapshots(self):
+        """One {'host', 'generated', 'sections'} per archived report, oldest first"""
+        reports = OrderedDict()
+        for entry in self.entries:
+            reports.setdefault(entry['report'], []).append(entry)
+        return [self._snapshot(entries) for entries in reports.values()]
+    
+    def latest(self):
+        """The most recent snapshot or None"""
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+    
+    def read(self, entry):
+        """Decompress the block of one index entry"""
+        with open(self.data_file, 'rb') as f:
+            f.seek(entry['offset'])
+            payload = f.read(entry['length'])
+        return archive_codec(entry['codec'])[1](payload).decode()
+    
+    def section(self, digest):
+        return self.read(self.blocks[digest])
+    
+    def diff(self, old, new, new_texts=None):
+        """(changed section names, unified diff text) between two snapshots"""
+        import difflib
+        
+        new_texts = new_texts or {}
+        old_sections = dict(old['sections'])
+        changed = []
+        output = ""
+        for name, digest in new['sections']:
+            old_digest = old_sections.get(name)
+            if old_digest == digest:
+                continue
+            before_collector = old.get('collectors', {}).get(name, 'shell')
+            after_collector = new.get('collectors', {}).get(name, 'shell')
+            if old_digest and before_collector != after_collector:
+                output += f"# {name}: not compared, collected by {before_collector} @ {old['generated']}"
+                output += f" and by {after_collector} @ {new['generated']}\n\n"
+                continue
+            changed.append(name)
+            before = self.section(old_digest) if old_digest else ""
+            after = new_texts.get(name)
+            if after is None:
+                after = self.section(digest)
+            output += "".join(difflib.unified_diff(
+                before.splitlines(True), after.splitlines(True),
+                f"{name} @ {old['generated']}", f"{name} @ {new['generated']}"))
+            output += "\n"
+        return changed, output
+    
+    def history(self, section, since=None):
+        """Every archived version of section since a datetime, repeats collapsed"""
+        cutoff = since.isoformat(timespec='seconds') if since else ""
+        output = ""
+        previous = None
+        for entry in self.entries:
+            if entry['section'] != section or entry['generated'] < cutoff:
+                continue
+            output += f"## {section} @ {entry['generated']}"
+            if 'collector' in entry:
+                output += f" [{entry['collector']}]"
+            if entry['sha256'] == previous:
+                output += " (unchanged)\n\n"
+                continue
+            output += "\n" + self.read(entry) + "\n\n"
+            previous = entry['sha256']
+        return output
+    
+    def summary(self):
+        """Reports in the archive with stored vs original size"""
+        snapshots = self.snapshots()
+        if not snapshots:
+            return f"No archived reports for {self.host}\n"
+        try:
+            stored = os.path.getsize(self.data_file)
+        except OSError:
+            stored = 0
+        original = sum(entry['size'] for entry in self.entries)
+        output = f"Archive: {self.root}\n"
+        output += f"Reports: {len(snapshots)}  Distinct sections: {len(self.blocks)}  "
+        output += f"Stored: {stored / 1024:.1f} KiB for {original / 1024:.1f} KiB of report text\n\n"
+        for snapshot in snapshots[-20:]:
+            output += f"{snapshot['generated']}  {', '.join(name for name, digest in snapshot['sections'])}\n"
+        return output
+
+
+class ReportWriter:
+    """Write report text to the report file (and echo stream) as it is produced"""
+    
+    def __init__(self, filename, echo=None):
+        self.filename = filename
+        self.echo = echo
+        self.error = None
+        try:
+            self.file = open(filename, 'w')
+        except Exception as e:
+            self.file = None
+            self.error = str(e)
+    
+    def write(self, text):
+        if self.echo is not None:
+            self.echo.write(text)
+            self.echo.flush()
+        if self.file is not None:
+            try:
+                self.file.write(text)
+                self.file.flush()
+            except Exception as e:
+                self.error = str(e)
+                self.close()
+    
+    def close(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except Exception as e:
+                self.error = self.error or str(e)
+            self.file = None
+
+
+class CapabilityIndex:
+    """What this host provides, discovered once from PATH and the filesystem
+    
+    Replaces the 'which ...' probes the collectors used to fork on every
+    call. Built lazily by Hnm_Linux_Bot.capabilities; 'rescan' rebuilds it.
+    """
+    
+    # Tools the collectors branch on or skip when absent
+    TOOLS = (
+        'systemctl', 'chkconfig', 'service', 'journalctl', 'ufw', 'firewall-cmd',
+        'rcSuSEfirewall2', 'iptables', 'apt', 'apt-get', 'zypper', 'dnf', 'yum',
+        'sar', 'dmidecode', 'hponcfg', 'ipmitool', 'pvs', 'vgs', 'lvs', 'iscsiadm',
+        'sanlun', 'multipath', 'nisdomainname', 'ntpq', 'chronyc', 'pcs', 'crm',
+        'cmviewcl', 'hastatus', 'ss', 'netstat', 'ip', 'ifconfig', 'route',
+    )
+    
+    NETWORK_LAYOUTS = (
+        ('rhel', '/etc/sysconfig/network-scripts'),
+        ('suse', '/etc/sysconfig/network'),
+        ('debian', '/etc/network/interfaces'),
+        ('netplan', '/etc/netplan'),
+    )
+    
     def __init__(self):
-        self.detect_os()
+        self.scan()
+    
+    def scan(self):
+        """(Re)build the index without forking"""
+        self.tools = {}
+        wanted = set(self.TOOLS)
+        for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+            try:
+                names = wanted.intersection(os.listdir(directory or "."))
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(directory, name)
+                if name not in self.tools and os.path.isfile(path) and os.access(path, os.X_OK):
+                    self.tools[name] = path
+        
+        if os.path.isdir("/run/systemd/system"):
+            self.init_system = "systemd"
+        elif os.path.exists("/sbin/initctl"):
+            self.init_system = "upstart"
+        else:
+            self.init_system = "sysvinit"
+        
+        # Same precedence check_updates always used
+        if os.path.exists("/usr/bin/apt") or os.path.exists("/usr/bin/apt-get"):
+            self.package_manager = "apt"
+        elif os.path.exists("/usr/bin/zypper"):
+            self.package_manager = "zypper"
+        elif os.path.exists("/usr/bin/dnf"):
+            self.package_manager = "dnf"
+        elif os.path.exists("/usr/bin/yum"):
+            self.package_manager = "yum"
+        else:
+            self.package_manager = None
+        
+        if self.has("journalctl"):
+            self.log_backend = "journald"
+        elif os.path.exists("/var/log/messages"):
+            self.log_backend = "messages"
+        elif os.path.exists("/var/log/syslog"):
+            self.log_backend = "syslog"
+        else:
+            self.log_backend = None
+        
+        self.cluster_stack = [tool for tool in ('pcs', 'crm', 'cmviewcl', 'hastatus') if self.has(tool)]
+        self.network_layouts = [name for name, path in self.NETWORK_LAYOUTS if os.path.exists(path)]
+        self.scanned_at = datetime.now()
+    
+    def has(self, tool):
+        return tool in self.tools
+    
+    def summary(self):
+        output = "=== Capability Index ===\n"
+        output += f"Scanned at: {self.scanned_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
+        output += f"Init system: {self.init_system}\n"
+        output += f"Package manager: {self.package_manager or 'not detected'}\n"
+        output += f"Log backend: {self.log_backend or 'not detected'}\n"
+        output += f"Cluster stack: {', '.join(self.cluster_stack) or 'none'}\n"
+        output += f"Network config: {', '.join(self.network_layouts) or 'none'}\n"
+        output += f"Tools found: {', '.join(sorted(self.tools)) or 'none'}\n"
+        missing = sorted(set(self.TOOLS) - set(self.tools))
+        output += f"Tools missing: {', '.join(missing) or 'none'}\n"
+        return output
+
+
+class CommandResult:
+    """Outcome of one command (elapsed is None when it never started)"""
+    __slots__ = ('output', 'returncode', 'timed_out', 'elapsed', 'stdout_bytes', 'stderr_bytes')
+    
+    def __init__(self, output, returncode=0, timed_out=False, elapsed=None, stdout_bytes=0, stderr_bytes=0):
+        self.output = output
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.elapsed = elapsed
+        self.stdout_bytes = stdout_bytes
+        self.stderr_bytes = stderr_bytes
+
+
+# asyncio takes a noticeable time to import and most runs never start a
+# CommandEngine; the first engine imports it, the engine methods use it
+asyncio = None
+
+
+def _import_asyncio():
+    global asyncio
+    import asyncio
+
+
+class CommandEngine:
+    """asyncio subprocess engine running its event loop in a daemon thread
+    
+    Synchronous code schedules coroutines with schedule(), which returns a
+    concurrent.futures.Future (cancelling it kills the process), or runs
+    them to completion with call(). Children are started with
+    create_subprocess_exec in their own session, at most concurrency at a
+    time, their pipes are read incrementally, and a timeout or
+    cancellation kills the whole process group.
+    """
+    
+    def __init__(self, concurrency=DEFAULT_WORKERS):
+        _import_asyncio()
+        self.concurrency = max(1, concurrency)
+        self.loop = asyncio.new_event_loop()
+        if sys.version_info < (3, 8):
+            # Before 3.8 the child watcher has to be attached from the main thread
+            asyncio.get_child_watcher().attach_loop(self.loop)
+        self._semaphore = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="hnm-engine", daemon=True)
+        self._thread.start()
+    
+    def schedule(self, coro):
+        """Run coro on the engine loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def call(self, coro):
+        """Run coro on the engine loop and wait for its result"""
+        future = self.schedule(coro)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+    
+    def run_sync(self, argv, timeout=COMMAND_TIMEOUT, deadline=None, input=None):
+        return self.call(self.run(argv, timeout, deadline, input=input))
+    
+    async def run(self, argv, timeout=COMMAND_TIMEOUT, deadline=None, on_output=None, input=None):
+        """Run argv and return a CommandResult
+        
+        deadline (time.monotonic) caps the timeout once a slot is free;
+        on_output(name, chunk) sees stdout/stderr data as it arrives;
+        input (bytes) is written to the child's stdin.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return CommandResult("Skipped: report deadline reached\n", -1, timed_out=True)
+            started = time.monotonic()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv, stdin=subprocess.DEVNULL if input is None else subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE, start_new_session=True)
+            except OSError as e:
+                return CommandResult(f"Error executing command: {str(e)}", -1, elapsed=time.monotonic() - started)
+            stdout = bytearray()
+            stderr = bytearray()
+            try:
+                stdout_bytes, stderr_bytes, returncode = await asyncio.wait_for(
+                    self._communicate(proc, stdout, stderr, on_output, input), timeout)
+            except asyncio.TimeoutError:
+                await self._kill(proc)
+                return CommandResult(f"Command timed out after {timeout:.0f} seconds\n", -1, timed_out=True,
+                                     elapsed=time.monotonic() - started)
+            except asyncio.CancelledError:
+                await self._kill(proc)
+                raise
+            output = (stdout or stderr).decode('utf-8', 'replace')
+            return CommandResult(output, returncode, elapsed=time.monotonic() - started,
+                                 stdout_bytes=stdout_bytes, stderr_bytes=stderr_bytes)
+    
+    @classmethod
+    async def _communicate(cls, proc, stdout, stderr, on_output, input=None):
+        """Read both pipes while waiting for proc; returns (stdout bytes, stderr bytes, returncode)"""
+        steps = [cls._drain(proc.stdout, stdout, 'stdout', on_output),
+                 cls._drain(proc.stderr, stderr, 'stderr', on_output),
+                 proc.wait()]
+        if input is not None:
+            steps.append(cls._feed(proc.stdin, input))
+        return (await asyncio.gather(*steps))[:3]
+    
+    @staticmethod
+    async def _feed(stream, data):
+        """Write data to the child's stdin and close it (a child exiting early is fine)"""
+        try:
+            stream.write(data)
+            await stream.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream.close()
+    
+    @staticmethod
+    async def _drain(stream, buffer, name, on_output):
+        """Read stream to EOF into buffer (up to ENGINE_MAX_OUTPUT); returns the bytes read"""
+        total = 0
+        while True:
+            chunk = await stream.read(ENGINE_READ_CHUNK)
+            if not chunk:
+                return total
+            total += len(chunk)
+            if on_output is not None:
+                on_output(name, chunk)
+            if len(buffer) < ENGINE_MAX_OUTPUT:
+                buffer += chunk[:ENGINE_MAX_OUTPUT - len(buffer)]
+    
+    @staticmethod
+    async def _kill(proc):
+        """SIGKILL the process group of proc and reap it"""
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        try:
+            await asyncio.wait_for(proc.wait(), 5)
+        except asyncio.TimeoutError:
+            pass
+
+
+class ResultCache:
+    """Size-bounded LRU of command results with per-command TTLs"""
+    
+    def __init__(self, policies=CACHE_POLICIES, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES):
+        self.policies = [(re.compile(pattern), ttl) for pattern, ttl in policies]
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # cmd -> (expires_at, result)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def ttl_for(self, cmd):
+        for pattern, ttl in self.policies:
+            if pattern.search(cmd):
+                return ttl
+        return 0
+    
+    def get(self, cmd):
+        if self.ttl_for(cmd) <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(cmd)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.entries.move_to_end(cmd)
+                    self.hits += 1
+                    return entry[1]
+                self._drop(cmd)
+            self.misses += 1
+            return None
+    
+    def put(self, cmd, result):
+        ttl = self.ttl_for(cmd)
+        if ttl <= 0 or result.timed_out:
+            return
+        size = len(result.output)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if cmd in self.entries:
+                self._drop(cmd)
+            self.entries[cmd] = (time.monotonic() + ttl, result)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def _drop(self, cmd):
+        expires_at, result = self.entries.pop(cmd)
+        self.size -= len(result.output)
+    
+    def clear(self):
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            self.size = 0
+            return count
+    
+    def summary(self):
+        lookups = self.hits + self.misses
+        ratio = 100.0 * self.hits / lookups if lookups else 0.0
+        output = "=== Result Cache ===\n"
+        output += f"Hits: {self.hits}\n"
+        output += f"Misses: {self.misses}\n"
+        output += f"Hit ratio: {ratio:.1f}%\n"
+        output += f"Entries: {len(self.entries)}/{self.max_entries}\n"
+        output += f"Size: {self.size} bytes (limit {self.max_bytes})\n"
+        output += f"Evictions: {self.evictions}\n"
+        return output
+
+
+class FileCache:
+    """Size-bounded LRU of file contents and filtered views
+    
+    An entry is valid while the file keeps its (inode, size, mtime_ns), so
+    a repeat read costs one stat. Views are the text run through a stage
+    chain (e.g. drop_comments), cached per chain. Empty-sized files
+    (/proc, /sys) and non-regular files are always read fresh.
+    """
+    
+    def __init__(self, max_bytes=FILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> (validator, text, {stage keys: view})
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def read(self, path, stages=()):
+        """path (or a glob) through stages; None if a final filter left nothing
+        
+        Raises OSError when nothing can be read.
+        """
+        if glob.has_magic(path):
+            parts = []
+            for name in sorted(glob.glob(path)):
+                try:
+                    parts.append(self.read(name))
+                except OSError:
+                    continue
+            if not parts:
+                raise OSError(errno.ENOENT, "no readable files", path)
+            return apply_stages("".join(parts), stages)
+        
+        key = tuple(stage.key for stage in stages)
+        st = os.stat(path)
+        validator = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == validator:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                views = entry[2]
+                if key not in views:
+                    views[key] = apply_stages(entry[1], stages)
+                    self.size += len(views[key] or "")
+                    self._evict()
+                return views[key]
+            self.misses += 1
+        
+        with open(path, errors='replace') as f:
+            st = os.fstat(f.fileno())
+            text = f.read()
+        view = apply_stages(text, stages)
+        if st.st_size and stat.S_ISREG(st.st_mode) and len(text) <= self.max_bytes:
+            with self.lock:
+                if path in self.entries:
+                    self._drop(path)
+                views = {(): text}
+                views[key] = view
+                self.entries[path] = ((st.st_ino, st.st_size, st.st_mtime_ns), text, views)
+                self.size += self._entry_size(views)
+                self._evict()
+        return view
+    
+    @staticmethod
+    def _entry_size(views):
+        return sum(len(view or "") for view in views.values())
+    
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+    
+    def _drop(self, path):
+        validator, text, views = self.entries.pop(path)
+        self.size -= self._entry_size(views)
+    
+    def clear(self):
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            self.size = 0
+            return count
+    
+    def summary(self):
+        lookups = self.hits + self.misses
+        ratio = 100.0 * self.hits / lookups if lookups else 0.0
+        output = "=== File Cache ===\n"
+        output += f"Hits: {self.hits}\n"
+        output += f"Misses: {self.misses}\n"
+        output += f"Hit ratio: {ratio:.1f}%\n"
+        output += f"Files: {len(self.entries)}\n"
+        output += f"Size: {self.size} bytes (limit {self.max_bytes})\n"
+        output += f"Evictions: {self.evictions}\n"
+        return output
+
+
+class CommandStats:
+    """Per-command latency, exit status and output size counters"""
+    
+    def __init__(self, max_samples=STATS_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.commands = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def record(self, cmd, elapsed, returncode, timed_out, stdout_bytes, stderr_bytes):
+        with self.lock:
+            entry = self.commands.get(cmd)
+            if entry is None:
+                entry = self.commands[cmd] = {
+                    'samples': deque(maxlen=self.max_samples),
+                    'count': 0,
+                    'timeouts': 0,
+                    'failures': 0,
+                    'total_time': 0.0,
+                    'stdout_bytes': 0,
+                    'stderr_bytes': 0,
+                    'last_exit_status': None,
+                }
+            entry['samples'].append(elapsed)
+            entry['count'] += 1
+            entry['total_time'] += elapsed
+            entry['stdout_bytes'] += stdout_bytes
+            entry['stderr_bytes'] += stderr_bytes
+            entry['last_exit_status'] = returncode
+            if timed_out:
+                entry['timeouts'] += 1
+            elif returncode != 0:
+                entry['failures'] += 1
+    
+    @staticmethod
+    def percentile(ordered, pct):
+        if not ordered:
+            return 0.0
+        index = max(0, int(round(pct / 100.0 * len(ordered))) - 1)
+        return ordered[min(index, len(ordered) - 1)]
+    
+    def rows(self):
+        """One summary dict per command (times in milliseconds)"""
+        with self.lock:
+            items = [(cmd, dict(entry, samples=sorted(entry['samples'])))
+                     for cmd, entry in self.commands.items()]
+        rows = []
+        for cmd, entry in items:
+            samples = entry['samples']
+            rows.append({
+                'command': cmd,
+                'count': entry['count'],
+                'mean_ms': round(1000 * entry['total_time'] / entry['count'], 2),
+                'p50_ms': round(1000 * self.percentile(samples, 50), 2),
+                'p90_ms': round(1000 * self.percentile(samples, 90), 2),
+                'p99_ms': round(1000 * self.percentile(samples, 99), 2),
+                'max_ms': round(1000 * samples[-1], 2),
+                'total_ms': round(1000 * entry['total_time'], 2),
+                'timeouts': entry['timeouts'],
+                'failures': entry['failures'],
+                'stdout_bytes': entry['stdout_bytes'],
+                'stderr_bytes': entry['stderr_bytes'],
+                'last_exit_status': entry['last_exit_status'],
+            })
+        return rows
+    
+    def summary(self, top=10):
+        rows = self.rows()
+        if not rows:
+            return "No commands recorded yet"
+        
+        def shorten(cmd, width=60):
+            return cmd if len(cmd) <= width else cmd[:width - 3] + "..."
+        
+        output = "=== Command Statistics ===\n"
+        output += f"Commands: {len(rows)}  Invocations: {sum(r['count'] for r in rows)}  "
+        output += f"Timeouts: {sum(r['timeouts'] for r in rows)}  Failures: {sum(r['failures'] for r in rows)}  "
+        output += f"Total time: {sum(r['total_ms'] for r in rows) / 1000:.2f}s\n"
+        
+        header = f"{'COUNT':>6} {'P50ms':>9} {'P90ms':>9} {'P99ms':>9} {'MAXms':>9} {'T/O':>4} {'OUT':>9} {'ERR':>7}  COMMAND\n"
+        output += "\n# Slowest commands (by p90)\n" + header
+        for row in sorted(rows, key=lambda r: r['p90_ms'], reverse=True)[:top]:
+            output += (f"{row['count']:>6} {row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+                       f"{row['max_ms']:>9.1f} {row['timeouts']:>4} {row['stdout_bytes']:>9} {row['stderr_bytes']:>7}  "
+                       f"{shorten(row['command'])}\n")
+        output += "\n# Most time spent (total)\n"
+        for row in sorted(rows, key=lambda r: r['total_ms'], reverse=True)[:top]:
+            output += f"{row['total_ms'] / 1000:>9.2f}s  {row['count']:>5}x  {shorten(row['command'])}\n"
+        return output
+    
+    def latency(self, cmd, pct, min_samples=1):
+        """pct percentile of the recorded wall times of cmd, None without enough samples"""
+        with self.lock:
+            entry = self.commands.get(cmd)
+            samples = sorted(entry['samples']) if entry is not None else []
+        if len(samples) < min_samples:
+            return None
+        return self.percentile(samples, pct)
+    
+    def timeouts(self):
+        """Total number of timed out invocations"""
+        with self.lock:
+            return sum(entry['timeouts'] for entry in self.commands.values())
+    
+    def export_json(self, filename, **meta):
+        """Write all counters to filename as JSON"""
+        document = dict(meta)
+        document['generated'] = datetime.now().isoformat()
+        document['commands'] = self.rows()
+        with open(filename, 'w') as f:
+            json.dump(document, f, indent=2)
+
+
+class Hnm_Linux_Bot:
+    def __init__(self, workers=None, report_budget=None):
+        if workers is None:
+            try:
+                workers = int(os.environ.get("HNM_BOT_WORKERS", DEFAULT_WORKERS))
+            except ValueError:
+                workers = DEFAULT_WORKERS
+        self.workers = max(1, workers)
+        if report_budget is None:
+            try:
+                report_budget = float(os.environ.get("HNM_REPORT_BUDGET", DEFAULT_REPORT_BUDGET))
+            except ValueError:
+                report_budget = DEFAULT_REPORT_BUDGET
+        self.report_budget = max(0, report_budget)
+        self.cost_classes = [(name, re.compile(pattern), ceiling) for name, pattern, ceiling in COST_CLASSES]
+        self._deadline = None
+        self._timed_out = 0
+        self._plan = None
+        self._pending = {}
+        self._capabilities = None
+        self._process_snapshot = None
+        self._report_time = None
+        self._engine = None
+        self.sampler = None
+        self._log_follower = None
+        self.cache = ResultCache()
+        self.files = FileCache()
+        self.stats = CommandStats()
+        self.output_format = 'text'
+        self.interactive = True
+        self.report_echo = None
         self.commands = {
             'help': self.show_help,
             'disk': self.check_disk_usage,
@@ -37,9 +2247,27 @@ class Hnm_Linux_Bot:
             'performance': self.performance_report,
             'fullreport': self.full_report,
             'custom': self.run_custom_command,
+            'rescan': self.rescan,
+            'refresh': self.refresh,
+            'cache': self.cache_status,
+            'stats': self.command_stats,
+            'format': self.set_format,
+            'budget': self.set_budget,
+            'diff': self.diff_report,
+            'history': self.report_history,
+            'watch': self.watch,
             'exit': self.exit_bot,
             'quit': self.exit_bot
         }
+        # Commands that can also be emitted as parsed records (json/ndjson)
+        self.structured = {
+            'disk': self.disk_records,
+            'memory': self.memory_records,
+            'processes': self.process_records,
+            'ports': self.socket_records,
+            'lvm': self.lvm_records,
+            'uptime': self.uptime_records,
+        }
         
     def detect_os(self):
         """Detect operating system and version"""
@@ -74,23 +2302,287 @@ class Hnm_Linux_Bot:
             except:
                 pass
     
-    def run_command(self, cmd):
-        """Execute shell command and return output"""
+    @property
+    def engine(self):
+        """The command engine, started by the first command"""
+        if self._engine is None:
+            self._engine = CommandEngine(self.workers)
+        return self._engine
+    
+    @property
+    def capabilities(self):
+        """Capability index, built on first use"""
+        if self._capabilities is None:
+            self._capabilities = CapabilityIndex()
+        return self._capabilities
+    
+    def rescan(self):
+        """Rebuild the capability index"""
+        self._capabilities = CapabilityIndex()
+        return self._capabilities.summary()
+    
+    def run_tool(self, tool, command, missing):
+        """Run command (falling back to missing), or return missing directly if tool is not installed"""
+        if not self.capabilities.has(tool):
+            return missing + "\n"
+        return self.collect(Run(command), fallback=missing)
+    
+    def refresh(self, *command):
+        """Drop cached results, optionally re-running one command"""
+        count = self.cache.clear()
+        self.files.clear()
+        if command:
+            name = command[0]
+            if name not in self.commands or name == 'refresh':
+                return f"❌ Unknown command: '{name}'"
+            return self.commands[name]()
+        return f"✓ Cleared {count} cached result(s)"
+    
+    def cache_status(self):
+        """Show result and file cache counters"""
+        return self.cache.summary() + "\n" + self.files.summary()
+    
+    def command_stats(self, *args):
+        """Show per-command latency statistics or export them as JSON"""
+        if args and args[0] == 'json':
+            filename = args[1] if len(args) > 1 else f"command_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            try:
+                self.stats.export_json(filename, host=os.uname()[1], source='hnm-bot')
+            except Exception as e:
+                return f"⚠️  Could not export statistics: {str(e)}"
+            return f"✓ Statistics exported to: {filename}"
+        return self.stats.summary()
+    
+    def set_format(self, *fmt):
+        """Select text, json or ndjson output for record-backed commands"""
+        if not fmt:
+            return f"Output format: {self.output_format} (record-backed: {', '.join(self.structured)})"
+        if fmt[0] not in OUTPUT_FORMATS:
+            return f"❌ Unknown format '{fmt[0]}' (choose from: {', '.join(OUTPUT_FORMATS)})"
+        self.output_format = fmt[0]
+        return f"✓ Output format set to {self.output_format}"
+    
+    def emit_structured(self, name, stream, fmt=None):
+        """Write the records of a record-backed command to stream"""
+        write_records(stream, name, self.structured[name](), fmt or self.output_format,
+                      host=os.uname()[1])
+    
+    def disk_records(self):
+        """df as DiskUsage records"""
+        return parse_df(self.run_command(DF_RECORDS_CMD))
+    
+    def memory_records(self):
+        """Memory usage as a MemoryUsage record"""
+        return [memory_record(read_meminfo())]
+    
+    def process_records(self):
+        """Process table (sorted by CPU) as ProcessEntry records"""
         try:
-            # Python 3.6 compatible version (capture_output not available)
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                universal_newlines=True,  # text=True equivalent for Python 3.6
-                timeout=30
-            )
-            return result.stdout if result.stdout else result.stderr
-        except subprocess.TimeoutExpired:
-            return "Command timed out after 30 seconds"
-        except Exception as e:
-            return f"Error executing command: {str(e)}"
+            snapshot = self.process_snapshot()
+        except (OSError, ValueError, IndexError):
+            return parse_ps(self.run_command(PS_RECORDS_CMD))
+        ordered = sorted(snapshot.processes, key=lambda p: p.cpu_percent, reverse=True)
+        return (snapshot.entry(p) for p in ordered)
+    
+    def process_snapshot(self):
+        """Sampled process table, reused by processes and cpu for a few seconds"""
+        snapshot = self._process_snapshot
+        if snapshot is None or time.monotonic() - snapshot.taken_at > PROCESS_SNAPSHOT_TTL:
+            snapshot = self._process_snapshot = scan_processes()
+        return snapshot
+    
+    def top_processes(self, key):
+        """ps aux style table of the top processes by key, None without /proc"""
+        try:
+            snapshot = self.process_snapshot()
+        except (OSError, ValueError, IndexError):
+            return None
+        return render_process_table(snapshot.entry(p) for p in snapshot.top(key))
+    
+    def socket_records(self):
+        """TCP/UDP sockets as SocketEntry records"""
+        if not os.access("/proc/net/tcp", os.R_OK):
+            return parse_ss(self.run_command(SS_RECORDS_CMD))
+        return (SocketEntry(netid, state, recv_q, send_q, decode_address(local), str(local_port),
+                            decode_address(remote), str(remote_port) if remote_port else '*')
+                for netid, state, local, local_port, remote, remote_port, inode, send_q, recv_q
+                in iter_proc_sockets())
+    
+    def socket_summary(self):
+        """SocketSummary of /proc/net, None when it cannot be read"""
+        try:
+            return SocketSummary(iter_proc_sockets())
+        except OSError:
+            return None
+    
+    def lvm_records(self):
+        """Block devices and LVM PVs/VGs/LVs as records"""
+        yield from parse_lsblk(self.run_command(LSBLK_RECORDS_CMD))
+        for record_class, cmd in LVM_RECORDS_CMDS:
+            if self.capabilities.has(cmd.split()[0]):
+                yield from parse_lvm(self.run_command(cmd), record_class)
+    
+    def uptime_records(self):
+        """Uptime, users and load as an UptimeStatus record"""
+        uptime = read_uptime()
+        load = read_loadavg()
+        boot_time = datetime.fromtimestamp(read_cpu_times().boot_time).isoformat()
+        return [UptimeStatus(uptime.seconds, boot_time, count_logged_in_users(),
+                             load.load1, load.load5, load.load15)]
+    
+    def set_budget(self, *seconds):
+        """Show or set the total time budget of fullreport"""
+        if seconds:
+            value = seconds[0]
+            try:
+                self.report_budget = 0 if value == 'off' else max(0, float(value))
+            except ValueError:
+                return f"❌ Invalid budget '{value}' (seconds or 'off')"
+        if not self.report_budget:
+            return "Report budget: off (each command times out after 30 seconds)"
+        return f"Report budget: {self.report_budget:g} seconds"
+    
+    def watch(self, *args):
+        """Control the background sampler or summarise its history"""
+        action = args[0] if args else ''
+        if action == 'start':
+            try:
+                interval = float(args[1]) if len(args) > 1 else WATCH_INTERVAL
+            except ValueError:
+                return f"❌ Invalid interval '{args[1]}'"
+            return self.start_watch(interval)
+        if action == 'stop':
+            if self.sampler is None or not self.sampler.running:
+                return "Watch is not running"
+            self.sampler.stop()
+            return "✓ Watch stopped (history kept)\n" + self.sampler.status()
+        if self.sampler is None:
+            return "Watch is not running. Use 'watch start [seconds]' to begin sampling."
+        try:
+            minutes = float(action) if action else WATCH_DEFAULT_MINUTES
+        except ValueError:
+            return f"❌ Unknown watch option '{action}' (start, stop or minutes)"
+        return self.sampler.status() + "\n" + self.sampler.summary(minutes)
+    
+    def start_watch(self, interval=WATCH_INTERVAL):
+        """Start sampling (restarting with a new interval drops the history)"""
+        if interval <= 0:
+            return f"❌ Invalid interval '{interval:g}'"
+        if self.sampler is not None and self.sampler.interval != interval:
+            self.sampler.stop()
+            self.sampler = None
+        if self.sampler is None:
+            self.sampler = SystemSampler(interval)
+        self.sampler.start()
+        return "✓ " + self.sampler.status()
+    
+    def timeout_for(self, cmd):
+        """Timeout for cmd: cost class ceiling, tightened by history"""
+        ceiling = COMMAND_TIMEOUT
+        for name, pattern, class_ceiling in self.cost_classes:
+            if pattern.search(cmd):
+                ceiling = class_ceiling
+                break
+        timeout = ceiling
+        p99 = self.stats.latency(cmd, 99, ADAPTIVE_MIN_SAMPLES)
+        if p99 is not None:
+            timeout = min(ceiling, max(ADAPTIVE_MIN_TIMEOUT, ADAPTIVE_FACTOR * p99))
+        return timeout
+    
+    def run_command(self, cmd, use_cache=True):
+        """Execute shell command and return output"""
+        # While planning a report only record the command line
+        if self._plan is not None:
+            self._plan.append(cmd)
+            return ""
+        return self._run(cmd, use_cache).output
+    
+    def _run(self, cmd, use_cache=True):
+        """CommandResult of cmd, a command line or an argv tuple"""
+        # Already scheduled on the engine by full_report
+        future = self._pending.get(cmd)
+        if future is not None:
+            result = future.result()
+        elif not use_cache:
+            result = self._execute(cmd)
+        else:
+            result = self._cached_execute(cmd)
+        if result.timed_out:
+            self._timed_out += 1
+        return result
+    
+    def collect(self, *steps, fallback=None):
+        """Output of the first Run/Read step that succeeds, else fallback
+        
+        Like 'a || b || echo fallback' without a shell: a step fails when
+        its command exits non-zero, its file cannot be read or its final
+        filter stage leaves nothing. Without a fallback the last step's
+        output is used whatever its status.
+        """
+        if self._plan is not None:
+            # Prefetch the first command only; alternatives run when needed
+            for step in steps:
+                if isinstance(step, Run):
+                    self._plan.append(step.argv)
+                    break
+            return ""
+        for index, step in enumerate(steps):
+            last = fallback is None and index == len(steps) - 1
+            if isinstance(step, Read):
+                try:
+                    text = self.files.read(step.path, step.stages)
+                except OSError as e:
+                    if last:
+                        return f"{step.path}: {e.strerror or e}\n"
+                    continue
+                if text is not None:
+                    return text
+                if last:
+                    return ""
+                continue
+            else:
+                result = self._run(step.argv)
+                if result.timed_out:
+                    return result.output
+                if result.returncode == 0:
+                    text = result.output if result.stdout_bytes else ""
+                elif last:
+                    text = result.output
+                else:
+                    continue
+            text = apply_stages(text, step.stages)
+            if text is not None:
+                return text
+            if last:
+                return ""
+        return fallback + "\n"
+    
+    def _cached_execute(self, cmd):
+        """Serve cmd from the result cache or run it and remember the result"""
+        return self.engine.call(self._cached_execute_async(cmd))
+    
+    def _execute(self, cmd):
+        """Run a single command in its own process group"""
+        return self.engine.call(self._execute_async(cmd))
+    
+    async def _cached_execute_async(self, cmd):
+        key = command_line(cmd)
+        result = self.cache.get(key)
+        if result is None:
+            result = await self._execute_async(cmd)
+            self.cache.put(key, result)
+        return result
+    
+    async def _execute_async(self, cmd):
+        """Run cmd on the engine and record its statistics"""
+        line = command_line(cmd)
+        # Within a report the timeout adapts to the command and the deadline
+        timeout = self.timeout_for(line) if self._deadline is not None else COMMAND_TIMEOUT
+        result = await self.engine.run(command_argv(cmd), timeout, self._deadline)
+        if result.elapsed is not None:
+            self.stats.record(line, result.elapsed, result.returncode, result.timed_out,
+                              result.stdout_bytes, result.stderr_bytes)
+        return result
     
     def show_help(self):
         """Display available commands"""
@@ -120,7 +2612,20 @@ class Hnm_Linux_Bot:
   cluster      - Cluster status (PCS, CRM, HPSG, Veritas)
   performance  - CPU/RAM utilization reports with SAR data
   fullreport   - Generate complete system report (all above)
+  diff         - Only the report sections changed since the last snapshot, as
+                 unified diffs ('diff last' compares the two latest snapshots)
+  history      - Archived reports, or one section over time
+                 ('history lvm --since 30d')
+  watch        - Sampled CPU/RAM/disk/network history ('watch start [secs]',
+                 'watch stop', 'watch [minutes]' for the summary)
   custom       - Run a custom Linux command
+  rescan       - Re-detect installed tools, init system and package manager
+  refresh      - Drop cached results (refresh <command> re-runs it fresh)
+  cache        - Show result and file cache hit/miss counters
+  stats        - Per-command latency statistics (stats json [file] to export)
+  budget       - Show or set the fullreport time budget ('budget 120', 'budget off')
+  format       - Output format text/json/ndjson for disk, memory, processes,
+                 ports, lvm and uptime (e.g. 'format ndjson')
   exit/quit    - Exit the bot
 
 """
@@ -131,33 +2636,42 @@ class Hnm_Linux_Bot:
         output = "=== Disk Usage ===\n"
         output += self.run_command("df -h")
         output += "\n\n=== Inode Usage ===\n"
-        output += self.run_command("df -i | head -n 10")
+        output += self.collect(Run("df -i", head(10)))
         return output
     
     def check_memory(self):
         """Check memory usage"""
         output = "=== Memory Usage ===\n"
-        output += self.run_command("free -h")
-        output += "\n\n=== Memory Details ===\n"
-        output += self.run_command("cat /proc/meminfo | head -n 20")
+        try:
+            mem = read_meminfo()
+            output += render_free(mem, 'h')
+            output += "\n\n=== Memory Details ===\n"
+            output += render_meminfo(mem, 20)
+        except (OSError, ValueError, IndexError):
+            output += self.run_command("free -h")
+            output += "\n\n=== Memory Details ===\n"
+            output += self.collect(Read("/proc/meminfo", head(20)))
         return output
     
     def check_cpu(self):
         """Check CPU information"""
         output = "=== CPU Information ===\n"
-        output += self.run_command("lscpu | grep -E 'Model name|CPU\\(s\\)|Thread|Core|Socket'")
+        try:
+            output += render_cpu_summary(read_cpuinfo())
+        except (OSError, ValueError, IndexError):
+            output += self.collect(Run("lscpu", grep(r'Model name|CPU\(s\)|Thread|Core|Socket')))
         output += "\n\n=== CPU Load (1, 5, 15 min) ===\n"
-        output += self.run_command("uptime")
+        output += self.native_uptime()
         output += "\n\n=== Top CPU Processes ===\n"
-        output += self.run_command("ps aux --sort=-%cpu | head -n 11")
+        output += self.top_processes('cpu_percent') or self.collect(Run("ps aux --sort=-%cpu", head(11)))
         return output
     
     def list_processes(self):
         """List top processes"""
         output = "=== Top Processes by CPU ===\n"
-        output += self.run_command("ps aux --sort=-%cpu | head -n 11")
+        output += self.top_processes('cpu_percent') or self.collect(Run("ps aux --sort=-%cpu", head(11)))
         output += "\n\n=== Top Processes by Memory ===\n"
-        output += self.run_command("ps aux --sort=-%mem | head -n 11")
+        output += self.top_processes('rss_kb') or self.collect(Run("ps aux --sort=-%mem", head(11)))
         return output
     
     def list_users(self):
@@ -167,113 +2681,160 @@ class Hnm_Linux_Bot:
         output += "\n\n=== Last Logins ===\n"
         output += self.run_command("last -n 10")
         output += "\n\n=== Failed Login Attempts ===\n"
-        output += self.run_command("lastb -n 10 2>/dev/null || echo 'Permission denied or no failed logins'")
+        output += self.collect(Run("lastb -n 10"), fallback='Permission denied or no failed logins')
         return output
     
     def check_services(self):
         """Check system services"""
         output = "=== System Services ===\n"
         # systemd (RHEL 7+, Ubuntu 16.04+, SUSE 12+)
-        systemctl_check = self.run_command("which systemctl 2>/dev/null")
-        if systemctl_check.strip():
+        if self.capabilities.has("systemctl"):
             output += "\n# Failed Services\n"
             output += self.run_command("systemctl --failed")
             output += "\n# Active Services (sample)\n"
-            output += self.run_command("systemctl list-units --type=service --state=running | head -n 15")
+            output += self.collect(Run("systemctl list-units --type=service --state=running", head(15)))
         else:
             # SysV init (RHEL 6, older systems)
             output += "\n# Running Services (chkconfig)\n"
-            output += self.run_command("chkconfig --list 2>/dev/null | grep ':on' | head -n 20 || service --status-all 2>/dev/null | grep running | head -n 20")
+            output += self.collect(Run("chkconfig --list", grep(':on'), head(20)),
+                                   Run("service --status-all", grep('running'), head(20)))
         return output
     
     def check_network(self):
         """Check network information"""
         output = "=== Network Interfaces ===\n"
         # Try ip command first (modern), fallback to ifconfig (older systems)
-        output += self.run_command("ip addr show 2>/dev/null || ifconfig -a")
+        output += self.collect(Run("ip addr show"), Run("ifconfig -a"))
         output += "\n\n=== Routing Table ===\n"
-        output += self.run_command("ip route 2>/dev/null || route -n")
+        output += self.collect(Run("ip route"), Run("route -n"))
         output += "\n\n=== Active Connections ===\n"
-        # ss (modern), fallback to netstat (older systems)
-        output += self.run_command("ss -tuln 2>/dev/null | head -n 20 || netstat -tuln | head -n 20")
+        summary = self.socket_summary()
+        if summary is None:
+            # ss (modern), fallback to netstat (older systems)
+            output += self.collect(Run("ss -tuln", head(20)), Run("netstat -tuln", head(20)))
+            return output
+        output += summary.render_listening(limit=20, owners=False)
+        output += "\n# Sockets by state\n"
+        output += summary.render_states()
         return output
     
     def check_logs(self):
         """Check system logs"""
         output = "=== Recent System Logs ===\n"
-        # journalctl (systemd), fallback to /var/log/messages (older systems)
-        journalctl_check = self.run_command("which journalctl 2>/dev/null")
-        if journalctl_check.strip():
-            output += self.run_command("journalctl -n 20 --no-pager")
-            output += "\n\n=== Recent Errors ===\n"
-            output += self.run_command("journalctl -p err -n 10 --no-pager")
-        else:
-            output += self.run_command("tail -n 20 /var/log/messages 2>/dev/null || tail -n 20 /var/log/syslog 2>/dev/null || echo 'Log files not accessible'")
+        # journalctl (systemd), fallback to /var/log/messages (older systems).
+        # Only entries added since the previous call are read.
+        backend = self.capabilities.log_backend
+        follower = self.log_follower
+        try:
+            failures = []
+            if backend == "journald":
+                tail, errors, failures = follower.follow_journal(lambda cmd: self._run(cmd, use_cache=False))
+            elif backend in LOG_FILES:
+                tail, errors = follower.follow_file(LOG_FILES[backend])
+            else:
+                raise OSError("no log backend")
+        except OSError:
+            output += self.collect(Run("tail -n 20 /var/log/messages"), Run("tail -n 20 /var/log/syslog"),
+                                   fallback='Log files not accessible')
             output += "\n\n=== Recent Errors ===\n"
-            output += self.run_command("grep -i error /var/log/messages 2>/dev/null | tail -n 10 || grep -i error /var/log/syslog 2>/dev/null | tail -n 10 || echo 'No error logs found'")
+            output += self.collect(Run("grep -i error /var/log/messages", tail(10)),
+                                   Run("grep -i error /var/log/syslog", tail(10)),
+                                   fallback='No error logs found')
+            return output
+        follower.save()
+        output += "".join(line + "\n" for line in tail)
+        output += "\n\n=== Recent Errors ===\n"
+        output += "".join(line + "\n" for line in errors[-LOG_ERROR_LINES:]) or "No error logs found\n"
+        if failures:
+            output += "\n⚠️  journalctl failed:\n" + "".join(f"  {failure}\n" for failure in failures)
         return output
     
+    @property
+    def log_follower(self):
+        """Persisted log cursors, loaded on first use"""
+        if self._log_follower is None:
+            self._log_follower = LogFollower(os.path.join(STATE_DIR, LOG_STATE_FILE))
+        return self._log_follower
+    
     def check_uptime(self):
         """Check system uptime"""
         output = "=== System Uptime ===\n"
-        output += self.run_command("uptime")
+        output += self.native_uptime()
         output += "\n\n=== Boot Time ===\n"
-        output += self.run_command("who -b")
+        try:
+            output += render_boot_time(read_cpu_times())
+        except (OSError, ValueError, IndexError):
+            output += self.run_command("who -b")
         return output
     
+    def native_uptime(self):
+        """uptime summary from /proc, falling back to the uptime binary"""
+        try:
+            return render_uptime(read_uptime(), read_loadavg(), count_logged_in_users())
+        except (OSError, ValueError, IndexError):
+            return self.run_command("uptime")
+    
     def check_ports(self):
         """Check open ports"""
         output = "=== Listening Ports ===\n"
-        # ss (modern), fallback to netstat (older systems)
-        output += self.run_command("ss -tuln 2>/dev/null || netstat -tuln")
+        summary = self.socket_summary()
+        if summary is None:
+            # ss (modern), fallback to netstat (older systems)
+            output += self.collect(Run("ss -tuln"), Run("netstat -tuln"))
+            output += "\n\n=== Established Connections ===\n"
+            output += self.collect(Run("ss -tun", grep('ESTAB'), head(20)),
+                                   Run("netstat -tun", grep('ESTABLISHED'), head(20)))
+            return output
+        output += summary.render_listening()
+        output += "\n\n=== Connections by State ===\n"
+        output += summary.render_states()
         output += "\n\n=== Established Connections ===\n"
-        output += self.run_command("ss -tun 2>/dev/null | grep ESTAB | head -n 20 || netstat -tun | grep ESTABLISHED | head -n 20")
+        output += summary.render_talkers()
         return output
     
     def check_firewall(self):
         """Check firewall status"""
         output = "=== Firewall Status ===\n"
         # Check UFW (Ubuntu)
-        ufw_check = self.run_command("which ufw 2>/dev/null")
-        if ufw_check.strip():
+        if self.capabilities.has("ufw"):
             output += "\n# UFW Status\n"
-            output += self.run_command("ufw status 2>/dev/null || echo 'UFW not available'")
+            output += self.collect(Run("ufw status"), fallback='UFW not available')
         
         # Check firewalld (RHEL 7+, SUSE 12+)
-        firewalld_check = self.run_command("which firewall-cmd 2>/dev/null")
-        if firewalld_check.strip():
+        if self.capabilities.has("firewall-cmd"):
             output += "\n# Firewalld Status\n"
-            output += self.run_command("firewall-cmd --state 2>/dev/null || echo 'firewalld not running'")
+            output += self.collect(Run("firewall-cmd --state"), fallback='firewalld not running')
         
         # Check SuSEfirewall2 (older SUSE)
         output += "\n# SuSEfirewall2 Status\n"
-        output += self.run_command("rcSuSEfirewall2 status 2>/dev/null || echo 'SuSEfirewall2 not available'")
+        output += self.run_tool("rcSuSEfirewall2", "rcSuSEfirewall2 status", "SuSEfirewall2 not available")
         
         # IPTables (all systems)
         output += "\n# IPTables Rules\n"
-        output += self.run_command("iptables -L -n 2>/dev/null | head -n 30 || echo 'Permission denied - run with sudo'")
+        output += self.collect(Run("iptables -L -n", head(30)), fallback='Permission denied - run with sudo')
         return output
     
     def check_updates(self):
         """Check for system updates"""
         output = "=== Checking for Updates ===\n"
-        # Detect package manager
-        if os.path.exists("/usr/bin/apt") or os.path.exists("/usr/bin/apt-get"):
+        package_manager = self.capabilities.package_manager
+        if package_manager == "apt":
             # Ubuntu/Debian
             output += "\n# APT Updates\n"
-            output += self.run_command("apt list --upgradable 2>/dev/null | head -n 20 || apt-get -s upgrade 2>/dev/null | grep '^Inst' | head -n 20")
-        elif os.path.exists("/usr/bin/zypper"):
+            output += self.collect(Run("apt list --upgradable", head(20)),
+                                   Run("apt-get -s upgrade", grep('^Inst'), head(20)))
+        elif package_manager == "zypper":
             # SUSE
             output += "\n# Zypper Updates\n"
-            output += self.run_command("zypper list-updates 2>/dev/null | head -n 20")
-        elif os.path.exists("/usr/bin/dnf"):
+            output += self.collect(Run("zypper list-updates", head(20)))
+        elif package_manager == "dnf":
             # RHEL 8+, Fedora
             output += "\n# DNF Updates\n"
-            output += self.run_command("dnf check-update 2>/dev/null | head -n 20")
-        elif os.path.exists("/usr/bin/yum"):
+            output += self.collect(Run("dnf check-update", head(20)))
+        elif package_manager == "yum":
             # RHEL 6/7
             output += "\n# YUM Updates\n"
-            output += self.run_command("yum check-update 2>/dev/null | head -n 20")
+            output += self.collect(Run("yum check-update", head(20)))
         else:
             output += "Package manager not detected"
         return output
@@ -285,7 +2846,7 @@ class Hnm_Linux_Bot:
         if cmd:
             confirm = input(f"Execute '{cmd}'? (yes/no): ").strip().lower()
             if confirm == 'yes':
-                return self.run_command(cmd)
+                return self.run_command(cmd, use_cache=False)
             else:
                 return "Command cancelled"
         return "No command entered"
@@ -296,23 +2857,23 @@ class Hnm_Linux_Bot:
         output += "\n# uname -a\n"
         output += self.run_command("uname -a")
         output += "\n# Server uptime\n"
-        output += self.run_command("uptime")
+        output += self.native_uptime()
         output += "\n# hostname\n"
         output += self.run_command("hostname")
         output += "\n# hostname -i\n"
         output += self.run_command("hostname -i")
         output += "\n# cat /etc/redhat-release\n"
-        output += self.run_command("cat /etc/redhat-release 2>/dev/null || cat /etc/os-release")
+        output += self.collect(Read("/etc/redhat-release"), Read("/etc/os-release"))
         output += "\n# Hardware Info\n"
-        output += self.run_command("dmidecode -t 1 2>/dev/null || echo 'Permission denied - run with sudo'")
+        output += self.collect(Run("dmidecode -t 1"), fallback='Permission denied - run with sudo')
         output += "\n# hponcfg -w /tmp/ilo.out\n"
-        output += self.run_command("hponcfg -w /tmp/ilo.out 2>/dev/null || echo 'hponcfg not available'")
+        output += self.run_tool("hponcfg", "hponcfg -w /tmp/ilo.out", "hponcfg not available")
         output += "\n# IPMI Tool\n"
-        output += self.run_command("ipmitool lan print 2>/dev/null || echo 'ipmitool not available'")
+        output += self.run_tool("ipmitool", "ipmitool lan print", "ipmitool not available")
         output += "\n# cat /etc/resolv.conf\n"
-        output += self.run_command("cat /etc/resolv.conf")
+        output += self.collect(Read("/etc/resolv.conf"))
         output += "\n# cat /etc/hosts\n"
-        output += self.run_command("cat /etc/hosts")
+        output += self.collect(Read("/etc/hosts"))
         return output
     
     def lvm_info(self):
@@ -323,168 +2884,359 @@ class Hnm_Linux_Bot:
         output += "\n# df -hT\n"
         output += self.run_command("df -hT")
         output += "\n# cat /etc/fstab\n"
-        output += self.run_command("cat /etc/fstab")
+        output += self.collect(Read("/etc/fstab"))
         output += "\n# pvs\n"
-        output += self.run_command("pvs 2>/dev/null || echo 'No LVM physical volumes or permission denied'")
+        output += self.run_tool("pvs", "pvs", "No LVM physical volumes or permission denied")
         output += "\n# vgs\n"
-        output += self.run_command("vgs 2>/dev/null || echo 'No LVM volume groups or permission denied'")
+        output += self.run_tool("vgs", "vgs", "No LVM volume groups or permission denied")
         output += "\n# lvs\n"
-        output += self.run_command("lvs 2>/dev/null || echo 'No LVM logical volumes or permission denied'")
+        output += self.run_tool("lvs", "lvs", "No LVM logical volumes or permission denied")
         output += "\n# cat /etc/iscsi/initiatorname.iscsi\n"
-        output += self.run_command("cat /etc/iscsi/initiatorname.iscsi 2>/dev/null || echo 'iSCSI not configured'")
+        output += self.collect(Read("/etc/iscsi/initiatorname.iscsi"), fallback='iSCSI not configured')
         output += "\n# iscsiadm -m session\n"
-        output += self.run_command("iscsiadm -m session 2>/dev/null || echo 'No iSCSI sessions'")
+        output += self.run_tool("iscsiadm", "iscsiadm -m session", "No iSCSI sessions")
         output += "\n# sanlun lun show\n"
-        output += self.run_command("sanlun lun show 2>/dev/null || echo 'sanlun not available'")
+        output += self.run_tool("sanlun", "sanlun lun show", "sanlun not available")
         output += "\n# multipath -ll\n"
-        output += self.run_command("multipath -ll 2>/dev/null || echo 'multipath not configured'")
+        output += self.run_tool("multipath", "multipath -ll", "multipath not configured")
         return output
     
     def network_config(self):
         """Network configuration details"""
         output = "=== Network Configuration ===\n"
         output += "\n# Network Interfaces\n"
-        output += self.run_command("ifconfig -a 2>/dev/null || ip addr show")
+        output += self.collect(Run("ifconfig -a"), Run("ip addr show"))
         output += "\n# Routing Table\n"
-        output += self.run_command("route -n 2>/dev/null || ip route")
+        output += self.collect(Run("route -n"), Run("ip route"))
         
         # Bonding info
         output += "\n# Bonding Status\n"
-        output += self.run_command("cat /proc/net/bonding/bond0 2>/dev/null || echo 'bond0 not configured'")
-        output += self.run_command("cat /proc/net/bonding/bond1 2>/dev/null || echo 'bond1 not configured'")
+        output += self.collect(Read("/proc/net/bonding/bond0"), fallback='bond0 not configured')
+        output += self.collect(Read("/proc/net/bonding/bond1"), fallback='bond1 not configured')
         
         # Network config files - RHEL/CentOS style
-        if os.path.exists("/etc/sysconfig/network-scripts"):
+        layouts = self.capabilities.network_layouts
+        if "rhel" in layouts:
             output += "\n# Network Scripts (RHEL/CentOS)\n"
-            output += self.run_command("cat /etc/sysconfig/network-scripts/ifcfg-bond0 2>/dev/null || echo 'bond0 config not found'")
-            output += self.run_command("cat /etc/sysconfig/network-scripts/ifcfg-bond1 2>/dev/null || echo 'bond1 config not found'")
-            output += self.run_command("cat /etc/sysconfig/network 2>/dev/null || echo 'File not found'")
+            output += self.collect(Read("/etc/sysconfig/network-scripts/ifcfg-bond0"), fallback='bond0 config not found')
+            output += self.collect(Read("/etc/sysconfig/network-scripts/ifcfg-bond1"), fallback='bond1 config not found')
+            output += self.collect(Read("/etc/sysconfig/network"), fallback='File not found')
         
         # Network config files - SUSE style
-        if os.path.exists("/etc/sysconfig/network"):
+        if "suse" in layouts:
             output += "\n# Network Config (SUSE)\n"
-            output += self.run_command("cat /etc/sysconfig/network/ifcfg-bond0 2>/dev/null || echo 'bond0 config not found'")
-            output += self.run_command("cat /etc/sysconfig/network/config 2>/dev/null || echo 'File not found'")
+            output += self.collect(Read("/etc/sysconfig/network/ifcfg-bond0"), fallback='bond0 config not found')
+            output += self.collect(Read("/etc/sysconfig/network/config"), fallback='File not found')
         
         # Network config files - Ubuntu/Debian style
-        if os.path.exists("/etc/network/interfaces"):
+        if "debian" in layouts:
             output += "\n# Network Interfaces (Ubuntu/Debian)\n"
-            output += self.run_command("cat /etc/network/interfaces 2>/dev/null || echo 'File not found'")
+            output += self.collect(Read("/etc/network/interfaces"), fallback='File not found')
         
         # Netplan (Ubuntu 18.04+)
-        if os.path.exists("/etc/netplan"):
+        if "netplan" in layouts:
             output += "\n# Netplan Config (Ubuntu 18.04+)\n"
-            output += self.run_command("cat /etc/netplan/*.yaml 2>/dev/null || echo 'No netplan config found'")
+            output += self.collect(Read("/etc/netplan/*.yaml"), fallback='No netplan config found')
         
         output += "\n# IPTables Mangle Rules\n"
-        output += self.run_command("iptables -t mangle -nvL 2>/dev/null || echo 'Permission denied - run with sudo'")
+        output += self.collect(Run("iptables -t mangle -nvL"), fallback='Permission denied - run with sudo')
         return output
     
     def user_config(self):
         """User and authentication configuration"""
         output = "=== User & Authentication Configuration ===\n"
         output += "\n# cat /etc/passwd\n"
-        output += self.run_command("cat /etc/passwd")
+        output += self.collect(Read("/etc/passwd"))
         output += "\n# cat /etc/shadow\n"
-        output += self.run_command("cat /etc/shadow 2>/dev/null || echo 'Permission denied - run with sudo'")
+        output += self.collect(Read("/etc/shadow"), fallback='Permission denied - run with sudo')
         output += "\n# cat /etc/sudoers\n"
-        output += self.run_command("cat /etc/sudoers 2>/dev/null | grep -v '#' || echo 'Permission denied'")
+        output += self.collect(Read("/etc/sudoers", drop_comments), fallback='Permission denied')
         output += "\n# User Authentication - NIS\n"
-        output += self.run_command("nisdomainname 2>/dev/null || echo 'NIS not configured'")
+        output += self.run_tool("nisdomainname", "nisdomainname", "NIS not configured")
         output += "\n# NIS config\n"
-        output += self.run_command("cat /etc/yp.conf 2>/dev/null || echo 'NIS not configured'")
+        output += self.collect(Read("/etc/yp.conf"), fallback='NIS not configured')
         output += "\n# ntpq -p\n"
-        output += self.run_command("ntpq -p 2>/dev/null || echo 'NTP not running'")
+        output += self.run_tool("ntpq", "ntpq -p", "NTP not running")
         output += "\n# cat /etc/ntp.conf\n"
-        output += self.run_command("cat /etc/ntp.conf 2>/dev/null | grep -v '#' || echo 'NTP not configured'")
+        output += self.collect(Read("/etc/ntp.conf", drop_comments), fallback='NTP not configured')
         output += "\n# cat /etc/chrony.conf\n"
-        output += self.run_command("cat /etc/chrony.conf 2>/dev/null | grep -v '#' || echo 'Chrony not configured'")
+        output += self.collect(Read("/etc/chrony.conf", drop_comments), fallback='Chrony not configured')
         output += "\n# crontab -l\n"
-        output += self.run_command("crontab -l 2>/dev/null || echo 'No crontab for current user'")
+        output += self.collect(Run("crontab -l"), fallback='No crontab for current user')
         return output
     
     def samba_config(self):
         """Samba and domain configuration"""
         output = "=== Samba & Domain Configuration ===\n"
         output += "\n# /etc/sssd/sssd.conf\n"
-        output += self.run_command("cat /etc/sssd/sssd.conf 2>/dev/null | grep -v '#' || echo 'SSSD not configured'")
+        output += self.collect(Read("/etc/sssd/sssd.conf", drop_comments), fallback='SSSD not configured')
         output += "\n# Kerberos Config\n"
-        output += self.run_command("cat /etc/krb5.conf 2>/dev/null || echo 'Kerberos not configured'")
+        output += self.collect(Read("/etc/krb5.conf"), fallback='Kerberos not configured')
         output += "\n# Samba config\n"
-        output += self.run_command("cat /etc/samba/smb.conf 2>/dev/null | grep -v '#' || echo 'Samba not configured'")
+        output += self.collect(Read("/etc/samba/smb.conf", drop_comments), fallback='Samba not configured')
         output += "\n# nsswitch config\n"
-        output += self.run_command("cat /etc/nsswitch.conf 2>/dev/null | grep -v '#' || echo 'File not found'")
+        output += self.collect(Read("/etc/nsswitch.conf", drop_comments), fallback='File not found')
         return output
     
     def cluster_info(self):
         """Cluster status information"""
         output = "=== Cluster Information ===\n"
         output += "\n# PCS Cluster\n"
-        output += self.run_command("pcs status 2>/dev/null || echo 'PCS cluster not configured'")
+        output += self.run_tool("pcs", "pcs status", "PCS cluster not configured")
         output += "\n# CRM Cluster\n"
-        output += self.run_command("crm status 2>/dev/null || echo 'CRM cluster not configured'")
+        output += self.run_tool("crm", "crm status", "CRM cluster not configured")
         output += "\n# HPSG Cluster\n"
-        output += self.run_command("cmviewcl -v 2>/dev/null || echo 'HPSG cluster not configured'")
+        output += self.run_tool("cmviewcl", "cmviewcl -v", "HPSG cluster not configured")
         output += "\n# Veritas Cluster\n"
-        output += self.run_command("hastatus -summary 2>/dev/null || echo 'Veritas cluster not configured'")
+        output += self.run_tool("hastatus", "hastatus -summary", "Veritas cluster not configured")
         return output
     
     def performance_report(self):
         """CPU and RAM utilization reports"""
         output = "=== Performance Reports ===\n"
         output += "\n# RAM Utilization (Current)\n"
-        output += self.run_command("free -g 2>/dev/null || free -m")
+        try:
+            output += render_free(read_meminfo(), 'g')
+        except (OSError, ValueError, IndexError):
+            output += self.collect(Run("free -g"), Run("free -m"))
         output += "\n# CPU Information\n"
-        output += self.run_command("lscpu 2>/dev/null || cat /proc/cpuinfo | grep -E 'processor|model name|cpu MHz' | head -n 20")
+        output += self.collect(Run("lscpu"), Read("/proc/cpuinfo", grep('processor|model name|cpu MHz'), head(20)))
         
         # Check if SAR is available
-        sar_check = self.run_command("which sar 2>/dev/null")
-        if sar_check.strip():
+        if self.capabilities.has("sar"):
+            start, end = self.sar_window()
             output += "\n# RAM Utilization (last 2 hours - SAR)\n"
-            output += self.run_command("sar -r -s $(date --date='2 hours ago' +%T 2>/dev/null) -e $(date +%T) 2>/dev/null || sar -r | tail -n 20")
+            output += self.collect(Run(f"sar -r -s {start} -e {end}"), Run("sar -r", tail(20)))
             output += "\n# CPU Utilization (last 2 hours - SAR)\n"
-            output += self.run_command("sar -u -s $(date --date='2 hours ago' +%T 2>/dev/null) -e $(date +%T) 2>/dev/null || sar -u | tail -n 20")
+            output += self.collect(Run(f"sar -u -s {start} -e {end}"), Run("sar -u", tail(20)))
+        elif self.sampler is not None and self.sampler.times.count:
+            output += "\n# CPU/RAM Utilization (last 2 hours - watch sampler)\n"
+            output += self.sampler.summary(WATCH_HISTORY_SECONDS / 60, ('cpu', 'memory', 'swap'))
         else:
-            output += "\n# SAR not available - Install sysstat package for historical data\n"
+            output += "\n# SAR not available - Install sysstat package or use 'watch start' for history\n"
             output += "\n# Current CPU Usage (top snapshot)\n"
-            output += self.run_command("top -bn1 | head -n 20")
+            output += self.collect(Run("top -bn1", head(20)))
         
         return output
     
+    def sar_window(self):
+        """(start, end) of the last 2 hours for sar -s/-e, fixed for the whole report"""
+        end = self._report_time or datetime.now()
+        start = end - timedelta(seconds=WATCH_HISTORY_SECONDS)
+        return start.strftime('%H:%M:%S'), end.strftime('%H:%M:%S')
+    
+    def plan_commands(self, section):
+        """Return the shell commands a section would run, without running them"""
+        self._plan = []
+        try:
+            section()
+            return self._plan
+        finally:
+            self._plan = None
+    
+    def report_sections(self):
+        """Sections of the full report, in report order"""
+        return [
+            ('system', self.system_info),
+            ('lvm', self.lvm_info),
+            ('netconfig', self.network_config),
+            ('userconfig', self.user_config),
+            ('samba', self.samba_config),
+            ('cluster', self.cluster_info),
+            ('performance', self.performance_report),
+        ]
+    
+    def iter_sections(self, sections):
+        """Yield (name, output) for each section in order as soon as it is ready"""
+        if self.workers <= 1:
+            for name, section in sections:
+                yield name, section()
+            return
+        
+        commands = []
+        for name, section in sections:
+            for cmd in self.plan_commands(section):
+                if cmd not in commands:
+                    commands.append(cmd)
+        
+        # The engine runs up to workers commands at a time
+        self._pending = {cmd: self.engine.schedule(self._cached_execute_async(cmd)) for cmd in commands}
+        try:
+            # Commands a section only decides to run at render time
+            # (e.g. depending on host state) simply run inline
+            for name, section in sections:
+                yield name, section()
+        finally:
+            # Stopped early (interrupt, error): kill whatever is still running
+            for future in self._pending.values():
+                future.cancel()
+            self._pending = {}
+    
+    def iter_report(self):
+        """Yield (name, output) of the report sections under the time budget
+        
+        With a budget, commands get adaptive timeouts capped by the deadline
+        and sections with timed out commands are marked.
+        """
+        self._timed_out = 0
+        self._deadline = time.monotonic() + self.report_budget if self.report_budget else None
+        self._report_time = datetime.now()
+        try:
+            for name, output in self.iter_sections(self.report_sections()):
+                if self._timed_out:
+                    output = f"⏱  TIMED OUT: {self._timed_out} command(s) in this section did not complete\n" + output
+                self._timed_out = 0
+                yield name, output
+        finally:
+            self._deadline = None
+            self._report_time = None
+            self._timed_out = 0
+    
+    @property
+    def archive(self):
+        return ReportArchive(os.path.join(STATE_DIR, ARCHIVE_DIR), os.uname()[1])
+    
     def full_report(self):
         """Generate complete system report"""
-        print("\n🔍 Generating full system report... This may take a moment.\n")
+        if self.interactive:
+            print("\n🔍 Generating full system report... This may take a moment.\n")
+        generated = datetime.now()
+        filename = f"system_report_{generated.strftime('%Y%m%d_%H%M%S')}.txt"
+        report = ReportWriter(filename, echo=sys.stdout if self.interactive else self.report_echo)
+        
+        header = "╔════════════════════════════════════════════════════════════╗\n"
+        header += "║              COMPLETE SYSTEM REPORT - HNM BOT              ║\n"
+        header += "╚════════════════════════════════════════════════════════════╝\n"
+        header += f"Generated: {generated.strftime('%Y-%m-%d %H:%M:%S')}\n"
+        header += "=" * 60 + "\n\n"
+        report.write(header)
+        
+        # Each section goes to the file, the console and the archive as soon
+        # as it is done; no section text is kept once it is written
+        timed_out_sections = []
+        sections = self._write_sections(report, timed_out_sections)
+        try:
+            try:
+                snapshot, new = self.archive.save(generated, sections)
+                archived = f"archived, {new} of {len(snapshot['sections'])} section(s) new"
+            except OSError as e:
+                archived = f"not archived: {str(e)}"
+                for _ in sections:
+                    pass  # the report itself still completes
+            if timed_out_sections:
+                report.write(f"⏱  Incomplete sections: {', '.join(timed_out_sections)}\n")
+        finally:
+            report.close()
+        
+        if report.error:
+            return f"⚠️  Could not save report to file: {report.error} ({archived})"
+        if timed_out_sections:
+            return f"✓ Report saved to: {filename} (timed out: {', '.join(timed_out_sections)}; {archived})"
+        return f"✓ Report saved to: {filename} ({archived})"
+    
+    def _write_sections(self, report, timed_out_sections):
+        """Write each report section to report, then yield it as (name, output)"""
+        for index, (name, output) in enumerate(self.iter_report()):
+            if index:
+                report.write("=" * 60 + "\n\n")
+            report.write(output + "\n\n")
+            if output.startswith("⏱"):
+                timed_out_sections.append(name)
+            yield name, output
+    
+    def report_history(self, *args):
+        """Archived versions of one report section ('history lvm --since 30d')"""
+        store = self.archive
+        if not args:
+            return store.summary()
+        section = args[0]
+        names = [name for name, method in self.report_sections()]
+        if section not in names:
+            return f"❌ Unknown section '{section}' ({', '.join(names)})"
+        since = None
+        if len(args) >= 3 and args[1] == '--since':
+            try:
+                since = parse_since(args[2])
+            except ValueError:
+                return f"❌ Invalid --since '{args[2]}' (e.g. 30d, 12h, 2w or 2024-01-31)"
+        return store.history(section, since) or f"No archived '{section}' sections for that period"
+    
+    def diff_report(self, *args):
+        """Collect a report and show only what changed since the last snapshot
+        
+        'diff last' compares the two most recent snapshots without collecting.
+        """
+        store = self.archive
+        if args and args[0] == 'last':
+            snapshots = store.snapshots()
+            if len(snapshots) < 2:
+                return "Need two archived reports to compare; run 'fullreport' or 'diff' first"
+            old, new = snapshots[-2], snapshots[-1]
+            texts = None
+        else:
+            if self.interactive:
+                print("\n🔍 Collecting report to compare with the last snapshot...\n")
+            old = store.latest()
+            generated = datetime.now()
+            sections = list(self.iter_report())
+            try:
+                new, _ = store.save(generated, sections)
+            except OSError as e:
+                return f"⚠️  Could not archive report: {str(e)}"
+            if old is None:
+                return "No previous report in the archive; this one is saved as the baseline"
+            texts = dict(sections)
+        
+        changed, diff = store.diff(old, new, texts)
+        unchanged = len(new['sections']) - len(changed)
         output = "╔════════════════════════════════════════════════════════════╗\n"
-        output += "║              COMPLETE SYSTEM REPORT - HNM BOT              ║\n"
+        output += "║                DELTA SYSTEM REPORT - HNM BOT               ║\n"
         output += "╚════════════════════════════════════════════════════════════╝\n"
-        output += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        output += "=" * 60 + "\n\n"
-        
-        output += self.system_info() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.lvm_info() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.network_config() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.user_config() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.samba_config() + "\n\n"
+        output += f"Host: {new['host']}\n"
+        output += f"Compared: {old['generated']} -> {new['generated']}\n"
+        output += f"Changed sections: {', '.join(changed) or 'none'} ({unchanged} unchanged)\n"
         output += "=" * 60 + "\n\n"
-        output += self.cluster_info() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.performance_report() + "\n\n"
+        output += diff
+        if not changed or texts is None:
+            return output
         
-        # Save to file
-        filename = f"system_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        filename = f"system_delta_{new['generated'].replace('-', '').replace(':', '').replace('T', '_')}.txt"
         try:
             with open(filename, 'w') as f:
                 f.write(output)
-            output += f"\n✓ Report saved to: {filename}\n"
+            output += f"✓ Delta saved to: {filename}\n"
         except Exception as e:
-            output += f"\n⚠️  Could not save report to file: {str(e)}\n"
-        
+            output += f"⚠️  Could not save delta to file: {str(e)}\n"
         return output
     
+    def batch_commands(self):
+        """Commands that can run non-interactively via --run"""
+        return [name for name in self.commands if name not in INTERACTIVE_COMMANDS]
+    
+    def run_batch(self, names, fmt, stream):
+        """Run commands without the prompt and return the exit status"""
+        self.interactive = False
+        self.report_echo = stream if fmt == 'text' else None
+        timeouts = self.stats.timeouts()
+        status = EXIT_OK
+        for name in names:
+            try:
+                if fmt != 'text' and name in self.structured:
+                    self.emit_structured(name, stream, fmt)
+                    continue
+                result = self.commands[name]() or ""
+            except Exception as e:
+                sys.stderr.write(f"❌ {name}: {str(e)}\n")
+                status = EXIT_COLLECTOR_FAILED
+                continue
+            if fmt == 'text':
+                stream.write(result + "\n\n")
+            else:
+                write_text_result(stream, name, result, fmt, host=os.uname()[1])
+        if self.stats.timeouts() > timeouts:
+            status = EXIT_COLLECTOR_FAILED
+        return status
+    
     def exit_bot(self):
         """Exit the bot"""
         print("\n👋 Goodbye! Stay secure!")
@@ -492,6 +3244,15 @@ class Hnm_Linux_Bot:
     
     def start(self):
         """Start the chatbot"""
+        self.detect_os()
+        # Without sysstat keep our own CPU/RAM history for performance
+        if not self.capabilities.has("sar"):
+            try:
+                interval = float(os.environ.get("HNM_WATCH_INTERVAL", WATCH_INTERVAL))
+            except ValueError:
+                interval = WATCH_INTERVAL
+            if interval > 0:
+                self.start_watch(interval)
         print("╔════════════════════════════════════════════════════════════╗")
         print("║           🐧 HNM Bot - Your CLI Assistant 🐧              ║")
         print("╚════════════════════════════════════════════════════════════╝")
@@ -503,13 +3264,18 @@ class Hnm_Linux_Bot:
         
         while True:
             try:
-                user_input = input("🐧 hnm-bot> ").strip().lower()
+                user_input = input("🐧 hnm-bot> ").strip()
                 
                 if not user_input:
                     continue
                 
+                user_input, *args = user_input.split()
+                user_input = user_input.lower()
                 if user_input in self.commands:
-                    result = self.commands[user_input]()
+                    if self.output_format != 'text' and user_input in self.structured:
+                        result = self.emit_structured(user_input, sys.stdout)
+                    else:
+                        result = self.commands[user_input](*args)
                     if result:
                         print(f"\n{result}\n")
                 else:
@@ -525,7 +3291,55 @@ class Hnm_Linux_Bot:
             except Exception as e:
                 print(f"\n❌ Error: {str(e)}\n")
 
+def main(argv=None):
+    """Interactive prompt, or batch mode when --run is given"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        Hnm_Linux_Bot().start()
+        return EXIT_OK
+    
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="hnm_linux_bot.py",
+        description="HNM Bot - Linux system administration assistant",
+        epilog="Without --run the interactive prompt starts. Exit status: 0 success, "
+               "1 a command failed or timed out, 2 usage error, 3 output not writable.")
+    parser.add_argument("--run", metavar="LIST", help="comma separated commands to run, e.g. disk,memory,lvm")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="output format (default: text)")
+    parser.add_argument("--output", metavar="PATH", help="write results to PATH instead of stdout")
+    parser.add_argument("--workers", type=int, help="fullreport worker pool size (1 = serial)")
+    parser.add_argument("--budget", type=float, help="fullreport time budget in seconds (0 = none)")
+    args = parser.parse_args(argv)
+    
+    bot = Hnm_Linux_Bot(workers=args.workers, report_budget=args.budget)
+    if args.run is None:
+        bot.start()
+        return EXIT_OK
+    
+    names = [name.strip().lower() for name in args.run.split(',') if name.strip()]
+    available = bot.batch_commands()
+    unknown = [name for name in names if name not in available]
+    if not names or unknown:
+        sys.stderr.write(f"❌ Unknown command(s): {', '.join(unknown) or '(none given)'}\n")
+        sys.stderr.write(f"Available: {', '.join(available)}\n")
+        return EXIT_USAGE
+    
+    try:
+        stream = open(args.output, 'w') if args.output else sys.stdout
+    except OSError as e:
+        sys.stderr.write(f"❌ Cannot open output file: {str(e)}\n")
+        return EXIT_OUTPUT_FAILED
+    try:
+        status = bot.run_batch(names, args.format, stream)
+        stream.flush()
+    except OSError as e:
+        sys.stderr.write(f"❌ Cannot write output: {str(e)}\n")
+        status = EXIT_OUTPUT_FAILED
+    finally:
+        if args.output:
+            stream.close()
+    return status
+
 if __name__ == "__main__":
-    bot = Hnm_Linux_Bot()
-    bot.start()
+    sys.exit(main())
 
@@ -5,21 +5,1494 @@ HNM Remote Bot - Remote Linux system administration tool via SSH
 Built by: Harihar Mishra
 
 Version: 1.0.0
+
+Each bot is one self-contained script (it is installed by copying that
+file), so the code both need - the typed records and their parsers,
+CommandEngine, ReportArchive, parse_since - is kept as identical copies
+in the two bots; tests/test_shared_code.py checks that they match.
 """
 
+import atexit
 import subprocess
 import sys
 import os
-from datetime import datetime
+import fcntl
+import hashlib
+import json
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
 import getpass
 
-class Hnm_Remote_Bot:
+# Latency samples kept per command for the 'stats' percentiles
+STATS_MAX_SAMPLES = 512
+
+# Concurrent ssh sessions during fullreport (override with HNM_BOT_WORKERS,
+# 1 = serial); kept below the sshd MaxStartups default of 10
+DEFAULT_WORKERS = 4
+
+# Per-command timeout outside of a report deadline (seconds)
+COMMAND_TIMEOUT = 60
+
+# Seconds to wait for the multiplexing master to authenticate (key auth;
+# a password prompt waits for the user)
+SSH_MASTER_TIMEOUT = 30
+
+# How report commands are shipped: 'report' = the whole fullreport as one
+# remote script, 'section' = one script per section, 'off' = one ssh
+# invocation per command (override with HNM_REMOTE_BATCH)
+BATCH_MODES = ('report', 'section', 'off')
+DEFAULT_BATCH_MODE = 'report'
+
+# Report sections the collector agent can gather in one remote Python run
+# (--agent, HNM_REMOTE_AGENT=1); others always use shell commands
+AGENT_SECTIONS = ('system', 'lvm', 'netconfig', 'userconfig', 'samba', 'cluster', 'performance')
+
+# Compression of remote output (override with HNM_REMOTE_COMPRESS): 'gzip'
+# compresses each command's output on the host, 'ssh' uses ssh transport
+# compression (-C), 'auto' is gzip once a burst of at least
+# BANDWIDTH_SAMPLE_BYTES of one command's output (no pause longer than
+# BURST_GAP seconds) arrived at less than COMPRESS_BELOW_BPS
+COMPRESS_MODES = ('auto', 'gzip', 'ssh', 'off')
+DEFAULT_COMPRESS_MODE = 'auto'
+COMPRESS_BELOW_BPS = 4 * 1024 * 1024
+BANDWIDTH_SAMPLE_BYTES = 64 * 1024
+BURST_GAP = 0.5
+
+# Fleet mode (--inventory): hosts handled at a time, the default per-host
+# time limit, and the file descriptors one host needs (ssh pipes, output
+# files) when sizing the pool against RLIMIT_NOFILE
+DEFAULT_FLEET_WORKERS = 16
+DEFAULT_HOST_TIMEOUT = 600
+FLEET_FDS_PER_HOST = 6
+
+# Command engine: bytes per read from a child's pipes and the most output
+# kept per command (the rest is drained and counted, not stored)
+ENGINE_READ_CHUNK = 64 * 1024
+ENGINE_MAX_OUTPUT = 16 * 1024 * 1024
+
+# Total time budget for fullreport (override with HNM_REPORT_BUDGET, 0 = none)
+DEFAULT_REPORT_BUDGET = 600
+
+# Where the report archive and other state live (override with HNM_STATE_DIR)
+STATE_DIR = os.environ.get("HNM_STATE_DIR") or os.path.expanduser("~/.hnm_bot")
+
+# Report archive: compression of the section blocks (HNM_ARCHIVE_CODEC=lzma
+# compresses harder at more CPU)
+ARCHIVE_DIR = "archive"
+ARCHIVE_CODEC = os.environ.get("HNM_ARCHIVE_CODEC", "gzip")
+
+# Output formats for the record-backed commands
+OUTPUT_FORMATS = ('text', 'json', 'ndjson')
+
+# Commands that prompt or exit, not available to --run
+INTERACTIVE_COMMANDS = ('connect', 'disconnect', 'exit', 'quit')
+
+# Exit status of the batch mode (--run)
+EXIT_OK = 0
+EXIT_COLLECTOR_FAILED = 1
+EXIT_USAGE = 2
+EXIT_OUTPUT_FAILED = 3
+EXIT_CONNECT_FAILED = 4
+
+
+class MemInfo:
+    """Parsed /proc/meminfo (values in kB, file order preserved)"""
+    __slots__ = ('fields',)
+    
+    def __init__(self, fields):
+        self.fields = fields
+    
+    def kb(self, key):
+        return self.fields.get(key, (0, ''))[0]
+
+
+def parse_meminfo(text):
+    """Parse /proc/meminfo content into a MemInfo record"""
+    fields = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts:
+            fields[key] = (int(parts[0]), parts[1] if len(parts) > 1 else '')
+    return MemInfo(fields)
+
+
+# ----------------------------------------------------------------------
+# Structured records
+#
+# Parsed forms of the df, free, ss, ps, lsblk, pvs/vgs/lvs and uptime
+# results, emitted by the json/ndjson output formats.
+# ----------------------------------------------------------------------
+
+class Record:
+    """Base for the typed records behind structured output"""
+    __slots__ = ()
+    kind = 'record'
+    
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+    
+    def to_dict(self):
+        data = {'type': self.kind}
+        for name in self.__slots__:
+            data[name] = getattr(self, name)
+        return data
+
+
+class DiskUsage(Record):
+    __slots__ = ('filesystem', 'fstype', 'size_bytes', 'used_bytes', 'available_bytes',
+                 'use_percent', 'mountpoint')
+    kind = 'disk_usage'
+
+
+class MemoryUsage(Record):
+    __slots__ = ('total_bytes', 'used_bytes', 'free_bytes', 'shared_bytes', 'buff_cache_bytes',
+                 'available_bytes', 'swap_total_bytes', 'swap_used_bytes', 'swap_free_bytes')
+    kind = 'memory'
+
+
+class SocketEntry(Record):
+    __slots__ = ('netid', 'state', 'recv_q', 'send_q', 'local_address', 'local_port',
+                 'peer_address', 'peer_port')
+    kind = 'socket'
+
+
+class ProcessEntry(Record):
+    __slots__ = ('user', 'pid', 'cpu_percent', 'mem_percent', 'vsz_kb', 'rss_kb', 'tty',
+                 'stat', 'start', 'time', 'command')
+    kind = 'process'
+
+
+class BlockDevice(Record):
+    __slots__ = ('name', 'maj_min', 'size_bytes', 'read_only', 'devtype', 'mountpoint')
+    kind = 'block_device'
+
+
+class PhysicalVolume(Record):
+    __slots__ = ('pv_name', 'vg_name', 'fmt', 'attr', 'size_bytes', 'free_bytes')
+    kind = 'lvm_pv'
+
+
+class VolumeGroup(Record):
+    __slots__ = ('vg_name', 'pv_count', 'lv_count', 'attr', 'size_bytes', 'free_bytes')
+    kind = 'lvm_vg'
+
+
+class LogicalVolume(Record):
+    __slots__ = ('lv_name', 'vg_name', 'attr', 'size_bytes', 'pool_lv', 'origin')
+    kind = 'lvm_lv'
+
+
+class UptimeStatus(Record):
+    __slots__ = ('uptime_seconds', 'boot_time', 'users', 'load1', 'load5', 'load15')
+    kind = 'uptime'
+
+
+UPTIME_RECORDS_CMD = "cat /proc/uptime /proc/loadavg; who | wc -l"
+
+# Machine friendly variants of the text commands, parsed by the functions below
+DF_RECORDS_CMD = "df -P -T -B1 2>/dev/null"
+SS_RECORDS_CMD = "ss -tuna 2>/dev/null"
+PS_RECORDS_CMD = "ps aux --sort=-%cpu 2>/dev/null"
+LSBLK_RECORDS_CMD = "lsblk -b -P -o NAME,MAJ:MIN,SIZE,RO,TYPE,MOUNTPOINT 2>/dev/null"
+LVM_RECORDS_CMDS = (
+    (PhysicalVolume, "pvs --noheadings --units b --nosuffix --separator '|' "
+                     "-o pv_name,vg_name,pv_fmt,pv_attr,pv_size,pv_free 2>/dev/null"),
+    (VolumeGroup, "vgs --noheadings --units b --nosuffix --separator '|' "
+                  "-o vg_name,pv_count,lv_count,vg_attr,vg_size,vg_free 2>/dev/null"),
+    (LogicalVolume, "lvs --noheadings --units b --nosuffix --separator '|' "
+                    "-o lv_name,vg_name,lv_attr,lv_size,pool_lv,origin 2>/dev/null"),
+)
+
+_LSBLK_PAIR = re.compile(r'([A-Z:_-]+)="([^"]*)"')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_address(address):
+    """Split 'host:port' / '[v6]:port' as printed by ss"""
+    host, _, port = address.rpartition(':')
+    return host.strip('[]'), port
+
+
+def parse_df(text):
+    """Parse 'df -P -T -B1' output into DiskUsage records"""
+    for line in text.splitlines()[1:]:
+        parts = line.split(None, 6)
+        if len(parts) < 7:
+            continue
+        yield DiskUsage(parts[0], parts[1], _to_int(parts[2]), _to_int(parts[3]),
+                        _to_int(parts[4]), _to_int(parts[5].rstrip('%')), parts[6])
+
+
+def parse_ss(text):
+    """Parse 'ss -tuna' output into SocketEntry records"""
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 6 or parts[0] == 'Netid':
+            continue
+        local_address, local_port = _split_address(parts[4])
+        peer_address, peer_port = _split_address(parts[5])
+        yield SocketEntry(parts[0], parts[1], _to_int(parts[2]), _to_int(parts[3]),
+                          local_address, local_port, peer_address, peer_port)
+
+
+def parse_ps(text):
+    """Parse 'ps aux' output into ProcessEntry records"""
+    for line in text.splitlines()[1:]:
+        parts = line.split(None, 10)
+        if len(parts) < 11:
+            continue
+        yield ProcessEntry(parts[0], _to_int(parts[1]), _to_float(parts[2]), _to_float(parts[3]),
+                           _to_int(parts[4]), _to_int(parts[5]), parts[6], parts[7], parts[8],
+                           parts[9], parts[10])
+
+
+def parse_lsblk(text):
+    """Parse 'lsblk -b -P' key="value" output into BlockDevice records"""
+    for line in text.splitlines():
+        fields = dict(_LSBLK_PAIR.findall(line))
+        if 'NAME' not in fields:
+            continue
+        yield BlockDevice(fields['NAME'], fields.get('MAJ:MIN', fields.get('MAJ_MIN')),
+                          _to_int(fields.get('SIZE')), fields.get('RO') == '1', fields.get('TYPE'),
+                          fields.get('MOUNTPOINT') or None)
+
+
+def parse_lvm(text, record_class):
+    """Parse '|' separated pvs/vgs/lvs reports into record_class records"""
+    for line in text.splitlines():
+        parts = [part.strip() for part in line.strip().split('|')]
+        if len(parts) != len(record_class.__slots__):
+            continue
+        values = []
+        for name, part in zip(record_class.__slots__, parts):
+            if name.endswith('_bytes') or name.endswith('_count'):
+                values.append(_to_int(part.split('.')[0]))
+            else:
+                values.append(part or None)
+        yield record_class(*values)
+
+
+def parse_uptime_status(text, now=None):
+    """Parse the output of UPTIME_RECORDS_CMD into an UptimeStatus record"""
+    lines = text.split("\n")
+    uptime_seconds = float(lines[0].split()[0])
+    load = lines[1].split()
+    now = now or time.time()
+    boot_time = datetime.fromtimestamp(now - uptime_seconds).replace(microsecond=0).isoformat()
+    return UptimeStatus(uptime_seconds, boot_time, _to_int(lines[2].strip()),
+                        float(load[0]), float(load[1]), float(load[2]))
+
+
+def memory_record(mem):
+    """MemoryUsage record from a MemInfo record (same arithmetic as free)"""
+    total = mem.kb("MemTotal")
+    free = mem.kb("MemFree")
+    buffers = mem.kb("Buffers")
+    cache = mem.kb("Cached") + mem.kb("SReclaimable")
+    used = total - free - buffers - cache
+    if used < 0:
+        used = total - free
+    available = mem.kb("MemAvailable") if "MemAvailable" in mem.fields else free + buffers + cache
+    swap_total = mem.kb("SwapTotal")
+    swap_free = mem.kb("SwapFree")
+    return MemoryUsage(*(value * 1024 for value in (
+        total, used, free, mem.kb("Shmem"), buffers + cache, available,
+        swap_total, swap_total - swap_free, swap_free)))
+
+
+def write_records(stream, collector, records, fmt, host=None):
+    """Write records as one JSON document or as NDJSON lines"""
+    if fmt == 'ndjson':
+        for record in records:
+            data = record.to_dict()
+            data['collector'] = collector
+            stream.write(json.dumps(data, separators=(',', ':')) + "\n")
+        return
+    document = {
+        'collector': collector,
+        'host': host,
+        'generated': datetime.now().isoformat(),
+        'records': [record.to_dict() for record in records],
+    }
+    stream.write(json.dumps(document, separators=(',', ':')) + "\n")
+
+
+def write_text_result(stream, collector, text, fmt, host=None):
+    """Write the text output of a command that has no records as json/ndjson"""
+    if fmt == 'ndjson':
+        data = {'type': 'text', 'collector': collector, 'output': text}
+    else:
+        data = {'collector': collector, 'host': host, 'generated': datetime.now().isoformat(),
+                'output': text}
+    stream.write(json.dumps(data, separators=(',', ':')) + "\n")
+
+
+class CommandStats:
+    """Per-command latency, exit status and output size counters"""
+    
+    def __init__(self, max_samples=STATS_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.commands = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def record(self, cmd, elapsed, returncode, timed_out, stdout_bytes, stderr_bytes, wire_bytes=None):
+        """wire_bytes: what crossed the network when the output came compressed"""
+        with self.lock:
+            entry = self.commands.get(cmd)
+            if entry is None:
+                entry = self.commands[cmd] = {
+                    'samples': deque(maxlen=self.max_samples),
+                    'count': 0,
+                    'timeouts': 0,
+                    'failures': 0,
+                    'total_time': 0.0,
+                    'stdout_bytes': 0,
+                    'stderr_bytes': 0,
+                    'wire_bytes': 0,
+                    'last_exit_status': None,
+                }
+            entry['samples'].append(elapsed)
+            entry['count'] += 1
+            entry['total_time'] += elapsed
+            entry['stdout_bytes'] += stdout_bytes
+            entry['stderr_bytes'] += stderr_bytes
+            entry['wire_bytes'] += stdout_bytes + stderr_bytes if wire_bytes is None else wire_bytes
+            entry['last_exit_status'] = returncode
+            if timed_out:
+                entry['timeouts'] += 1
+            elif returncode != 0:
+                entry['failures'] += 1
+    
+    @staticmethod
+    def percentile(ordered, pct):
+        if not ordered:
+            return 0.0
+        index = max(0, int(round(pct / 100.0 * len(ordered))) - 1)
+        return ordered[min(index, len(ordered) - 1)]
+    
+    def rows(self):
+        """One summary dict per command (times in milliseconds)"""
+        with self.lock:
+            items = [(cmd, dict(entry, samples=sorted(entry['samples'])))
+                     for cmd, entry in self.commands.items()]
+        rows = []
+        for cmd, entry in items:
+            samples = entry['samples']
+            rows.append({
+                'command': cmd,
+                'count': entry['count'],
+                'mean_ms': round(1000 * entry['total_time'] / entry['count'], 2),
+                'p50_ms': round(1000 * self.percentile(samples, 50), 2),
+                'p90_ms': round(1000 * self.percentile(samples, 90), 2),
+                'p99_ms': round(1000 * self.percentile(samples, 99), 2),
+                'max_ms': round(1000 * samples[-1], 2),
+                'total_ms': round(1000 * entry['total_time'], 2),
+                'timeouts': entry['timeouts'],
+                'failures': entry['failures'],
+                'stdout_bytes': entry['stdout_bytes'],
+                'stderr_bytes': entry['stderr_bytes'],
+                'wire_bytes': entry['wire_bytes'],
+                'last_exit_status': entry['last_exit_status'],
+            })
+        return rows
+    
+    def summary(self, top=10):
+        rows = self.rows()
+        if not rows:
+            return "No commands recorded yet"
+        
+        def shorten(cmd, width=60):
+            return cmd if len(cmd) <= width else cmd[:width - 3] + "..."
+        
+        output = "=== Command Statistics ===\n"
+        output += f"Commands: {len(rows)}  Invocations: {sum(r['count'] for r in rows)}  "
+        output += f"Timeouts: {sum(r['timeouts'] for r in rows)}  Failures: {sum(r['failures'] for r in rows)}  "
+        output += f"Total time: {sum(r['total_ms'] for r in rows) / 1000:.2f}s\n"
+        size = sum(r['stdout_bytes'] + r['stderr_bytes'] for r in rows)
+        wire = sum(r['wire_bytes'] for r in rows)
+        output += f"Output: {size} bytes, {wire} on the wire"
+        output += f" ({100 - 100 * wire / size:.0f}% saved by compression)\n" if wire < size else "\n"
+        
+        header = f"{'COUNT':>6} {'P50ms':>9} {'P90ms':>9} {'P99ms':>9} {'MAXms':>9} {'T/O':>4} {'OUT':>9} {'ERR':>7} {'WIRE':>9}  COMMAND\n"
+        output += "\n# Slowest commands (by p90)\n" + header
+        for row in sorted(rows, key=lambda r: r['p90_ms'], reverse=True)[:top]:
+            output += (f"{row['count']:>6} {row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+                       f"{row['max_ms']:>9.1f} {row['timeouts']:>4} {row['stdout_bytes']:>9} {row['stderr_bytes']:>7} {row['wire_bytes']:>9}  "
+                       f"{shorten(row['command'])}\n")
+        output += "\n# Most time spent (total)\n"
+        for row in sorted(rows, key=lambda r: r['total_ms'], reverse=True)[:top]:
+            output += f"{row['total_ms'] / 1000:>9.2f}s  {row['count']:>5}x  {shorten(row['command'])}\n"
+        return output
+    
+    def timeouts(self):
+        """Total number of timed out invocations"""
+        with self.lock:
+            return sum(entry['timeouts'] for entry in self.commands.values())
+    
+    def export_json(self, filename, **meta):
+        """Write all counters to filename as JSON"""
+        document = dict(meta)
+        document['generated'] = datetime.now().isoformat()
+        document['commands'] = self.rows()
+        with open(filename, 'w') as f:
+            json.dump(document, f, indent=2)
+
+
+class CommandResult:
+    """Outcome of one command (elapsed is None when it never started)
+    
+    wire_bytes is set when the output arrived compressed.
+    """
+    __slots__ = ('output', 'returncode', 'timed_out', 'elapsed', 'stdout_bytes', 'stderr_bytes', 'wire_bytes')
+    
+    def __init__(self, output, returncode=0, timed_out=False, elapsed=None, stdout_bytes=0, stderr_bytes=0,
+                 wire_bytes=None):
+        self.output = output
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.elapsed = elapsed
+        self.stdout_bytes = stdout_bytes
+        self.stderr_bytes = stderr_bytes
+        self.wire_bytes = wire_bytes
+
+
+# asyncio takes a noticeable time to import and most runs never start a
+# CommandEngine; the first engine imports it, the engine methods use it
+asyncio = None
+
+
+def _import_asyncio():
+    global asyncio
+    import asyncio
+
+
+class CommandEngine:
+    """asyncio subprocess engine running its event loop in a daemon thread
+    
+    Synchronous code schedules coroutines with schedule(), which returns a
+    concurrent.futures.Future (cancelling it kills the process), or runs
+    them to completion with call(). Children are started with
+    create_subprocess_exec in their own session, at most concurrency at a
+    time, their pipes are read incrementally, and a timeout or
+    cancellation kills the whole process group.
+    """
+    
+    def __init__(self, concurrency=DEFAULT_WORKERS):
+        _import_asyncio()
+        self.concurrency = max(1, concurrency)
+        self.loop = asyncio.new_event_loop()
+        if sys.version_info < (3, 8):
+            # Before 3.8 the child watcher has to be attached from the main thread
+            asyncio.get_child_watcher().attach_loop(self.loop)
+        self._semaphore = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="hnm-engine", daemon=True)
+        self._thread.start()
+    
+    def schedule(self, coro):
+        """Run coro on the engine loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def call(self, coro):
+        """Run coro on the engine loop and wait for its result"""
+        future = self.schedule(coro)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+    
+    def run_sync(self, argv, timeout=COMMAND_TIMEOUT, deadline=None, input=None):
+        return self.call(self.run(argv, timeout, deadline, input=input))
+    
+    async def run(self, argv, timeout=COMMAND_TIMEOUT, deadline=None, on_output=None, input=None):
+        """Run argv and return a CommandResult
+        
+        deadline (time.monotonic) caps the timeout once a slot is free;
+        on_output(name, chunk) sees stdout/stderr data as it arrives;
+        input (bytes) is written to the child's stdin.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return CommandResult("Skipped: report deadline reached\n", -1, timed_out=True)
+            started = time.monotonic()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv, stdin=subprocess.DEVNULL if input is None else subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE, start_new_session=True)
+            except OSError as e:
+                return CommandResult(f"Error executing command: {str(e)}", -1, elapsed=time.monotonic() - started)
+            stdout = bytearray()
+            stderr = bytearray()
+            try:
+                stdout_bytes, stderr_bytes, returncode = await asyncio.wait_for(
+                    self._communicate(proc, stdout, stderr, on_output, input), timeout)
+            except asyncio.TimeoutError:
+                await self._kill(proc)
+                return CommandResult(f"Command timed out after {timeout:.0f} seconds\n", -1, timed_out=True,
+                                     elapsed=time.monotonic() - started)
+            except asyncio.CancelledError:
+                await self._kill(proc)
+                raise
+            output = (stdout or stderr).decode('utf-8', 'replace')
+            return CommandResult(output, returncode, elapsed=time.monotonic() - started,
+                                 stdout_bytes=stdout_bytes, stderr_bytes=stderr_bytes)
+    
+    @classmethod
+    async def _communicate(cls, proc, stdout, stderr, on_output, input=None):
+        """Read both pipes while waiting for proc; returns (stdout bytes, stderr bytes, returncode)"""
+        steps = [cls._drain(proc.stdout, stdout, 'stdout', on_output),
+                 cls._drain(proc.stderr, stderr, 'stderr', on_output),
+                 proc.wait()]
+        if input is not None:
+            steps.append(cls._feed(proc.stdin, input))
+        return (await asyncio.gather(*steps))[:3]
+    
+    @staticmethod
+    async def _feed(stream, data):
+        """Write data to the child's stdin and close it (a child exiting early is fine)"""
+        try:
+            stream.write(data)
+            await stream.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream.close()
+    
+    @staticmethod
+    async def _drain(stream, buffer, name, on_output):
+        """Read stream to EOF into buffer (up to ENGINE_MAX_OUTPUT); returns the bytes read"""
+        total = 0
+        while True:
+            chunk = await stream.read(ENGINE_READ_CHUNK)
+            if not chunk:
+                return total
+            total += len(chunk)
+            if on_output is not None:
+                on_output(name, chunk)
+            if len(buffer) < ENGINE_MAX_OUTPUT:
+                buffer += chunk[:ENGINE_MAX_OUTPUT - len(buffer)]
+    
+    @staticmethod
+    async def _kill(proc):
+        """SIGKILL the process group of proc and reap it"""
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        try:
+            await asyncio.wait_for(proc.wait(), 5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def archive_codec(name):
+    """(compress, decompress) of an archive codec, imported on first use
+    
+    Raises ImportError for an unknown codec or lzma on a Python built
+    without liblzma.
+    """
+    if name == 'gzip':
+        import gzip
+        return gzip.compress, gzip.decompress
+    if name == 'lzma':
+        import lzma
+        return lzma.compress, lzma.decompress
+    raise ImportError(f"unknown archive codec '{name}'")
+
+
+def parse_since(value):
+    """datetime for '30d', '12h', '2w', '45m' or a YYYY-MM-DD date"""
+    match = re.match(r'^(\d+)([mhdw])$', value)
+    if match:
+        unit = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}[match.group(2)]
+        return datetime.now() - timedelta(**{unit: int(match.group(1))})
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+class ReportArchive:
+    """Append-only compressed archive of the report sections of one host
+    
+    Sections rendered by another collector than the shell commands (the
+    remote python agent) are tagged with it; diff never compares versions
+    from different collectors, whose layouts differ.
+    """
+    
+    def __init__(self, root, host, codec=ARCHIVE_CODEC):
+        self.host = host
+        self.root = os.path.join(root, host)
+        self.data_file = os.path.join(self.root, "reports.dat")
+        self.index_file = os.path.join(self.root, "index.jsonl")
+        try:
+            archive_codec(codec)
+            self.codec = codec
+        except ImportError:
+            self.codec = 'gzip'
+        self.entries = []
+        self.blocks = {}
+        self._index_read = 0
+        self._read_index()
+    
+    def _read_index(self):
+        """Load the index entries appended since the last read"""
+        try:
+            with open(self.index_file, 'rb') as f:
+                f.seek(self._index_read)
+                lines = f.read()
+        except OSError:
+            return
+        self._index_read += len(lines)
+        for line in lines.splitlines():
+            try:
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue  # torn write at the end of the index
+            self.entries.append(entry)
+            self.blocks[entry['sha256']] = entry
+    
+    def save(self, generated, sections, collectors=None):
+        """Append a report; returns (snapshot, number of newly stored sections)
+        
+        sections is an iterable of (name, text), each stored as it comes
+        (a generator need not hold the whole report). collectors maps
+        section names to their collector when not 'shell'.
+        """
+        collectors = collectors or {}
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        stamp = generated.isoformat(timespec='seconds')
+        compress = archive_codec(self.codec)[0]
+        entries = []
+        new = 0
+        # Blocks first, index last: an interrupted save leaves no dangling entries.
+        # Other processes may save reports of the same host, so every append
+        # holds an exclusive flock on the data file
+        with open(self.data_file, 'ab') as data:
+            for name, text in sections:
+                raw = text.encode()
+                digest = hashlib.sha256(raw).hexdigest()
+                block = self.blocks.get(digest)
+                if block is None:
+                    payload = compress(raw)
+                    fcntl.flock(data, fcntl.LOCK_EX)
+                    try:
+                        offset = data.seek(0, os.SEEK_END)
+                        data.write(payload)
+                        data.flush()
+                    finally:
+                        fcntl.flock(data, fcntl.LOCK_UN)
+                    block = {'codec': self.codec, 'offset': offset, 'length': len(payload)}
+                    new += 1
+                entry = {'host': self.host, 'report': None, 'generated': stamp, 'section': name,
+                         'sha256': digest, 'codec': block['codec'], 'offset': block['offset'],
+                         'length': block['length'], 'size': len(raw)}
+                if name in collectors:
+                    entry['collector'] = collectors[name]
+                entries.append(entry)
+                self.blocks[digest] = entry
+            fcntl.flock(data, fcntl.LOCK_EX)
+            try:
+                # Reports another process saved meanwhile take the numbers before this one
+                self._read_index()
+                report = self.entries[-1]['report'] + 1 if self.entries else 1
+                for entry in entries:
+                    entry['report'] = report
+                lines = "".join(json.dumps(entry, separators=(',', ':')) + "\n" for entry in entries).encode()
+                with open(self.index_file, 'a+b') as index:
+                    if index.seek(0, os.SEEK_END):
+                        index.seek(-1, os.SEEK_END)
+                        if index.read(1) != b"\n":
+                            lines = b"\n" + lines  # start after a torn last line
+                    index.write(lines)
+                self._index_read += len(lines)
+            finally:
+                fcntl.flock(data, fcntl.LOCK_UN)
+        self.entries.extend(entries)
+        return self._snapshot(entries), new
+    
+    @staticmethod
+    def _snapshot(entries):
+        return {'host': entries[0]['host'] if entries else None,
+                'generated': entries[0]['generated'] if entries else None,
+                'sections': [[entry['section'], entry['sha256']] for entry in entries],
+                'collectors': {entry['section']: entry.get('collector', 'shell') for entry in entries}}
+    
+    def snapshots(self):
+        """One {'host', 'generated', 'sections'} per archived report, oldest first"""
+        reports = OrderedDict()
+        for entry in self.entries:
+            reports.setdefault(entry['report'], []).append(entry)
+        return [self._snapshot(entries) for entries in reports.values()]
+    
+    def latest(self):
+        """The most recent snapshot or None"""
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+    
+    def read(self, entry):
+        """Decompress the block of one index entry"""
+        with open(self.data_file, 'rb') as f:
+            f.seek(entry['offset'])
+            payload = f.read(entry['length'])
+        return archive_codec(entry['codec'])[1](payload).decode()
+    
+    def section(self, digest):
+        return self.read(self.blocks[digest])
+    
+    def diff(self, old, new, new_texts=None):
+        """(changed section names, unified diff text) between two snapshots"""
+        import difflib
+        
+        new_texts = new_texts or {}
+        old_sections = dict(old['sections'])
+        changed = []
+        output = ""
+        for name, digest in new['sections']:
+            old_digest = old_sections.get(name)
+            if old_digest == digest:
+                continue
+            before_collector = old.get('collectors', {}).get(name, 'shell')
+            after_collector = new.get('collectors', {}).get(name, 'shell')
+            if old_digest and before_collector != after_collector:
+                output += f"# {name}: not compared, collected by {before_collector} @ {old['generated']}"
+                output += f" and by {after_collector} @ {new['generated']}\n\n"
+                continue
+            changed.append(name)
+            before = self.section(old_digest) if old_digest else ""
+            after = new_texts.get(name)
+            if after is None:
+                after = self.section(digest)
+            output += "".join(difflib.unified_diff(
+                before.splitlines(True), after.splitlines(True),
+                f"{name} @ {old['generated']}", f"{name} @ {new['generated']}"))
+            output += "\n"
+        return changed, output
+    
+    def history(self, section, since=None):
+        """Every archived version of section since a datetime, repeats collapsed"""
+        cutoff = since.isoformat(timespec='seconds') if since else ""
+        output = ""
+        previous = None
+        for entry in self.entries:
+            if entry['section'] != section or entry['generated'] < cutoff:
+                continue
+            output += f"## {section} @ {entry['generated']}"
+            if 'collector' in entry:
+                output += f" [{entry['collector']}]"
+            if entry['sha256'] == previous:
+                output += " (unchanged)\n\n"
+                continue
+            output += "\n" + self.read(entry) + "\n\n"
+            previous = entry['sha256']
+        return output
+    
+    def summary(self):
+        """Reports in the archive with stored vs original size"""
+        snapshots = self.snapshots()
+        if not snapshots:
+            return f"No archived reports for {self.host}\n"
+        try:
+            stored = os.path.getsize(self.data_file)
+        except OSError:
+            stored = 0
+        original = sum(entry['size'] for entry in self.entries)
+        output = f"Archive: {self.root}\n"
+        output += f"Reports: {len(snapshots)}  Distinct sections: {len(self.blocks)}  "
+        output += f"Stored: {stored / 1024:.1f} KiB for {original / 1024:.1f} KiB of report text\n\n"
+        for snapshot in snapshots[-20:]:
+            output += f"{snapshot['generated']}  {', '.join(name for name, digest in snapshot['sections'])}\n"
+        return output
+
+
+class SshMaster:
+    """Persistent multiplexed ssh connection (OpenSSH ControlMaster)
+    
+    The master runs as our child with its control socket in a private
+    (0700) runtime directory; commands reach the host through it without
+    a new TCP connection, key exchange or authentication.
+    """
+    
     def __init__(self):
+        self.proc = None
+        self.runtime_dir = None
+        self.control_path = None
+        self.started = None
+        self.uses = 0
+    
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None and os.path.exists(self.control_path)
+    
+    def start(self, ssh_argv, target, tty=False):
+        """Start the master for target; returns an error text or None
+        
+        ssh_argv is the ssh command line without the target. With tty the
+        master stays in our session so ssh can prompt for a password.
+        """
+        self.close()
+        base = os.environ.get("XDG_RUNTIME_DIR")
+        self.runtime_dir = tempfile.mkdtemp(prefix="hnm-ssh-", dir=base if base and os.path.isdir(base) else None)
+        self.control_path = os.path.join(self.runtime_dir, "master")
+        log_path = os.path.join(self.runtime_dir, "master.log")
+        argv = ssh_argv + ['-M', '-N', '-o', 'ControlPersist=no', '-o', f'ControlPath={self.control_path}', target]
+        with open(log_path, 'w') as log:
+            try:
+                self.proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                             stderr=log, start_new_session=not tty)
+            except OSError as e:
+                self.close()
+                return str(e)
+        # The control socket appears once the master is authenticated
+        deadline = None if tty else time.monotonic() + SSH_MASTER_TIMEOUT
+        while not os.path.exists(self.control_path):
+            if self.proc.poll() is not None or (deadline is not None and time.monotonic() > deadline):
+                with open(log_path) as log:
+                    error = log.read().strip() or f"ssh master exited with status {self.proc.poll()}"
+                self.close()
+                return error
+            time.sleep(0.05)
+        self.started = time.monotonic()
+        self.uses = 0
+        atexit.register(self.close)
+        return None
+    
+    def options(self):
+        """ssh options routing a command through the master"""
+        self.uses += 1
+        return ['-o', 'ControlMaster=no', '-o', f'ControlPath={self.control_path}']
+    
+    def close(self):
+        """Stop the master and remove its runtime directory"""
+        atexit.unregister(self.close)
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                # Ask the master to exit, then make sure it did
+                try:
+                    subprocess.run(['ssh', '-o', f'ControlPath={self.control_path}', '-O', 'exit', 'master'],
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+                try:
+                    self.proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+                    self.proc.wait()
+            self.proc = None
+        if self.runtime_dir is not None:
+            shutil.rmtree(self.runtime_dir, ignore_errors=True)
+            self.runtime_dir = None
+        self.control_path = None
+        self.started = None
+    
+    def status(self):
+        if not self.alive:
+            return "off (a new ssh connection per command)"
+        age = int(time.monotonic() - self.started)
+        return f"✓ master up {age // 3600}h {age % 3600 // 60:02d}m {age % 60:02d}s, reused by {self.uses} command(s)"
+
+
+class TransferMeter:
+    """Link bandwidth seen by one ssh run, from its stdout arrival times
+    
+    Only output streaming without a pause is timed: a burst ends after a
+    gap of BURST_GAP seconds and, given boundary, where the next command's
+    output begins, so the time remote commands spend running is left out.
+    A burst counts the bytes after its first chunk over the time until its
+    last one. bandwidth() is the fastest burst of at least
+    BANDWIDTH_SAMPLE_BYTES (None without one). Wraps another on_output
+    callback.
+    """
+    
+    def __init__(self, on_output=None, boundary=None, clock=time.monotonic):
+        self.on_output = on_output
+        self.boundary = boundary
+        self.clock = clock
+        self.best = None
+        self._tail = b""
+        self._first = self._last = None
+        self._bytes = 0
+    
+    def feed(self, name, chunk):
+        if name == 'stdout':
+            now = self.clock()
+            if self._last is not None and now - self._last > BURST_GAP:
+                self._close()
+            split = -1
+            if self.boundary is not None:
+                data = self._tail + chunk
+                split = data.rfind(self.boundary)
+                self._tail = data[1 - len(self.boundary):]
+            if split < 0:
+                self._add(now, len(chunk))
+            else:
+                # The bytes before the boundary end the current burst, the rest starts the next
+                self._add(now, max(0, split - (len(data) - len(chunk))))
+                self._close()
+                self._first = self._last = now
+        if self.on_output is not None:
+            self.on_output(name, chunk)
+    
+    def _add(self, now, size):
+        if self._first is None:
+            self._first = now
+        else:
+            self._bytes += size
+        self._last = now
+    
+    def _close(self):
+        if self._bytes >= BANDWIDTH_SAMPLE_BYTES and self._last > self._first:
+            rate = self._bytes / (self._last - self._first)
+            self.best = rate if self.best is None else max(self.best, rate)
+        self._first = self._last = None
+        self._bytes = 0
+    
+    def bandwidth(self):
+        self._close()
+        return self.best
+
+
+class BatchScript:
+    """Several remote commands shipped as one shell script
+    
+    Each command runs in a subshell between delimiter lines carrying a
+    random marker, its exit status and start/end times (from
+    /proc/uptime, no fork). stderr goes to a temp file and is sent only
+    when non-empty. feed() demultiplexes the stream as it arrives and
+    resolves one Future per command with its CommandResult.
+    
+    With compress each command's stdout is piped through 'gzip -1' on
+    the host (when it has gzip; the begin line says so), its exit status
+    going through a file.
+    """
+    
+    def __init__(self, commands, compress=False):
+        from concurrent.futures import Future
+        
+        self.commands = list(commands)
+        self.compress = compress
+        self.marker = "HNM-" + os.urandom(8).hex()
+        self.futures = [Future() for _ in self.commands]
+        self.results = [None] * len(self.commands)
+        self._data = bytearray()
+        self.begin = f"\n{self.marker} begin ".encode()
+        self._end = f"\n{self.marker} end ".encode()
+    
+    def script(self):
+        lines = [f"hnm_m={self.marker}; hnm_e=$(mktemp 2>/dev/null || echo /tmp/hnm.$$)"]
+        if self.compress:
+            lines += ['hnm_c="$hnm_e.rc"; hnm_z=; command -v gzip >/dev/null 2>&1 && hnm_z=z',
+                      'hnm_gz() { if [ -n "$hnm_z" ]; then gzip -1c; else cat; fi; }']
+        for index, cmd in enumerate(self.commands):
+            if self.compress:
+                begin = f"printf '\\n%s begin {index} %s\\n' \"$hnm_m\" \"$hnm_z\""
+                run = f"{{ ( {cmd}\n) 2>\"$hnm_e\" </dev/null; echo $? >\"$hnm_c\"; }} | hnm_gz; read hnm_r < \"$hnm_c\""
+            else:
+                begin = f"printf '\\n%s begin {index}\\n' \"$hnm_m\""
+                run = f"( {cmd}\n) 2>\"$hnm_e\" </dev/null; hnm_r=$?"
+            lines += [
+                begin,
+                "read hnm_s hnm_x < /proc/uptime 2>/dev/null",
+                run,
+                "read hnm_t hnm_x < /proc/uptime 2>/dev/null",
+                f"if [ -s \"$hnm_e\" ]; then printf '\\n%s stderr {index}\\n' \"$hnm_m\"; cat \"$hnm_e\"; fi",
+                f"printf '\\n%s end {index} %d %s %s\\n' \"$hnm_m\" \"$hnm_r\" \"${{hnm_s:-0}}\" \"${{hnm_t:-0}}\"",
+            ]
+        lines.append('rm -f "$hnm_e" "$hnm_e.rc"')
+        return "\n".join(lines) + "\n"
+    
+    def feed(self, name, chunk):
+        """Engine on_output callback: resolve every command whose end line arrived"""
+        if name != 'stdout':
+            return
+        self._data += chunk
+        while True:
+            end = self._data.find(self._end)
+            if end < 0:
+                return
+            eol = self._data.find(b"\n", end + len(self._end))
+            if eol < 0:
+                return
+            record = bytes(self._data[:eol])
+            del self._data[:eol + 1]
+            self._resolve(record)
+    
+    def _resolve(self, record):
+        separator = f"\n{self.marker} ".encode()
+        stdout = stderr = b""
+        index = None
+        wire_bytes = None
+        for part in record.split(separator)[1:]:
+            header, _, payload = part.partition(b"\n")
+            fields = header.decode('ascii', 'replace').split()
+            if fields[0] == 'begin':
+                stdout = payload
+                if fields[2:] == ['z']:
+                    import gzip
+                    
+                    wire_bytes = len(payload)
+                    try:
+                        stdout = gzip.decompress(payload)
+                    except (OSError, EOFError, zlib.error) as e:
+                        stdout = f"Error: corrupt compressed output ({e})\n".encode()
+            elif fields[0] == 'stderr':
+                stderr = payload
+            elif fields[0] == 'end':
+                index = int(fields[1])
+                returncode = int(fields[2])
+                try:
+                    elapsed = max(0.0, float(fields[4]) - float(fields[3]))
+                except (IndexError, ValueError):
+                    elapsed = 0.0
+        if index is None or index >= len(self.commands):
+            return
+        output = (stdout or stderr).decode('utf-8', 'replace')
+        if wire_bytes is not None:
+            wire_bytes += len(stderr)
+        self._set(index, CommandResult(output, returncode, elapsed=elapsed, stdout_bytes=len(stdout),
+                                       stderr_bytes=len(stderr), wire_bytes=wire_bytes))
+    
+    def _set(self, index, result):
+        self.results[index] = result
+        self.futures[index].set_result(result)
+    
+    def finish(self, result):
+        """Resolve the commands the script never completed from the ssh result"""
+        started = self._data.find(self.begin) >= 0
+        for index, future in enumerate(self.futures):
+            if future.done():
+                continue
+            if result.timed_out:
+                if started:
+                    # Killed while running: it had what the finished commands left of the run
+                    started = False
+                    done = sum(r.elapsed or 0.0 for r in self.results if r is not None)
+                    elapsed = None if result.elapsed is None else max(0.0, result.elapsed - done)
+                    self._set(index, CommandResult(result.output, -1, timed_out=True, elapsed=elapsed))
+                else:
+                    self._set(index, CommandResult("Skipped: report deadline reached\n", -1, timed_out=True))
+            else:
+                self._set(index, CommandResult(result.output or "Error: remote batch ended early\n",
+                                               result.returncode or -1))
+
+
+# Collector agent: sent on ssh stdin to the remote python3 (nothing is
+# installed). It reads /proc, /sys and configuration files in-process,
+# runs the few tools that have no file equivalent without a shell, and
+# writes one 'HNM1 <length>[ z]' framed compact JSON object per section
+# (zlib compressed with -z).
+# Keep it Python 3.6 compatible (no f-strings are needed there).
+AGENT_SOURCE = r'''import glob
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+TOOL_TIMEOUT = 30
+PSEUDO_FS = ('proc', 'sysfs', 'devpts', 'cgroup', 'cgroup2', 'securityfs', 'pstore', 'debugfs',
+             'tracefs', 'configfs', 'fusectl', 'mqueue', 'hugetlbfs', 'binfmt_misc', 'autofs',
+             'bpf', 'rpc_pipefs', 'nsfs', 'selinuxfs', 'efivarfs')
+
+
+def read(path, drop_comments=False):
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except OSError:
+        return None
+    if drop_comments:
+        return "".join(line for line in text.splitlines(True) if '#' not in line) or None
+    return text
+
+
+def tool(argv, lines=None, tail=False):
+    try:
+        proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    try:
+        out = proc.communicate(timeout=TOOL_TIMEOUT)[0]
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        return "Command timed out after %d seconds\n" % TOOL_TIMEOUT
+    if proc.returncode != 0:
+        return None
+    text = out.decode('utf-8', 'replace')
+    if lines:
+        split = text.splitlines(True)
+        text = "".join(split[-lines:] if tail else split[:lines])
+    return text
+
+
+def first(*getters, fallback=None):
+    for getter in getters:
+        text = getter()
+        if text is not None:
+            return text
+    return "" if fallback is None else fallback + "\n"
+
+
+def human(size):
+    for unit in ('', 'K', 'M', 'G', 'T', 'P'):
+        if size < 1024 or unit == 'P':
+            break
+        size /= 1024.0
+    if unit and size < 10:
+        return "%.1f%s" % (size, unit)
+    return "%d%s" % (round(size), unit)
+
+
+def table(rows):
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    return "".join(" ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip() + "\n"
+                   for row in rows)
+
+
+def mounts():
+    entries = []
+    with open('/proc/mounts') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 3:
+                entries.append((fields[0], fields[1].replace('\\040', ' '), fields[2]))
+    return entries
+
+
+def meminfo():
+    values = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            values[key] = int(rest.split()[0])
+    return values
+
+
+def hostname_i():
+    try:
+        return " ".join(socket.gethostbyname_ex(socket.gethostname())[2]) + "\n"
+    except OSError:
+        return "hostname: Name or service not known\n"
+
+
+def dmi():
+    fields = (('sys_vendor', 'Manufacturer'), ('product_name', 'Product Name'),
+              ('product_version', 'Version'), ('product_serial', 'Serial Number'),
+              ('product_uuid', 'UUID'))
+    lines = []
+    for name, label in fields:
+        value = read('/sys/class/dmi/id/' + name)
+        if value is not None:
+            lines.append("\t%s: %s\n" % (label, value.strip()))
+    return "System Information\n" + "".join(lines) if lines else None
+
+
+def lsblk():
+    mounted = {}
+    for device, mountpoint, fstype in mounts():
+        mounted.setdefault(os.path.basename(device), mountpoint)
+    rows = [("NAME", "MAJ:MIN", "SIZE", "RO", "TYPE", "MOUNTPOINT")]
+    for path in sorted(glob.glob('/sys/block/*')):
+        name = os.path.basename(path)
+        if name.startswith(('loop', 'ram')):
+            continue
+        devices = [(name, path, 'disk')]
+        devices += [(os.path.basename(part), part, 'part')
+                    for part in sorted(glob.glob(path + '/' + name + '*')) if os.path.exists(part + '/partition')]
+        for device, device_path, kind in devices:
+            sectors = int(read(device_path + '/size') or 0)
+            rows.append(((device if kind == 'disk' else '└─' + device), (read(device_path + '/dev') or '').strip(),
+                         human(sectors * 512), (read(device_path + '/ro') or '0').strip(), kind,
+                         mounted.get(device, '')))
+    return table(rows) if len(rows) > 1 else None
+
+
+def df():
+    rows = [("Filesystem", "Type", "Size", "Used", "Avail", "Use%", "Mounted on")]
+    seen = set()
+    for device, mountpoint, fstype in mounts():
+        if fstype in PSEUDO_FS or mountpoint in seen:
+            continue
+        try:
+            st = os.statvfs(mountpoint)
+        except OSError:
+            continue
+        if not st.f_blocks:
+            continue
+        seen.add(mountpoint)
+        size = st.f_blocks * st.f_frsize
+        free = st.f_bfree * st.f_frsize
+        avail = st.f_bavail * st.f_frsize
+        used = size - free
+        percent = -(-used * 100 // (used + avail)) if used + avail else 0
+        rows.append((device, fstype, human(size), human(used), human(avail), "%d%%" % percent, mountpoint))
+    return table(rows)
+
+
+def routes():
+    rows = [("Destination", "Gateway", "Genmask", "Flags", "Metric", "Ref", "Use", "Iface")]
+    try:
+        with open('/proc/net/route') as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) < 11:
+                    continue
+                address = lambda value: socket.inet_ntoa(struct.pack('=I', int(value, 16)))
+                flags = int(fields[3], 16)
+                flag_text = "".join(letter for bit, letter in ((1, 'U'), (2, 'G'), (4, 'H')) if flags & bit)
+                rows.append((address(fields[1]), address(fields[2]), address(fields[7]), flag_text,
+                             fields[6], fields[4], fields[5], fields[0]))
+    except (OSError, StopIteration, ValueError):
+        return None
+    return "Kernel IP routing table\n" + table(rows)
+
+
+def interfaces():
+    output = ""
+    for path in sorted(glob.glob('/sys/class/net/*')):
+        name = os.path.basename(path)
+        output += "%s: state %s mtu %s\n    link/ether %s\n" % (
+            name, (read(path + '/operstate') or '?').strip(), (read(path + '/mtu') or '?').strip(),
+            (read(path + '/address') or '?').strip())
+    return output or None
+
+
+def free_g():
+    mem = meminfo()
+    cache = mem.get('Buffers', 0) + mem.get('Cached', 0) + mem.get('SReclaimable', 0)
+    used = mem['MemTotal'] - mem['MemFree'] - cache
+    gib = lambda kb: kb // (1024 * 1024)
+    rows = [("", "total", "used", "free", "shared", "buff/cache", "available"),
+            ("Mem:", gib(mem['MemTotal']), gib(used), gib(mem['MemFree']), gib(mem.get('Shmem', 0)),
+             gib(cache), gib(mem.get('MemAvailable', mem['MemFree']))),
+            ("Swap:", gib(mem.get('SwapTotal', 0)), gib(mem.get('SwapTotal', 0) - mem.get('SwapFree', 0)),
+             gib(mem.get('SwapFree', 0)))]
+    return "".join("%-6s" % row[0] + "".join("%12s" % cell for cell in row[1:]) + "\n" for row in rows)
+
+
+def cpuinfo():
+    text = read('/proc/cpuinfo')
+    if text is None:
+        return None
+    lines = [line for line in text.splitlines(True) if line.startswith(('processor', 'model name'))]
+    return "".join(lines[:20])
+
+
+SECTIONS = {
+    'system': ("System Information", lambda: [
+        ("uname -a", " ".join(os.uname()) + "\n"),
+        ("hostname", socket.gethostname() + "\n"),
+        ("hostname -i", hostname_i()),
+        ("OS Release", first(lambda: read('/etc/redhat-release'), lambda: read('/etc/os-release'))),
+        ("Hardware Info", first(dmi, fallback='Permission denied - requires sudo')),
+        ("/etc/resolv.conf", first(lambda: read('/etc/resolv.conf'))),
+        ("/etc/hosts", first(lambda: read('/etc/hosts'))),
+    ]),
+    'lvm': ("LVM & Storage Information", lambda: [
+        ("lsblk", first(lsblk)),
+        ("df -hT", df()),
+        ("cat /etc/fstab", first(lambda: read('/etc/fstab'))),
+        ("pvs", first(lambda: tool(['pvs']), fallback='No LVM or permission denied')),
+        ("vgs", first(lambda: tool(['vgs']), fallback='No LVM or permission denied')),
+        ("lvs", first(lambda: tool(['lvs']), fallback='No LVM or permission denied')),
+        ("multipath -ll", first(lambda: tool(['multipath', '-ll']), fallback='Multipath not configured')),
+    ]),
+    'netconfig': ("Network Configuration", lambda: [
+        ("Network Interfaces", first(lambda: tool(['ifconfig', '-a']), lambda: tool(['ip', 'addr', 'show']), interfaces)),
+        ("Routing Table", first(routes, lambda: tool(['ip', 'route']))),
+        ("Bonding Status", "".join(read(path) or "" for path in sorted(glob.glob('/proc/net/bonding/*')))
+         or "No bonding configured\n"),
+    ]),
+    'userconfig': ("User & Authentication Configuration", lambda: [
+        ("/etc/passwd", first(lambda: read('/etc/passwd'))),
+        ("NTP Status", first(lambda: tool(['ntpq', '-p']), lambda: tool(['chronyc', 'sources']),
+                             fallback='NTP not configured')),
+        ("Crontab", first(lambda: tool(['crontab', '-l']), fallback='No crontab')),
+    ]),
+    'samba': ("Samba & Domain Configuration", lambda: [
+        ("SSSD Config", first(lambda: read('/etc/sssd/sssd.conf', True), fallback='SSSD not configured')),
+        ("Kerberos Config", first(lambda: read('/etc/krb5.conf'), fallback='Kerberos not configured')),
+        ("Samba Config", first(lambda: read('/etc/samba/smb.conf', True), fallback='Samba not configured')),
+    ]),
+    'cluster': ("Cluster Information", lambda: [
+        ("PCS Cluster", first(lambda: tool(['pcs', 'status']), fallback='PCS not configured')),
+        ("CRM Cluster", first(lambda: tool(['crm', 'status']), fallback='CRM not configured')),
+    ]),
+    'performance': ("Performance Reports", lambda: [
+        ("RAM Utilization", free_g()),
+        ("CPU Information", first(lambda: tool(['lscpu']), cpuinfo)),
+        ("SAR Data (if available)", first(lambda: tool(['sar', '-u'], 20, tail=True), fallback='SAR not available')),
+    ]),
+}
+
+
+def main(names):
+    out = sys.stdout.buffer
+    compress = names[:1] == ['-z']
+    if compress:
+        names = names[1:]
+    for name in names:
+        started = time.time()
+        frame = {'section': name}
+        try:
+            title, collect = SECTIONS[name]
+            frame['title'] = title
+            frame['items'] = collect()
+        except Exception as e:
+            frame['error'] = "%s: %s" % (type(e).__name__, e)
+        frame['elapsed'] = round(time.time() - started, 4)
+        data = json.dumps(frame, separators=(',', ':')).encode()
+        if compress:
+            data = zlib.compress(data, 6)
+        out.write(b"HNM1 %d%s\n" % (len(data), b" z" if compress else b"") + data)
+        out.flush()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+'''
+
+# Runs AGENT_SOURCE from stdin with the first python found; 127 = none
+AGENT_LAUNCHER = ('for hnm_p in python3 /usr/libexec/platform-python; do '
+                  'command -v "$hnm_p" >/dev/null 2>&1 && exec "$hnm_p" - {names}; done; '
+                  'echo "hnm agent: python3 not found" >&2; exit 127')
+
+
+class AgentStream:
+    """Demultiplexes the collector agent's framed JSON output
+    
+    feed() resolves one Future per section with its decoded frame as
+    soon as the frame is complete; finish() resolves the sections the
+    agent never delivered with an 'error' frame. frame_bytes holds the
+    (decompressed, on the wire) size of each frame.
+    """
+    
+    HEADER = b"HNM1 "
+    
+    def __init__(self, names, compress=False):
+        from concurrent.futures import Future
+        
+        self.names = list(names)
+        self.compress = compress
+        self.futures = {name: Future() for name in self.names}
+        self.frame_bytes = {}
+        self._data = bytearray()
+    
+    def command(self):
+        return AGENT_LAUNCHER.format(names=" ".join((['-z'] if self.compress else []) + self.names))
+    
+    def feed(self, name, chunk):
+        """Engine on_output callback"""
+        if name != 'stdout':
+            return
+        self._data += chunk
+        while True:
+            eol = self._data.find(b"\n")
+            if eol < 0 or not self._data.startswith(self.HEADER):
+                return
+            fields = self._data[len(self.HEADER):eol].split()
+            try:
+                length = int(fields[0])
+            except (IndexError, ValueError):
+                return
+            if len(self._data) < eol + 1 + length:
+                return
+            wire = bytes(self._data[eol + 1:eol + 1 + length])
+            del self._data[:eol + 1 + length]
+            try:
+                data = zlib.decompress(wire) if fields[1:] == [b'z'] else wire
+                frame = json.loads(data.decode('utf-8'))
+            except (ValueError, zlib.error):
+                continue
+            future = self.futures.get(frame.get('section'))
+            if future is not None and not future.done():
+                self.frame_bytes[frame['section']] = (len(data), len(wire))
+                future.set_result(frame)
+    
+    def finish(self, result):
+        for name, future in self.futures.items():
+            if not future.done():
+                future.set_result({'section': name, 'ended': True, 'timed_out': result.timed_out,
+                                   'error': result.output.strip() or "agent ended early"})
+    
+    @staticmethod
+    def render(frame):
+        """Section text in the same layout as the shell collectors"""
+        output = f"=== {frame['title']} ===\n"
+        for heading, text in frame['items']:
+            output += f"\n# {heading}\n" + text
+        return output
+
+
+class Hnm_Remote_Bot:
+    def __init__(self, workers=None, report_budget=None, engine=None):
+        if workers is None:
+            try:
+                workers = int(os.environ.get("HNM_BOT_WORKERS", DEFAULT_WORKERS))
+            except ValueError:
+                workers = DEFAULT_WORKERS
+        self.workers = max(1, workers)
+        if report_budget is None:
+            try:
+                report_budget = float(os.environ.get("HNM_REPORT_BUDGET", DEFAULT_REPORT_BUDGET))
+            except ValueError:
+                report_budget = DEFAULT_REPORT_BUDGET
+        self.report_budget = max(0, report_budget)
+        self._deadline = None
+        self._timed_out = 0
+        self._plan = None
+        self._pending = {}
+        self._collectors = {}
+        self._engine = engine
+        self.master = SshMaster()
+        self.report_dir = None
+        batch = os.environ.get("HNM_REMOTE_BATCH", DEFAULT_BATCH_MODE)
+        self.batch = batch if batch in BATCH_MODES else DEFAULT_BATCH_MODE
+        self.agent = os.environ.get("HNM_REMOTE_AGENT", "0").lower() in ('1', 'on', 'yes')
+        compress = os.environ.get("HNM_REMOTE_COMPRESS", DEFAULT_COMPRESS_MODE)
+        self.compress = compress if compress in COMPRESS_MODES else DEFAULT_COMPRESS_MODE
+        self.bandwidth = None
         self.remote_host = None
         self.remote_user = None
         self.ssh_key = None
         self.use_password = False
         self.connected = False
+        self.stats = CommandStats()
+        self.output_format = 'text'
+        self.interactive = True
         
         self.commands = {
             'help': self.show_help,
@@ -46,37 +1519,221 @@ class Hnm_Remote_Bot:
             'cluster': self.cluster_info,
             'performance': self.performance_report,
             'fullreport': self.full_report,
+            'diff': self.diff_report,
+            'history': self.report_history,
+            'stats': self.command_stats,
+            'format': self.set_format,
+            'budget': self.set_budget,
+            'agent': self.set_agent,
+            'compress': self.set_compress,
             'exit': self.exit_bot,
             'quit': self.exit_bot
         }
+        # Report sections run on their own ship their commands as one script too
+        for name, section in self.report_sections():
+            self.commands[name] = self.batched(name, section)
+        # Commands that can also be emitted as parsed records (json/ndjson)
+        self.structured = {
+            'disk': self.disk_records,
+            'memory': self.memory_records,
+            'processes': self.process_records,
+            'ports': self.socket_records,
+            'lvm': self.lvm_records,
+            'uptime': self.uptime_records,
+        }
+    
+    @property
+    def engine(self):
+        """The command engine, started by the first command"""
+        if self._engine is None:
+            self._engine = CommandEngine(self.workers)
+        return self._engine
+    
+    def ssh_options(self):
+        """ssh command line up to the target (never prompts in batch mode)"""
+        argv = ['ssh']
+        if self.ssh_key:
+            argv += ['-i', self.ssh_key]
+        argv += ['-o', 'StrictHostKeyChecking=no', '-o', 'ConnectTimeout=10']
+        if self.compress == 'ssh':
+            argv.append('-C')
+        if not self.interactive:
+            argv += ['-o', 'BatchMode=yes']
+        return argv
+    
+    def ssh_argv(self, cmd):
+        """ssh argv running cmd on the remote host, through the master when it is up"""
+        argv = self.ssh_options()
+        if self.master.alive:
+            argv += self.master.options()
+        return argv + [f"{self.remote_user}@{self.remote_host}", cmd]
+    
+    @property
+    def compressing(self):
+        """Whether command output is compressed on the host"""
+        if self.compress == 'auto':
+            return self.bandwidth is not None and self.bandwidth < COMPRESS_BELOW_BPS
+        return self.compress == 'gzip'
+    
+    async def _run_metered(self, argv, timeout, on_output=None, input=None, boundary=None):
+        """engine.run for ssh argv, updating the bandwidth from large outputs (no extra transfer)"""
+        meter = TransferMeter(on_output, boundary)
+        result = await self.engine.run(argv, timeout, self._deadline, on_output=meter.feed, input=input)
+        bandwidth = meter.bandwidth()
+        if bandwidth is not None:
+            self.bandwidth = bandwidth
+        return result
     
     def run_remote_command(self, cmd):
         """Execute command on remote system via SSH"""
         if not self.connected:
             return "Error: Not connected to remote system. Use 'connect' command first."
-        
+        # While planning a report only record the command line
+        if self._plan is not None:
+            self._plan.append(cmd)
+            return ""
+        # Already scheduled on the engine by full_report
+        future = self._pending.get(cmd)
+        result = future.result() if future is not None else self.engine.call(self._execute_async(cmd))
+        if result.timed_out:
+            self._timed_out += 1
+        return result.output
+    
+    async def _execute_batch_async(self, batch):
+        """Run a BatchScript in one ssh invocation and record per-command statistics"""
+        timeout = COMMAND_TIMEOUT * len(batch.commands)
+        result = await self._run_metered(self.ssh_argv(batch.script()), timeout, on_output=batch.feed,
+                                         boundary=batch.begin)
+        batch.finish(result)
+        # Commands the deadline skipped never ran and stay out of the latency figures
+        for cmd, command_result in zip(batch.commands, batch.results):
+            if command_result.elapsed is not None:
+                self.stats.record(cmd, command_result.elapsed, command_result.returncode,
+                                  command_result.timed_out, command_result.stdout_bytes,
+                                  command_result.stderr_bytes, command_result.wire_bytes)
+    
+    async def _execute_agent_async(self, stream):
+        """Run the collector agent for stream's sections in one ssh invocation"""
+        timeout = COMMAND_TIMEOUT * len(stream.names)
+        result = await self._run_metered(self.ssh_argv(stream.command()), timeout,
+                                         on_output=stream.feed, input=AGENT_SOURCE.encode())
+        stream.finish(result)
+        for name, future in stream.futures.items():
+            frame = future.result()
+            if 'items' in frame:
+                size, wire = stream.frame_bytes[name]
+                self.stats.record(f"agent:{name}", frame.get('elapsed', 0.0), 0, False, size, 0,
+                                  wire if stream.compress else None)
+    
+    async def _execute_async(self, cmd):
+        """Run cmd over ssh on the engine and record its statistics"""
+        if self.compressing:
+            # The batch script wrapper compresses on the host and splits the result back
+            batch = BatchScript([cmd], compress=True)
+            await self._execute_batch_async(batch)
+            return batch.results[0]
+        # Every command gets at most what is left of the report deadline
+        result = await self._run_metered(self.ssh_argv(cmd), COMMAND_TIMEOUT)
+        if result.elapsed is not None:
+            self.stats.record(cmd, result.elapsed, result.returncode, result.timed_out,
+                              result.stdout_bytes, result.stderr_bytes)
+        return result
+    
+    def set_budget(self, *seconds):
+        """Show or set the total time budget of fullreport"""
+        if seconds:
+            value = seconds[0]
+            try:
+                self.report_budget = 0 if value == 'off' else max(0, float(value))
+            except ValueError:
+                return f"❌ Invalid budget '{value}' (seconds or 'off')"
+        if not self.report_budget:
+            return f"Report budget: off (each command times out after {COMMAND_TIMEOUT} seconds)"
+        return f"Report budget: {self.report_budget:g} seconds"
+    
+    def set_agent(self, *mode):
+        """Show or switch the python collector agent for report sections"""
+        if mode:
+            if mode[0] not in ('on', 'off'):
+                return f"❌ Unknown agent mode '{mode[0]}' (on or off)"
+            self.agent = mode[0] == 'on'
+        if self.agent:
+            return f"Collector agent: on ({', '.join(AGENT_SECTIONS)} are collected by remote python3)"
+        return "Collector agent: off (report sections run shell commands)"
+    
+    def compression_status(self):
+        measured = f", measured {self.bandwidth / 1024 / 1024:.1f} MiB/s" if self.bandwidth is not None else ""
+        if self.compress == 'ssh':
+            return "ssh transport (-C)"
+        if self.compress == 'auto':
+            if self.bandwidth is None:
+                return "auto (off until a large transfer has been measured)"
+            return f"auto ({'gzip on the host' if self.compressing else 'off'}{measured})"
+        return f"{'gzip on the host' if self.compressing else 'off'}{measured}"
+    
+    def set_compress(self, *mode):
+        """Show or set how remote output is compressed"""
+        if mode:
+            if mode[0] not in COMPRESS_MODES:
+                return f"❌ Unknown compression '{mode[0]}' (choose from: {', '.join(COMPRESS_MODES)})"
+            self.compress = mode[0]
+            if self.compress == 'ssh' and self.master.alive:
+                return "Compression: ssh transport (-C) takes effect at the next connect"
+        return f"Compression: {self.compression_status()}"
+    
+    def command_stats(self, *args):
+        """Show per-command latency statistics or export them as JSON"""
+        if args and args[0] == 'json':
+            filename = args[1] if len(args) > 1 else f"remote_command_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            try:
+                self.stats.export_json(filename, host=self.remote_host, source='hnm-remote-bot')
+            except Exception as e:
+                return f"⚠️  Could not export statistics: {str(e)}"
+            return f"✓ Statistics exported to: {filename}"
+        return self.stats.summary()
+    
+    def set_format(self, *fmt):
+        """Select text, json or ndjson output for record-backed commands"""
+        if not fmt:
+            return f"Output format: {self.output_format} (record-backed: {', '.join(self.structured)})"
+        if fmt[0] not in OUTPUT_FORMATS:
+            return f"❌ Unknown format '{fmt[0]}' (choose from: {', '.join(OUTPUT_FORMATS)})"
+        self.output_format = fmt[0]
+        return f"✓ Output format set to {self.output_format}"
+    
+    def emit_structured(self, name, stream, fmt=None):
+        """Write the records of a record-backed command to stream"""
+        write_records(stream, name, self.structured[name](), fmt or self.output_format,
+                      host=self.remote_host)
+    
+    def disk_records(self):
+        """df as DiskUsage records"""
+        return parse_df(self.run_remote_command(DF_RECORDS_CMD))
+    
+    def memory_records(self):
+        """Memory usage as a MemoryUsage record"""
+        return [memory_record(parse_meminfo(self.run_remote_command("cat /proc/meminfo")))]
+    
+    def process_records(self):
+        """ps aux (sorted by CPU) as ProcessEntry records"""
+        return parse_ps(self.run_remote_command(PS_RECORDS_CMD))
+    
+    def socket_records(self):
+        """TCP/UDP sockets as SocketEntry records"""
+        return parse_ss(self.run_remote_command(SS_RECORDS_CMD))
+    
+    def lvm_records(self):
+        """Block devices and LVM PVs/VGs/LVs as records"""
+        yield from parse_lsblk(self.run_remote_command(LSBLK_RECORDS_CMD))
+        for record_class, cmd in LVM_RECORDS_CMDS:
+            yield from parse_lvm(self.run_remote_command(cmd), record_class)
+    
+    def uptime_records(self):
+        """Uptime, users and load as an UptimeStatus record"""
         try:
-            # Build SSH command
-            if self.ssh_key:
-                ssh_cmd = f"ssh -i {self.ssh_key} -o StrictHostKeyChecking=no -o ConnectTimeout=10 {self.remote_user}@{self.remote_host} '{cmd}'"
-            else:
-                ssh_cmd = f"ssh -o StrictHostKeyChecking=no -o ConnectTimeout=10 {self.remote_user}@{self.remote_host} '{cmd}'"
-            
-            # Execute SSH command
-            result = subprocess.run(
-                ssh_cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                timeout=60
-            )
-            
-            return result.stdout if result.stdout else result.stderr
-        except subprocess.TimeoutExpired:
-            return "Command timed out after 60 seconds"
-        except Exception as e:
-            return f"Error executing remote command: {str(e)}"
+            return [parse_uptime_status(self.run_remote_command(UPTIME_RECORDS_CMD))]
+        except (ValueError, IndexError):
+            return []
     
     def connect_remote(self):
         """Connect to remote system"""
@@ -102,35 +1759,52 @@ class Hnm_Remote_Bot:
             self.use_password = False
         else:
             self.use_password = True
-            print("\nNote: You'll be prompted for password on each command.")
+            print("\nNote: You'll be prompted for the password once; later commands share the connection.")
             print("For better experience, use SSH key authentication.")
         
         # Test connection
         print(f"\nTesting connection to {self.remote_user}@{self.remote_host}...")
         
-        test_result = self.run_remote_command("echo 'Connection successful'")
+        test_result = self.open_connection()
         
-        if "Connection successful" in test_result:
-            self.connected = True
+        if self.connected:
             output = f"\n✓ Successfully connected to {self.remote_user}@{self.remote_host}\n"
             output += f"Authentication: {'SSH Key' if self.ssh_key else 'Password'}\n"
             output += "\nYou can now run commands on the remote system.\n"
             output += "Type 'help' to see available commands.\n"
             return output
         else:
-            self.connected = False
             return f"\n✗ Connection failed:\n{test_result}\n\nPlease check:\n- Hostname/IP is correct\n- SSH service is running\n- Firewall allows SSH\n- Credentials are correct"
     
+    def open_connection(self):
+        """Test the connection details already set; return the test output"""
+        # One authenticated master connection for all later commands; without
+        # it (old ssh, no socket support) every command connects on its own
+        error = self.master.start(self.ssh_options(), f"{self.remote_user}@{self.remote_host}",
+                                  tty=self.use_password and self.interactive)
+        # run_remote_command refuses to run while disconnected
+        self.connected = True
+        test_result = self.run_remote_command("echo 'Connection successful'")
+        self.connected = "Connection successful" in test_result
+        self.bandwidth = None
+        if not self.connected:
+            self.master.close()
+            if error:
+                test_result += error + "\n"
+        return test_result
+    
     def disconnect(self):
         """Disconnect from remote system"""
         if not self.connected:
             return "Not connected to any remote system"
         
         host = self.remote_host
+        self.master.close()
         self.connected = False
         self.remote_host = None
         self.remote_user = None
         self.ssh_key = None
+        self.bandwidth = None
         
         return f"✓ Disconnected from {host}"
     
@@ -142,6 +1816,8 @@ class Hnm_Remote_Bot:
             output += f"Remote Host: {self.remote_host}\n"
             output += f"Username: {self.remote_user}\n"
             output += f"Authentication: {'SSH Key (' + self.ssh_key + ')' if self.ssh_key else 'Password'}\n"
+            output += f"Multiplexing: {self.master.status()}\n"
+            output += f"Compression: {self.compression_status()}\n"
             return output
         else:
             return "Status: ✗ Not connected\n\nUse 'connect' command to connect to a remote system."
@@ -182,8 +1858,20 @@ ADVANCED COMMANDS:
   cluster      - Cluster status (PCS, CRM, HPSG, Veritas)
   performance  - CPU/RAM utilization reports with SAR data
   fullreport   - Generate complete system report (all above)
+  diff         - Only the report sections changed since the last snapshot, as
+                 unified diffs ('diff last' compares the two latest snapshots)
+  history      - Archived reports, or one section over time
+                 ('history lvm --since 30d')
 
 UTILITY:
+  stats        - Per-command latency statistics (stats json [file] to export)
+  budget       - Show or set the fullreport time budget ('budget 120', 'budget off')
+  agent        - Collect report sections with a python agent sent over ssh
+                 ('agent on', 'agent off')
+  compress     - Compression of remote output: auto (by measured bandwidth),
+                 gzip, ssh or off (e.g. 'compress gzip')
+  format       - Output format text/json/ndjson for disk, memory, processes,
+                 ports, lvm and uptime (e.g. 'format ndjson')
   exit/quit    - Exit the bot
 
 USAGE:
@@ -385,45 +2073,274 @@ USAGE:
         output += self.run_remote_command("sar -u | tail -n 20 2>/dev/null || echo 'SAR not available'")
         return output
     
+    def plan_commands(self, section):
+        """Return the remote commands a section would run, without running them"""
+        self._plan = []
+        try:
+            section()
+            return self._plan
+        finally:
+            self._plan = None
+    
+    def report_sections(self):
+        """(name, method) of the full report sections in order"""
+        return [
+            ('system', self.system_info),
+            ('lvm', self.lvm_info),
+            ('netconfig', self.network_config),
+            ('userconfig', self.user_config),
+            ('samba', self.samba_config),
+            ('cluster', self.cluster_info),
+            ('performance', self.performance_report),
+        ]
+    
+    def iter_sections(self, sections):
+        """Yield (name, output) for each section in order as soon as it is ready"""
+        if self.agent and sections and all(name in AGENT_SECTIONS for name, section in sections):
+            yield from self._iter_agent_sections(sections)
+        else:
+            yield from self._iter_shell_sections(sections)
+    
+    def _iter_agent_sections(self, sections):
+        """Sections collected by one agent run; sections it fails on use shell commands"""
+        from concurrent.futures import wait
+        
+        stream = AgentStream((name for name, section in sections), self.compressing)
+        runner = self.engine.schedule(self._execute_agent_async(stream))
+        try:
+            for index, (name, section) in enumerate(sections):
+                frame = stream.futures[name].result()
+                if 'items' in frame:
+                    # Archived tagged: the agent's layout differs from the shell tools'
+                    self._collectors[name] = 'agent'
+                    yield name, AgentStream.render(frame)
+                elif frame.get('ended') and not frame['timed_out']:
+                    # No python3 on the host or the agent died: the rest goes the usual way
+                    yield from self._iter_shell_sections(sections[index:])
+                    return
+                else:
+                    # Past the deadline its commands are skipped and the section marked
+                    yield name, section()
+            # All frames are in; let the run record its statistics
+            wait([runner])
+        finally:
+            runner.cancel()
+    
+    def _iter_shell_sections(self, sections):
+        from concurrent.futures import wait
+        
+        # Without the master, password authentication would prompt once per session
+        concurrent = self.workers > 1 and not (self.use_password and not self.master.alive)
+        if self.batch == 'off' and not concurrent:
+            for name, section in sections:
+                yield name, section()
+            return
+        
+        commands = []
+        groups = []
+        for name, section in sections:
+            group = [cmd for cmd in self.plan_commands(section) if cmd not in commands]
+            commands += group
+            groups.append(group)
+        if self.batch == 'report':
+            groups = [commands]
+        elif self.batch == 'off':
+            groups = [[cmd] for cmd in commands]
+        
+        # One remote script per group; the engine keeps up to workers ssh sessions open
+        runners = []
+        for group in groups:
+            if len(group) == 1:
+                runners.append(self.engine.schedule(self._execute_async(group[0])))
+                self._pending[group[0]] = runners[-1]
+            elif group:
+                batch = BatchScript(group, self.compressing)
+                runners.append(self.engine.schedule(self._execute_batch_async(batch)))
+                self._pending.update(zip(group, batch.futures))
+        try:
+            # Commands a section only decides to run at render time simply run inline
+            for name, section in sections:
+                yield name, section()
+            # All output is in; let the runners record their statistics
+            wait(runners)
+        finally:
+            # Stopped early (interrupt, error): kill whatever is still running
+            for future in runners:
+                future.cancel()
+            self._pending = {}
+    
+    def batched(self, name, section):
+        """section as a command whose remote commands go out as one script (or the agent)"""
+        def run():
+            return "".join(output for name_, output in self.iter_sections([(name, section)]))
+        run.__doc__ = section.__doc__
+        return run
+    
+    def iter_report(self):
+        """Yield (name, output) of the report sections under the time budget
+        
+        With a budget every command is capped by the report deadline and
+        sections with timed out commands are marked.
+        """
+        self._timed_out = 0
+        self._collectors = {}
+        # A deadline already set (fleet per-host timeout) still applies
+        previous = self._deadline
+        if self.report_budget:
+            deadline = time.monotonic() + self.report_budget
+            self._deadline = deadline if previous is None else min(previous, deadline)
+        try:
+            for name, section in self.iter_sections(self.report_sections()):
+                if self._timed_out:
+                    section = f"⏱  TIMED OUT: {self._timed_out} command(s) in this section did not complete\n" + section
+                self._timed_out = 0
+                yield name, section
+        finally:
+            self._deadline = previous
+            self._timed_out = 0
+    
+    @property
+    def archive(self):
+        return ReportArchive(os.path.join(STATE_DIR, ARCHIVE_DIR), self.remote_host)
+    
     def full_report(self):
         """Generate complete system report"""
-        print("\n🔍 Generating full system report from remote system... This may take a moment.\n")
+        if self.interactive:
+            print("\n🔍 Generating full system report from remote system... This may take a moment.\n")
+        generated = datetime.now()
         output = "╔════════════════════════════════════════════════════════════╗\n"
         output += "║         COMPLETE REMOTE SYSTEM REPORT - HNM BOT            ║\n"
         output += "╚════════════════════════════════════════════════════════════╝\n"
         output += f"Remote Host: {self.remote_host}\n"
-        output += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        output += f"Generated: {generated.strftime('%Y-%m-%d %H:%M:%S')}\n"
         output += "=" * 60 + "\n\n"
         
-        output += self.system_info() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.lvm_info() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.network_config() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.user_config() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.samba_config() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.cluster_info() + "\n\n"
-        output += "=" * 60 + "\n\n"
-        output += self.performance_report() + "\n\n"
+        sections = list(self.iter_report())
+        output += ("=" * 60 + "\n\n").join(section + "\n\n" for name, section in sections)
+        timed_out_sections = [name for name, section in sections if section.startswith("⏱")]
+        if timed_out_sections:
+            output += f"⏱  Incomplete sections: {', '.join(timed_out_sections)}\n"
         
         # Save to file
-        filename = f"remote_report_{self.remote_host}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        filename = f"remote_report_{self.remote_host}_{generated.strftime('%Y%m%d_%H%M%S')}.txt"
+        if self.report_dir:
+            filename = os.path.join(self.report_dir, filename)
         try:
             with open(filename, 'w') as f:
                 f.write(output)
             output += f"\n✓ Report saved to: {filename}\n"
         except Exception as e:
             output += f"\n⚠️  Could not save report to file: {str(e)}\n"
+        try:
+            snapshot, new = self.archive.save(generated, sections, self._collectors)
+            output += f"✓ Archived: {new} of {len(sections)} section(s) new\n"
+        except OSError as e:
+            output += f"⚠️  Could not archive report: {str(e)}\n"
         
         return output
     
+    def report_history(self, *args):
+        """Archived versions of one report section ('history lvm --since 30d')"""
+        if not self.remote_host:
+            return "Error: No remote host. Use 'connect' command first."
+        store = self.archive
+        if not args:
+            return store.summary()
+        section = args[0]
+        names = [name for name, method in self.report_sections()]
+        if section not in names:
+            return f"❌ Unknown section '{section}' ({', '.join(names)})"
+        since = None
+        if len(args) >= 3 and args[1] == '--since':
+            try:
+                since = parse_since(args[2])
+            except ValueError:
+                return f"❌ Invalid --since '{args[2]}' (e.g. 30d, 12h, 2w or 2024-01-31)"
+        return store.history(section, since) or f"No archived '{section}' sections for that period"
+    
+    def diff_report(self, *args):
+        """Collect a report and show only what changed since the last snapshot
+        
+        'diff last' compares the two most recent snapshots without collecting.
+        """
+        if not self.connected:
+            return "Error: Not connected to remote system. Use 'connect' command first."
+        store = self.archive
+        if args and args[0] == 'last':
+            snapshots = store.snapshots()
+            if len(snapshots) < 2:
+                return "Need two archived reports to compare; run 'fullreport' or 'diff' first"
+            old, new = snapshots[-2], snapshots[-1]
+            texts = None
+        else:
+            if self.interactive:
+                print("\n🔍 Collecting remote report to compare with the last snapshot...\n")
+            old = store.latest()
+            generated = datetime.now()
+            sections = list(self.iter_report())
+            try:
+                new, _ = store.save(generated, sections, self._collectors)
+            except OSError as e:
+                return f"⚠️  Could not archive report: {str(e)}"
+            if old is None:
+                return "No previous report in the archive; this one is saved as the baseline"
+            texts = dict(sections)
+        
+        changed, diff = store.diff(old, new, texts)
+        previous = dict(old['sections'])
+        unchanged = sum(1 for name, digest in new['sections'] if previous.get(name) == digest)
+        output = "╔════════════════════════════════════════════════════════════╗\n"
+        output += "║            DELTA REMOTE SYSTEM REPORT - HNM BOT            ║\n"
+        output += "╚════════════════════════════════════════════════════════════╝\n"
+        output += f"Remote Host: {new['host']}\n"
+        output += f"Compared: {old['generated']} -> {new['generated']}\n"
+        output += f"Changed sections: {', '.join(changed) or 'none'} ({unchanged} unchanged)\n"
+        output += "=" * 60 + "\n\n"
+        output += diff
+        if not changed or texts is None:
+            return output
+        
+        filename = f"remote_delta_{self.remote_host}_{new['generated'].replace('-', '').replace(':', '').replace('T', '_')}.txt"
+        try:
+            with open(filename, 'w') as f:
+                f.write(output)
+            output += f"✓ Delta saved to: {filename}\n"
+        except Exception as e:
+            output += f"⚠️  Could not save delta to file: {str(e)}\n"
+        return output
+    
+    def batch_commands(self):
+        """Commands that can run non-interactively via --run"""
+        return [name for name in self.commands if name not in INTERACTIVE_COMMANDS]
+    
+    def run_batch(self, names, fmt, stream):
+        """Run commands without the prompt and return the exit status"""
+        self.interactive = False
+        timeouts = self.stats.timeouts()
+        status = EXIT_OK
+        for name in names:
+            try:
+                if fmt != 'text' and name in self.structured:
+                    self.emit_structured(name, stream, fmt)
+                    continue
+                result = self.commands[name]() or ""
+            except Exception as e:
+                sys.stderr.write(f"❌ {name}: {str(e)}\n")
+                status = EXIT_COLLECTOR_FAILED
+                continue
+            if fmt == 'text':
+                stream.write(result + "\n\n")
+            else:
+                write_text_result(stream, name, result, fmt, host=self.remote_host)
+        if self.stats.timeouts() > timeouts:
+            status = EXIT_COLLECTOR_FAILED
+        return status
+    
     def exit_bot(self):
         """Exit the bot"""
         if self.connected:
             print(f"\nDisconnecting from {self.remote_host}...")
+            self.disconnect()
         print("\n👋 Goodbye! Stay secure!")
         sys.exit(0)
     
@@ -445,13 +2362,18 @@ USAGE:
                 else:
                     prompt = "🌐 hnm-remote [not connected]> "
                 
-                user_input = input(prompt).strip().lower()
+                user_input = input(prompt).strip()
                 
                 if not user_input:
                     continue
                 
+                user_input, *args = user_input.split()
+                user_input = user_input.lower()
                 if user_input in self.commands:
-                    result = self.commands[user_input]()
+                    if self.output_format != 'text' and user_input in self.structured:
+                        result = self.emit_structured(user_input, sys.stdout)
+                    else:
+                        result = self.commands[user_input](*args)
                     if result:
                         print(f"\n{result}\n")
                 else:
@@ -467,7 +2389,270 @@ USAGE:
             except Exception as e:
                 print(f"\n❌ Error: {str(e)}\n")
 
+class InventoryHost:
+    """One inventory line: host, user, SSH key and groups (None = default)"""
+    __slots__ = ('host', 'user', 'key', 'groups')
+    
+    def __init__(self, host, user=None, key=None, groups=()):
+        self.host = host
+        self.user = user
+        self.key = key
+        self.groups = list(groups)
+
+
+def load_inventory(path):
+    """Hosts of an inventory file
+    
+    One host per line: 'host [user [key [group,group...]]]', '-' keeps the
+    default for a field, '#' starts a comment.
+    """
+    hosts = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) > 4:
+                raise ValueError(f"{path}:{number}: expected 'host [user [key [groups]]]'")
+            host, user, key, groups = fields + ['-'] * (4 - len(fields))
+            hosts.append(InventoryHost(
+                host,
+                None if user == '-' else user,
+                None if key == '-' else os.path.expanduser(key),
+                [] if groups == '-' else [group for group in groups.split(',') if group]))
+    return hosts
+
+
+class Fleet:
+    """Run batch commands against many hosts with a bounded pool
+    
+    Each host gets its own bot (and ssh master) sharing one command
+    engine, a time limit for everything it runs, and one result file in
+    output_dir; full reports are also archived per host as usual.
+    """
+    
+    def __init__(self, hosts, workers=DEFAULT_FLEET_WORKERS, host_timeout=DEFAULT_HOST_TIMEOUT,
+                 output_dir=".", user="root", key=None, progress=sys.stderr, agent=False, compress=None):
+        self.hosts = hosts
+        self.workers = max(1, min(workers, len(hosts) or 1, self.fd_limit()))
+        self.host_timeout = host_timeout
+        self.output_dir = output_dir
+        self.user = user
+        self.key = key
+        self.progress = progress
+        self.agent = agent
+        self.compress = compress
+        self.engine = CommandEngine(self.workers * DEFAULT_WORKERS)
+        self.results = []  # (host, status, seconds, message)
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def fd_limit():
+        """Hosts that fit in the open file limit"""
+        try:
+            import resource
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        except (ImportError, ValueError, OSError):
+            return DEFAULT_FLEET_WORKERS
+        if soft == resource.RLIM_INFINITY:
+            return 1 << 16
+        return max(1, (soft - 64) // FLEET_FDS_PER_HOST)
+    
+    def run(self, names, fmt):
+        """Run names on every host; returns the worst exit status"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.started = time.monotonic()
+        self.results = []
+        self._show()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [(entry, pool.submit(self._run_host, entry, names, fmt)) for entry in self.hosts]
+        # A host whose worker raised (building its bot, disconnecting) has no result yet
+        for entry, future in futures:
+            error = future.exception()
+            if error is not None:
+                self._record(entry.host, EXIT_COLLECTOR_FAILED, time.monotonic() - self.started,
+                             f"internal error: {type(error).__name__}: {error}")
+        if self.progress.isatty():
+            self.progress.write("\n")
+        statuses = [status for host, status, seconds, message in self.results]
+        if EXIT_CONNECT_FAILED in statuses:
+            return EXIT_CONNECT_FAILED
+        return max(statuses, default=EXIT_OK)
+    
+    def _run_host(self, entry, names, fmt):
+        started = time.monotonic()
+        bot = Hnm_Remote_Bot(report_budget=self.host_timeout, engine=self.engine)
+        bot.interactive = False
+        bot.agent = bot.agent or self.agent
+        bot.compress = self.compress or bot.compress
+        bot.remote_host = entry.host
+        bot.remote_user = entry.user or self.user
+        key = entry.key or self.key
+        bot.ssh_key = key if key and os.path.exists(key) else None
+        bot.report_dir = self.output_dir
+        message = ""
+        try:
+            # The host's time limit covers connecting and every command
+            bot._deadline = started + self.host_timeout
+            test_result = bot.open_connection()
+            if not bot.connected:
+                status = EXIT_CONNECT_FAILED
+                message = (test_result.strip().splitlines() or ["connection failed"])[-1]
+            else:
+                extension = 'txt' if fmt == 'text' else fmt
+                with open(os.path.join(self.output_dir, f"{entry.host}.{extension}"), 'w') as stream:
+                    status = bot.run_batch(names, fmt, stream)
+                if bot.stats.timeouts():
+                    message = f"{bot.stats.timeouts()} command(s) timed out"
+        except Exception as e:
+            status = EXIT_COLLECTOR_FAILED
+            message = str(e)
+        finally:
+            if bot.connected:
+                bot.disconnect()
+        self._record(entry.host, status, time.monotonic() - started, message)
+    
+    def _record(self, host, status, seconds, message):
+        with self.lock:
+            self.results.append((host, status, seconds, message))
+            try:
+                self._show(host, status, message)
+            except (OSError, ValueError):
+                pass  # progress output is gone (closed pipe); the result still counts
+    
+    def _show(self, host=None, status=None, message=""):
+        """Live progress: one updating line on a terminal, a line per host otherwise"""
+        done = len(self.results)
+        failed = sum(1 for result in self.results if result[1] != EXIT_OK)
+        elapsed = time.monotonic() - self.started
+        counter = f"[{done}/{len(self.hosts)}] ok {done - failed}  failed {failed}  {elapsed:.0f}s"
+        if self.progress.isatty():
+            self.progress.write(f"\r{counter}\033[K")
+        elif host is not None:
+            mark = "✓" if status == EXIT_OK else "✗"
+            self.progress.write(f"{counter}  {mark} {host}{'  ' + message if message else ''}\n")
+        self.progress.flush()
+    
+    def summary(self):
+        ok = sum(1 for result in self.results if result[1] == EXIT_OK)
+        seconds = time.monotonic() - self.started
+        output = f"Hosts: {len(self.results)}  OK: {ok}  Failed: {len(self.results) - ok}  "
+        output += f"Time: {seconds:.1f}s ({len(self.results) / seconds if seconds else 0:.1f} hosts/s, "
+        output += f"{self.workers} workers)\n"
+        for host, status, seconds, message in sorted(self.results):
+            if status != EXIT_OK:
+                output += f"  ✗ {host}: {message or f'exit status {status}'}\n"
+        output += f"Results: {self.output_dir}\n"
+        return output
+
+
+def run_fleet(args, names):
+    """--inventory: run names on every (matching) inventory host"""
+    try:
+        hosts = load_inventory(args.inventory)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"❌ Cannot read inventory: {str(e)}\n")
+        return EXIT_USAGE
+    if args.group:
+        hosts = [entry for entry in hosts if args.group in entry.groups]
+    if not hosts:
+        sys.stderr.write("❌ No hosts in the inventory" + (f" for group '{args.group}'" if args.group else "") + "\n")
+        return EXIT_USAGE
+    output_dir = args.output_dir or f"fleet_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    fleet = Fleet(hosts, workers=args.fleet_workers, host_timeout=args.host_timeout, output_dir=output_dir,
+                  user=args.user, key=args.key, agent=args.agent, compress=args.compress)
+    try:
+        status = fleet.run(names, args.format)
+    except OSError as e:
+        sys.stderr.write(f"❌ Cannot write results: {str(e)}\n")
+        return EXIT_OUTPUT_FAILED
+    sys.stderr.write(fleet.summary())
+    return status
+
+
+def main(argv=None):
+    """Interactive prompt, or batch mode when --run is given"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        Hnm_Remote_Bot().start()
+        return EXIT_OK
+    
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="hnm_remote_bot.py",
+        description="HNM Remote Bot - remote Linux system administration via SSH",
+        epilog="Without --run the interactive prompt starts. Batch mode uses SSH key "
+               "authentication only. Exit status: 0 success, 1 a command failed or timed "
+               "out, 2 usage error, 3 output not writable, 4 connection failed.")
+    parser.add_argument("--run", metavar="LIST", help="comma separated commands to run, e.g. disk,memory,lvm")
+    parser.add_argument("--host", help="remote hostname/IP (required with --run)")
+    parser.add_argument("--user", default="root", help="remote username (default: root)")
+    parser.add_argument("--key", default=os.path.expanduser("~/.ssh/id_rsa"), help="SSH private key (default: ~/.ssh/id_rsa)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="output format (default: text)")
+    parser.add_argument("--output", metavar="PATH", help="write results to PATH instead of stdout")
+    parser.add_argument("--budget", type=float, help="fullreport time budget in seconds (0 = none)")
+    parser.add_argument("--workers", type=int, help="concurrent ssh sessions during fullreport (1 = serial)")
+    parser.add_argument("--agent", action="store_true",
+                        help="collect report sections with a python agent sent over ssh (needs python3 on the host)")
+    parser.add_argument("--compress", choices=COMPRESS_MODES,
+                        help="compress remote output: auto (by measured bandwidth, default), gzip, ssh or off")
+    parser.add_argument("--inventory", metavar="FILE", help="run --run on every host of FILE ('host [user [key [groups]]]' per line)")
+    parser.add_argument("--group", help="with --inventory: only hosts in this group")
+    parser.add_argument("--fleet-workers", type=int, default=DEFAULT_FLEET_WORKERS,
+                        help=f"with --inventory: hosts handled at a time (default: {DEFAULT_FLEET_WORKERS})")
+    parser.add_argument("--host-timeout", type=float, default=DEFAULT_HOST_TIMEOUT,
+                        help=f"with --inventory: seconds allowed per host (default: {DEFAULT_HOST_TIMEOUT})")
+    parser.add_argument("--output-dir", metavar="DIR", help="with --inventory: one result file per host in DIR")
+    args = parser.parse_args(argv)
+    
+    bot = Hnm_Remote_Bot(workers=args.workers, report_budget=args.budget)
+    bot.agent = bot.agent or args.agent
+    bot.compress = args.compress or bot.compress
+    if args.run is None:
+        bot.start()
+        return EXIT_OK
+    if not args.host and not args.inventory:
+        parser.print_usage(sys.stderr)
+        sys.stderr.write("❌ --host or --inventory is required with --run\n")
+        return EXIT_USAGE
+    
+    names = [name.strip().lower() for name in args.run.split(',') if name.strip()]
+    available = bot.batch_commands()
+    unknown = [name for name in names if name not in available]
+    if not names or unknown:
+        sys.stderr.write(f"❌ Unknown command(s): {', '.join(unknown) or '(none given)'}\n")
+        sys.stderr.write(f"Available: {', '.join(available)}\n")
+        return EXIT_USAGE
+    if args.inventory:
+        return run_fleet(args, names)
+    
+    bot.interactive = False
+    bot.remote_host = args.host
+    bot.remote_user = args.user
+    bot.ssh_key = args.key if os.path.exists(args.key) else None
+    test_result = bot.open_connection()
+    if not bot.connected:
+        sys.stderr.write(f"❌ Connection to {args.user}@{args.host} failed:\n{test_result}\n")
+        return EXIT_CONNECT_FAILED
+    
+    try:
+        stream = open(args.output, 'w') if args.output else sys.stdout
+    except OSError as e:
+        sys.stderr.write(f"❌ Cannot open output file: {str(e)}\n")
+        return EXIT_OUTPUT_FAILED
+    try:
+        status = bot.run_batch(names, args.format, stream)
+        stream.flush()
+    except OSError as e:
+        sys.stderr.write(f"❌ Cannot write output: {str(e)}\n")
+        status = EXIT_OUTPUT_FAILED
+    finally:
+        if args.output:
+            stream.close()
+    return status
+
 if __name__ == "__main__":
-    bot = Hnm_Remote_Bot()
-    bot.start()
+    sys.exit(main())
 
@@ -0,0 +1,100 @@
+"""BatchScript: one remote script for several commands, split back per command"""
+
+import importlib.util
+import os
+import shutil
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_remote_bot_production', 'hnm_remote_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_remote_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class BatchScriptTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def run_script(self, batch):
+        """stdout of batch's script run by the local sh (standing in for the remote one)"""
+        return subprocess.run(["/bin/sh", "-c", batch.script()], stdout=subprocess.PIPE, timeout=60).stdout
+
+    def feed(self, batch, data, size):
+        for start in range(0, len(data), size):
+            batch.feed('stdout', data[start:start + size])
+
+    def check_results(self, batch):
+        one, failed, partial = batch.results
+        self.assertEqual((one.output, one.returncode, one.stdout_bytes, one.stderr_bytes), ("one\ntwo\n", 0, 8, 0))
+        self.assertEqual((failed.output, failed.returncode, failed.stderr_bytes), ("bad thing\n", 3, 10))
+        self.assertEqual((partial.output, partial.returncode), ("no newline", 0))
+        for result in batch.results:
+            self.assertFalse(result.timed_out)
+            self.assertGreaterEqual(result.elapsed, 0.0)
+
+    def commands(self):
+        return ["echo one; echo two", "echo 'bad thing' >&2; exit 3", "printf 'no newline'"]
+
+    def test_markers_split_across_chunks(self):
+        for size in (1, 7, 64, 1 << 16):
+            with self.subTest(chunk=size):
+                batch = self.bot.BatchScript(self.commands())
+                self.feed(batch, self.run_script(batch), size)
+                self.assertTrue(all(future.done() for future in batch.futures))
+                self.check_results(batch)
+
+    def test_results_resolve_as_they_arrive(self):
+        batch = self.bot.BatchScript(self.commands())
+        output = self.run_script(batch)
+        second = output.index(batch.begin, 1)
+        batch.feed('stdout', output[:second])
+        self.assertEqual([future.done() for future in batch.futures], [True, False, False])
+        batch.feed('stdout', output[second:])
+        self.assertTrue(batch.futures[2].done())
+
+    @unittest.skipUnless(shutil.which("gzip"), "needs gzip")
+    def test_compressed(self):
+        batch = self.bot.BatchScript(self.commands(), compress=True)
+        self.feed(batch, self.run_script(batch), 5)
+        self.check_results(batch)
+        one = batch.results[0]
+        self.assertIsNotNone(one.wire_bytes)
+        self.assertNotEqual(one.wire_bytes, one.stdout_bytes)
+
+    def test_deadline_kill_and_skipped_commands(self):
+        batch = self.bot.BatchScript(["echo one", "sleep 100", "echo three"])
+        # The first command finished and the second started when ssh was killed
+        head = self.bot.BatchScript(["echo one"])
+        head.marker = batch.marker
+        batch.feed('stdout', self.run_script(head) + batch.begin + b"1\npartial")
+        first = batch.results[0]
+        batch.finish(self.bot.CommandResult("Command timed out after 5 seconds\n", -1, timed_out=True, elapsed=5.0))
+        killed, skipped = batch.results[1:]
+        self.assertTrue(killed.timed_out)
+        self.assertAlmostEqual(killed.elapsed, 5.0 - first.elapsed)
+        self.assertTrue(skipped.timed_out)
+        self.assertIsNone(skipped.elapsed)
+        self.assertEqual(skipped.output, "Skipped: report deadline reached\n")
+
+    def test_nothing_started_before_the_deadline(self):
+        batch = self.bot.BatchScript(["echo one", "echo two"])
+        batch.finish(self.bot.CommandResult("Skipped: report deadline reached\n", -1, timed_out=True))
+        self.assertEqual([result.elapsed for result in batch.results], [None, None])
+
+    def test_batch_ended_early(self):
+        batch = self.bot.BatchScript(["echo one"])
+        batch.finish(self.bot.CommandResult("", 255, elapsed=0.1))
+        self.assertEqual((batch.results[0].output, batch.results[0].returncode),
+                         ("Error: remote batch ended early\n", 255))
+
+
+if __name__ == '__main__':
+    unittest.main()
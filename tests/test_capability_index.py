@@ -0,0 +1,51 @@
+"""CapabilityIndex package manager detection on hosts without apt"""
+
+import importlib.util
+import os
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class PackageManagerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def scan_with(self, present):
+        """Scan with only the package manager binaries in present on disk"""
+        real_exists = os.path.exists
+        managers = ('/usr/bin/apt', '/usr/bin/apt-get', '/usr/bin/zypper', '/usr/bin/dnf', '/usr/bin/yum')
+
+        def exists(path):
+            if path in managers:
+                return path in present
+            return real_exists(path)
+
+        with mock.patch.object(self.bot.os.path, 'exists', exists):
+            return self.bot.CapabilityIndex().package_manager
+
+    def test_apt(self):
+        self.assertEqual(self.scan_with({'/usr/bin/apt-get', '/usr/bin/yum'}), 'apt')
+
+    def test_non_apt_hosts(self):
+        self.assertEqual(self.scan_with({'/usr/bin/zypper'}), 'zypper')
+        self.assertEqual(self.scan_with({'/usr/bin/dnf', '/usr/bin/yum'}), 'dnf')
+        self.assertEqual(self.scan_with({'/usr/bin/yum'}), 'yum')
+
+    def test_no_package_manager(self):
+        self.assertIsNone(self.scan_with(set()))
+
+
+if __name__ == '__main__':
+    unittest.main()
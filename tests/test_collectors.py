@@ -0,0 +1,130 @@
+"""Shell-free collectors: in-process stages and Run/Read alternatives"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ApplyStagesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def test_no_stages(self):
+        self.assertEqual(self.bot.apply_stages("a\nb", ()), "a\nb")
+
+    def test_pipeline(self):
+        bot = self.bot
+        text = "root:x:0\n# comment\nalice:x:1000\nbob:x:1001\n"
+        self.assertEqual(bot.apply_stages(text, (bot.drop_comments, bot.head(2))), "root:x:0\nalice:x:1000\n")
+        self.assertEqual(bot.apply_stages(text, (bot.tail(2),)), "alice:x:1000\nbob:x:1001\n")
+        self.assertEqual(bot.apply_stages(text, (bot.grep('ALICE', ignore_case=True),)), "alice:x:1000\n")
+        self.assertEqual(bot.apply_stages(text, (bot.grep(':x:', invert=True),)), "# comment\n")
+
+    def test_final_filter_left_nothing(self):
+        bot = self.bot
+        # Like grep exiting 1: the alternative failed
+        self.assertIsNone(bot.apply_stages("a\nb\n", (bot.grep('zzz'),)))
+        # head after it succeeds with nothing, as 'grep zzz | head' exits 0
+        self.assertEqual(bot.apply_stages("a\nb\n", (bot.grep('zzz'), bot.head(5))), "")
+        self.assertEqual(bot.apply_stages("a\nb\n", (bot.tail(0),)), "")
+
+
+class CollectTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.host = self.bot.Hnm_Linux_Bot(workers=1)
+        self.results = {}
+        self.ran = []
+
+        def run(argv, use_cache=True):
+            self.ran.append(" ".join(argv))
+            return self.results[" ".join(argv)]
+        self.host._run = run
+
+    def command(self, line, output="", returncode=0, stderr="", timed_out=False):
+        Result = self.bot.CommandResult
+        self.results[line] = Result(output or stderr, returncode, timed_out=timed_out, elapsed=0.01,
+                                    stdout_bytes=len(output), stderr_bytes=len(stderr))
+
+    def test_first_success_wins(self):
+        self.command("ss -tuln", "tcp LISTEN 0.0.0.0:22\n")
+        self.command("netstat -tuln", "unused\n")
+        Run = self.bot.Run
+        self.assertEqual(self.host.collect(Run("ss -tuln"), Run("netstat -tuln")), "tcp LISTEN 0.0.0.0:22\n")
+        self.assertEqual(self.ran, ["ss -tuln"])
+
+    def test_failed_command_falls_back(self):
+        self.command("ss -tuln", returncode=127, stderr="ss: not found\n")
+        self.command("netstat -tuln", "tcp 0.0.0.0:22 LISTEN\n")
+        Run = self.bot.Run
+        self.assertEqual(self.host.collect(Run("ss -tuln"), Run("netstat -tuln")), "tcp 0.0.0.0:22 LISTEN\n")
+
+    def test_empty_grep_falls_back(self):
+        bot = self.bot
+        self.command("systemctl list-units", "cron.service running\n")
+        self.command("chkconfig --list", "ntpd on\n")
+        output = self.host.collect(bot.Run("systemctl list-units", bot.grep('failed')),
+                                   bot.Run("chkconfig --list", bot.grep('ntp')))
+        self.assertEqual(output, "ntpd on\n")
+
+    def test_fallback_text(self):
+        bot = self.bot
+        self.command("grep -i error /var/log/messages", returncode=1)
+        output = self.host.collect(bot.Run("grep -i error /var/log/messages"), bot.Read(os.path.join(self.dir, "nope")),
+                                   fallback="No error logs found")
+        self.assertEqual(output, "No error logs found\n")
+
+    def test_last_step_output_without_fallback(self):
+        Run = self.bot.Run
+        self.command("ss -tuln", returncode=127, stderr="ss: not found\n")
+        self.command("netstat -tuln", returncode=127, stderr="netstat: not found\n")
+        self.assertEqual(self.host.collect(Run("ss -tuln"), Run("netstat -tuln")), "netstat: not found\n")
+
+    def test_success_with_only_stderr_is_empty(self):
+        self.command("pvs", stderr="  WARNING: no devices\n")
+        self.assertEqual(self.host.collect(self.bot.Run("pvs")), "")
+
+    def test_timeout_stops_the_chain(self):
+        Run = self.bot.Run
+        self.command("sar 1 1", returncode=-1, stderr="Command timed out after 60 seconds\n", timed_out=True)
+        self.command("vmstat 1 1", "procs\n")
+        self.assertEqual(self.host.collect(Run("sar 1 1"), Run("vmstat 1 1")),
+                         "Command timed out after 60 seconds\n")
+        self.assertEqual(self.ran, ["sar 1 1"])
+
+    def test_read_before_run(self):
+        bot = self.bot
+        path = os.path.join(self.dir, "hosts")
+        with open(path, 'w') as f:
+            f.write("# static\n127.0.0.1 localhost\n")
+        self.command("getent hosts", "unused\n")
+        self.assertEqual(self.host.collect(bot.Read(path, bot.drop_comments), bot.Run("getent hosts")),
+                         "127.0.0.1 localhost\n")
+        self.assertEqual(self.ran, [])
+        missing = os.path.join(self.dir, "missing")
+        self.assertEqual(self.host.collect(bot.Read(missing), bot.Run("getent hosts")), "unused\n")
+        self.assertEqual(self.host.collect(bot.Read(missing)), missing + ": No such file or directory\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
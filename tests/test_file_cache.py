@@ -0,0 +1,95 @@
+"""FileCache validation by inode, size and mtime"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FileCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "smb.conf")
+        self.cache = self.bot.FileCache()
+
+    def write(self, text, path=None, mtime_ns=1700000000 * 10 ** 9):
+        path = path or self.path
+        with open(path, 'w') as f:
+            f.write(text)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_repeat_read_is_a_hit(self):
+        self.write("[global]\n")
+        self.assertEqual(self.cache.read(self.path), "[global]\n")
+        self.assertEqual(self.cache.read(self.path), "[global]\n")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_size_change(self):
+        self.write("[global]\n")
+        self.cache.read(self.path)
+        self.write("[global]\nworkgroup = X\n")
+        self.assertEqual(self.cache.read(self.path), "[global]\nworkgroup = X\n")
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_mtime_change(self):
+        self.write("workgroup = A\n")
+        self.cache.read(self.path)
+        self.write("workgroup = B\n", mtime_ns=1700000001 * 10 ** 9)
+        self.assertEqual(self.cache.read(self.path), "workgroup = B\n")
+
+    def test_inode_change(self):
+        self.write("workgroup = A\n")
+        self.cache.read(self.path)
+        # Same size and mtime, new file renamed over the old one
+        replacement = os.path.join(self.dir, "smb.conf.new")
+        self.write("workgroup = B\n", replacement)
+        os.replace(replacement, self.path)
+        self.assertEqual(self.cache.read(self.path), "workgroup = B\n")
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_views_per_stage_chain(self):
+        bot = self.bot
+        self.write("# comment\nworkgroup = A\n")
+        self.assertEqual(self.cache.read(self.path, (bot.drop_comments,)), "workgroup = A\n")
+        self.assertIsNone(self.cache.read(self.path, (bot.grep('netbios'),)))
+        self.assertEqual(self.cache.read(self.path), "# comment\nworkgroup = A\n")
+        self.assertIsNone(self.cache.read(self.path, (bot.grep('netbios'),)))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_proc_files_are_read_fresh(self):
+        if not os.path.exists("/proc/loadavg"):
+            self.skipTest("no /proc")
+        self.cache.read("/proc/loadavg")
+        self.cache.read("/proc/loadavg")
+        self.assertEqual((self.cache.hits, self.cache.misses, len(self.cache.entries)), (0, 2, 0))
+
+    def test_lru_eviction(self):
+        cache = self.bot.FileCache(max_bytes=30)
+        paths = [os.path.join(self.dir, name) for name in ("a", "b", "c")]
+        for path in paths:
+            self.write("x" * 12 + "\n", path)
+            cache.read(path)
+        self.assertEqual(list(cache.entries), paths[1:])
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.size, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Fleet accounting of hosts whose worker raised"""
+
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_remote_bot_production', 'hnm_remote_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_remote_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeStats:
+    def timeouts(self):
+        return 0
+
+
+class FakeBot:
+    """Stands in for Hnm_Remote_Bot; host names pick the failure"""
+
+    def __init__(self, **kwargs):
+        self.agent = False
+        self.compress = 'auto'
+        self.connected = False
+        self.stats = FakeStats()
+
+    def open_connection(self):
+        if self.remote_host == 'broken':
+            raise RuntimeError("bot setup failed")
+        self.connected = True
+        return "Connection successful"
+
+    def run_batch(self, names, fmt, stream):
+        stream.write("ok\n")
+        return 0
+
+    def disconnect(self):
+        if self.remote_host == 'sticky':
+            raise OSError("control socket gone")
+        self.connected = False
+
+
+class FleetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def run_fleet(self, hosts, bot_class=FakeBot):
+        entries = [self.bot.InventoryHost(host) for host in hosts]
+        progress = io.StringIO()
+        fleet = self.bot.Fleet(entries, workers=2, output_dir=self.dir, progress=progress)
+        with mock.patch.object(self.bot, 'Hnm_Remote_Bot', bot_class):
+            status = fleet.run(['disk'], 'text')
+        return fleet, status, progress.getvalue()
+
+    def test_raising_hosts_count_as_failed(self):
+        fleet, status, progress = self.run_fleet(['web01', 'sticky', 'broken'])
+        results = {host: (status, message) for host, status, seconds, message in fleet.results}
+        self.assertEqual(sorted(results), ['broken', 'sticky', 'web01'])
+        self.assertEqual(results['web01'], (0, ""))
+        self.assertEqual(results['broken'][0], self.bot.EXIT_COLLECTOR_FAILED)
+        self.assertEqual(results['sticky'][0], self.bot.EXIT_COLLECTOR_FAILED)
+        self.assertIn("control socket gone", results['sticky'][1])
+        self.assertEqual(status, self.bot.EXIT_COLLECTOR_FAILED)
+        self.assertIn("Failed: 2", fleet.summary())
+        self.assertIn("✗ sticky", progress)
+
+    def test_bot_construction_failure(self):
+        def exploding(**kwargs):
+            raise MemoryError("no bot for you")
+        fleet, status, progress = self.run_fleet(['db01'], exploding)
+        self.assertEqual(len(fleet.results), 1)
+        self.assertIn("MemoryError", fleet.results[0][3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""LogFollower journal and log file following"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LogTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def follower(self):
+        return self.bot.LogFollower(os.path.join(self.dir, "cursors.json"))
+
+
+class FollowJournalTest(LogTestCase):
+
+    def journal(self, responses):
+        """run callback answering each journalctl command from responses (priority, cursor) -> result"""
+        commands = []
+
+        def run(cmd):
+            commands.append(cmd)
+            priority = 'err' if '-p err' in cmd else 'all'
+            return responses[priority]
+        return run, commands
+
+    def result(self, output, returncode=0, timed_out=False):
+        return self.bot.CommandResult(output, returncode, timed_out=timed_out)
+
+    def test_failure_is_not_a_log_line(self):
+        run, commands = self.journal({
+            'all': self.result("Jan 1 host app: started\n-- cursor: s=1\n"),
+            'err': self.result("Failed to open journal: Permission denied\n", 1),
+        })
+        tail, errors, failures = self.follower().follow_journal(run)
+        self.assertEqual(tail, ["Jan 1 host app: started"])
+        self.assertEqual(errors, [])
+        self.assertEqual(len(failures), 1)
+        self.assertIn("Permission denied", failures[0])
+        self.assertTrue(failures[0].startswith("journalctl -p err "))
+
+    def test_timeout_is_reported(self):
+        run, commands = self.journal({
+            'all': self.result("Command timed out after 60 seconds\n", -1, timed_out=True),
+            'err': self.result("-- cursor: e=1\n"),
+        })
+        tail, errors, failures = self.follower().follow_journal(run)
+        self.assertEqual(tail, [])
+        self.assertIn("timed out", failures[0])
+
+    def test_no_entries_is_not_a_failure(self):
+        run, commands = self.journal({'all': self.result("-- No entries --\n", 1),
+                                      'err': self.result("-- No entries --\n", 1)})
+        self.assertEqual(self.follower().follow_journal(run), ([], [], []))
+
+    def test_rejected_cursor_is_dropped(self):
+        follower = self.follower()
+        follower.state['journal'] = {'cursor': "s=old", 'tail': ["line 1"], 'error_cursor': "e=old",
+                                     'errors': ["error 1"]}
+        run, commands = self.journal({
+            'all': self.result("Failed to seek to cursor: Invalid argument\n", 1),
+            'err': self.result("-- cursor: e=2\n"),
+        })
+        tail, errors, failures = follower.follow_journal(run)
+        self.assertEqual((tail, errors), (["line 1"], ["error 1"]))
+        self.assertNotIn('cursor', follower.state['journal'])
+        self.assertEqual(follower.state['journal']['error_cursor'], "e=2")
+        self.assertIn("--after-cursor=s=old", commands[0])
+
+    def test_reseed_keeps_lines_once(self):
+        follower = self.follower()
+        follower.state['journal'] = {'errors': ["error 1", "error 2"]}
+        run, commands = self.journal({
+            'all': self.result("-- cursor: s=1\n"),
+            'err': self.result("error 2\nerror 3\n-- cursor: e=1\n"),
+        })
+        tail, errors, failures = follower.follow_journal(run)
+        self.assertIn("-n 10", commands[1])
+        self.assertEqual(errors, ["error 1", "error 2", "error 3"])
+
+
+class FollowFileTest(LogTestCase):
+
+    def write(self, lines, mode='a'):
+        with open(self.path, mode) as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.dir, "messages")
+
+    def test_new_lines_only(self):
+        follower = self.follower()
+        self.write(["boot ok", "disk error 1"], 'w')
+        follower.follow_file(self.path)
+        self.write(["fan error 2"])
+        tail, errors = follower.follow_file(self.path)
+        self.assertEqual(tail, ["boot ok", "disk error 1", "fan error 2"])
+        self.assertEqual(errors, ["disk error 1", "fan error 2"])
+
+    def test_reseed_after_backlog_keeps_errors_once(self):
+        follower = self.follower()
+        self.write(["disk error 1", "fan error 2"], 'w')
+        follower.follow_file(self.path)
+        # A backlog past LOG_MAX_CATCHUP reseeds near the end; the scan back
+        # finds the errors the index already holds
+        self.write(["filler line %03d" % number for number in range(40)] + ["link error 3", "done"])
+        with mock.patch.object(self.bot, 'LOG_MAX_CATCHUP', 100), \
+                mock.patch.object(self.bot, 'LOG_SEED_BYTES', 60):
+            tail, errors = follower.follow_file(self.path)
+        self.assertEqual(errors, ["disk error 1", "fan error 2", "link error 3"])
+        self.assertEqual(tail[-2:], ["link error 3", "done"])
+        self.assertEqual(len(tail), len(set(tail)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""scan_recent_matches backward search of log files"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ScanRecentMatchesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "syslog")
+
+    def write(self, lines):
+        with open(self.path, 'w') as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def scan(self, count, **kwargs):
+        return self.bot.scan_recent_matches(self.path, self.bot.LOG_ERROR_PATTERNS, count, **kwargs)
+
+    def test_newest_matches_oldest_first(self):
+        self.write(["disk error 1", "all good", "fan FAILED 2", "link error 3", "done"])
+        self.assertEqual(self.scan(2), ["fan FAILED 2", "link error 3"])
+        self.assertEqual(self.scan(10), ["disk error 1", "fan FAILED 2", "link error 3"])
+
+    def test_matches_across_block_boundaries(self):
+        lines = ["filler line number %03d" % number for number in range(30)]
+        lines[3] = "kernel: disk error on sda at block %d" % 1234567
+        lines[17] = "sshd: authentication failure for root from 192.0.2.7"
+        lines[29] = "app: segfault at 0000 ip 00007f"
+        self.write(lines)
+        # Blocks far smaller than one line still only ever see whole lines
+        expected = [lines[3], lines[17], lines[29]]
+        for chunk in (8, 30, 64, 1 << 16):
+            with self.subTest(chunk=chunk):
+                self.assertEqual(self.scan(10, chunk=chunk), expected)
+                self.assertEqual(self.scan(2, chunk=chunk), expected[1:])
+
+    def test_end_limits_the_scan(self):
+        self.write(["disk error 1", "link error 2", "fan error 3"])
+        end = len("disk error 1\nlink error 2\n")
+        self.assertEqual(self.scan(10, end=end, chunk=8), ["disk error 1", "link error 2"])
+
+    def test_literal_hits_are_confirmed_by_the_regex(self):
+        self.write(["back room cooling", "Out of memory: oom-killer invoked", "OOM score adjusted"])
+        self.assertEqual(self.scan(10), ["Out of memory: oom-killer invoked", "OOM score adjusted"])
+
+    def test_empty_file(self):
+        self.write([])
+        self.assertEqual(self.scan(5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""Remote collection agent: rendering and its framed output stream"""
+
+import importlib.util
+import io
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import unittest
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_remote_bot_production', 'hnm_remote_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_remote_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_agent(files):
+    """Agent namespace whose open() serves the given path -> text files"""
+    agent = {'__name__': 'hnm_agent'}
+    exec(compile(load_bot_module().AGENT_SOURCE, 'hnm_agent', 'exec'), agent)
+
+    def fake_open(path, *args, **kwargs):
+        if path not in files:
+            raise FileNotFoundError(path)
+        return io.StringIO(files[path])
+
+    agent['open'] = fake_open
+    return agent
+
+
+def route_hex(address):
+    """An IPv4 address as the kernel prints it in /proc/net/route"""
+    return "%08X" % struct.unpack('=I', socket.inet_aton(address))[0]
+
+
+class RoutesTest(unittest.TestCase):
+
+    def test_route_line(self):
+        header = "Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\tMTU\tWindow\tIRTT\n"
+        line = "\t".join(("eth0", route_hex("192.168.10.0"), route_hex("192.168.10.1"), "0003",
+                          "0", "0", "100", route_hex("255.255.255.0"), "0", "0", "0")) + "\n"
+        agent = load_agent({'/proc/net/route': header + line})
+        rows = agent['routes']().splitlines()
+        self.assertEqual(rows[0], "Kernel IP routing table")
+        self.assertEqual(rows[2].split(),
+                         ["192.168.10.0", "192.168.10.1", "255.255.255.0", "UG", "100", "0", "0", "eth0"])
+
+    def test_missing_table(self):
+        self.assertIsNone(load_agent({})['routes']())
+
+
+def frame(payload, compress=False):
+    """One agent frame as main() writes it"""
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    if compress:
+        data = zlib.compress(data, 6)
+    return b"HNM1 %d%s\n" % (len(data), b" z" if compress else b"") + data
+
+
+class AgentStreamTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def frames(self):
+        return [{'section': 'system', 'title': "System Information", 'items': [["Hostname", "web01\n"]],
+                 'elapsed': 0.01},
+                {'section': 'lvm', 'title': "LVM & Storage Information", 'items': [], 'elapsed': 0.2}]
+
+    def test_frames_split_anywhere(self):
+        data = b"".join(frame(payload) for payload in self.frames())
+        for size in (1, 3, 7, len(data)):
+            with self.subTest(chunk=size):
+                stream = self.bot.AgentStream(['system', 'lvm'])
+                for start in range(0, len(data), size):
+                    stream.feed('stdout', data[start:start + size])
+                self.assertEqual([stream.futures[name].result() for name in ('system', 'lvm')], self.frames())
+
+    def test_split_header(self):
+        stream = self.bot.AgentStream(['system'])
+        data = frame(self.frames()[0])
+        header = data.index(b"\n")
+        stream.feed('stdout', data[:3])
+        stream.feed('stdout', data[3:header])
+        self.assertFalse(stream.futures['system'].done())
+        stream.feed('stdout', data[header:-1])
+        self.assertFalse(stream.futures['system'].done())
+        stream.feed('stdout', data[-1:])
+        self.assertEqual(stream.futures['system'].result(), self.frames()[0])
+
+    def test_compressed_frames(self):
+        stream = self.bot.AgentStream(['system', 'lvm'], compress=True)
+        wire = [frame(payload, compress=True) for payload in self.frames()]
+        for data in wire:
+            stream.feed('stdout', data)
+        self.assertEqual(stream.futures['lvm'].result(), self.frames()[1])
+        size, wire_size = stream.frame_bytes['system']
+        self.assertEqual(size, len(json.dumps(self.frames()[0], separators=(',', ':'))))
+        self.assertEqual(wire_size, len(wire[0]) - wire[0].index(b"\n") - 1)
+
+    def test_truncated_stream(self):
+        stream = self.bot.AgentStream(['system', 'lvm'])
+        stream.feed('stderr', b"HNM1 5\nnoise")
+        stream.feed('stdout', frame(self.frames()[0]) + frame(self.frames()[1])[:-4])
+        self.assertTrue(stream.futures['system'].done())
+        self.assertFalse(stream.futures['lvm'].done())
+        stream.finish(self.bot.CommandResult("Command timed out after 60 seconds\n", -1, timed_out=True))
+        lvm = stream.futures['lvm'].result()
+        self.assertTrue(lvm['ended'])
+        self.assertTrue(lvm['timed_out'])
+        self.assertEqual(lvm['error'], "Command timed out after 60 seconds")
+        self.assertEqual(stream.futures['system'].result(), self.frames()[0])
+
+    def test_real_agent_output(self):
+        stream = self.bot.AgentStream(['system', 'nosuch'], compress=True)
+        output = subprocess.run([sys.executable, '-', '-z', 'system', 'nosuch'],
+                                input=self.bot.AGENT_SOURCE.encode(), stdout=subprocess.PIPE, timeout=60).stdout
+        for start in range(0, len(output), 100):
+            stream.feed('stdout', output[start:start + 100])
+        system = stream.futures['system'].result()
+        self.assertEqual(system['title'], "System Information")
+        self.assertTrue(system['items'])
+        self.assertIn('error', stream.futures['nosuch'].result())
+
+
+if __name__ == '__main__':
+    unittest.main()
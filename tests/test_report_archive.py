@@ -0,0 +1,96 @@
+"""ReportArchive saves from several processes, and the history --since parser"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ReportArchiveTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def archive(self):
+        return self.bot.ReportArchive(self.root, "host1")
+
+    def test_interleaved_saves(self):
+        first, second = self.archive(), self.archive()
+
+        def sections():
+            yield 'system', "first system\n"
+            # Another process saves a whole report while this one is collecting
+            second.save(datetime(2024, 1, 1, 12, 0, 1), [('system', "second system\n"), ('lvm', "lvm\n")])
+            yield 'lvm', "first lvm\n"
+
+        snapshot, new = first.save(datetime(2024, 1, 1, 12, 0, 0), sections())
+        self.assertEqual(new, 2)
+        snapshots = self.archive().snapshots()
+        self.assertEqual([s['generated'] for s in snapshots], ['2024-01-01T12:00:01', '2024-01-01T12:00:00'])
+        self.assertEqual(snapshots[1], snapshot)
+        reader = self.archive()
+        texts = [reader.section(digest) for s in snapshots for name, digest in s['sections']]
+        self.assertEqual(texts, ["second system\n", "lvm\n", "first system\n", "first lvm\n"])
+
+    def test_unchanged_sections_stored_once(self):
+        archive = self.archive()
+        archive.save(datetime(2024, 1, 1), [('system', "same\n")])
+        snapshot, new = archive.save(datetime(2024, 1, 2), [('system', "same\n")])
+        self.assertEqual(new, 0)
+        self.assertEqual(len(self.archive().snapshots()), 2)
+
+    def test_save_after_torn_index_line(self):
+        archive = self.archive()
+        archive.save(datetime(2024, 1, 1), [('system', "one\n")])
+        with open(archive.index_file, 'a') as index:
+            index.write('{"host": "host1", "rep')
+        self.archive().save(datetime(2024, 1, 2), [('system', "two\n")])
+        snapshots = self.archive().snapshots()
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual(self.archive().section(snapshots[1]['sections'][0][1]), "two\n")
+
+
+class ParseSinceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def test_relative(self):
+        for value, delta in (('45m', timedelta(minutes=45)), ('12h', timedelta(hours=12)),
+                             ('30d', timedelta(days=30)), ('2w', timedelta(weeks=2))):
+            with self.subTest(value=value):
+                before = datetime.now()
+                since = self.bot.parse_since(value)
+                after = datetime.now()
+                self.assertTrue(before - delta <= since <= after - delta)
+
+    def test_date(self):
+        self.assertEqual(self.bot.parse_since('2024-01-31'), datetime(2024, 1, 31))
+
+    def test_invalid(self):
+        for value in ('30', '3y', 'd30', '2024-13-01', '31/01/2024', ''):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    self.bot.parse_since(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""RingBuffer history used by the watch sampler"""
+
+import importlib.util
+import os
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class RingBufferTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def filled(self, capacity, values):
+        ring = self.bot.RingBuffer(capacity)
+        for value in values:
+            ring.append(float(value))
+        return ring
+
+    def test_partly_filled(self):
+        ring = self.filled(5, [1, 2, 3])
+        self.assertEqual(ring.count, 3)
+        self.assertEqual(ring.last(10), [1.0, 2.0, 3.0])
+        self.assertEqual(ring.last(2), [2.0, 3.0])
+        self.assertEqual(ring.last(0), [])
+
+    def test_exactly_full(self):
+        ring = self.filled(4, [1, 2, 3, 4])
+        self.assertEqual(ring.head, 0)
+        self.assertEqual(ring.last(4), [1.0, 2.0, 3.0, 4.0])
+
+    def test_wraparound(self):
+        ring = self.filled(4, range(1, 11))
+        self.assertEqual((ring.count, ring.head), (4, 2))
+        self.assertEqual(ring.last(2), [9.0, 10.0])
+        # These windows cross the end of the array
+        self.assertEqual(ring.last(4), [7.0, 8.0, 9.0, 10.0])
+        self.assertEqual(ring.last(3), [8.0, 9.0, 10.0])
+        self.assertEqual(ring.last(100), [7.0, 8.0, 9.0, 10.0])
+
+    def test_every_window_after_many_laps(self):
+        capacity = 7
+        values = list(range(50))
+        ring = self.filled(capacity, values)
+        for n in range(capacity + 1):
+            with self.subTest(n=n):
+                self.assertEqual(ring.last(n), [float(v) for v in values[len(values) - n:]])
+
+
+if __name__ == '__main__':
+    unittest.main()
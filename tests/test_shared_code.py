@@ -0,0 +1,46 @@
+"""Code the two bots carry as copies must stay identical"""
+
+import importlib.util
+import inspect
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+REMOTE_PATH = os.path.join(ROOT, 'hnm_remote_bot_production', 'hnm_remote_bot.py')
+
+# CommandResult and CommandStats differ on purpose: only the remote bot
+# sees compressed output, so only it tracks wire bytes
+SHARED = (
+    'MemInfo', 'parse_meminfo', 'Record', 'DiskUsage', 'MemoryUsage', 'SocketEntry', 'ProcessEntry',
+    'BlockDevice', 'PhysicalVolume', 'VolumeGroup', 'LogicalVolume', 'UptimeStatus',
+    '_to_int', '_to_float', '_split_address', 'parse_df', 'parse_ss', 'parse_ps', 'parse_lsblk',
+    'parse_lvm', 'write_records', 'write_text_result',
+    '_import_asyncio', 'CommandEngine', 'archive_codec', 'parse_since', 'ReportArchive',
+)
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # inspect finds class sources through sys.modules
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class SharedCodeTest(unittest.TestCase):
+
+    def test_copies_match(self):
+        local = load_module("hnm_shared_local", LOCAL_PATH)
+        remote = load_module("hnm_shared_remote", REMOTE_PATH)
+        for name in SHARED:
+            with self.subTest(name=name):
+                self.assertEqual(inspect.getsource(getattr(local, name)),
+                                 inspect.getsource(getattr(remote, name)),
+                                 f"{name} differs between the bots")
+
+
+if __name__ == '__main__':
+    unittest.main()
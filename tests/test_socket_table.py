@@ -0,0 +1,56 @@
+"""decode_address for /proc/net socket table addresses"""
+
+import importlib.util
+import os
+import socket
+import struct
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_local_bot_production', 'hnm_linux_bot.py')
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_linux_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def proc_hex(family, address):
+    """address as the kernel prints it: 32-bit words in host byte order"""
+    packed = socket.inet_pton(family, address)
+    words = struct.unpack('=%dI' % (len(packed) // 4), packed)
+    return "".join("%08X" % word for word in words)
+
+
+class DecodeAddressTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def test_ipv4(self):
+        for address in ("127.0.0.1", "192.168.10.254", "0.0.0.0"):
+            with self.subTest(address=address):
+                self.assertEqual(self.bot.decode_address(proc_hex(socket.AF_INET, address)), address)
+
+    def test_ipv6(self):
+        for address in ("::1", "2001:db8::7:1", "fe80::fc:ff:fe00:1", "::"):
+            with self.subTest(address=address):
+                self.assertEqual(self.bot.decode_address(proc_hex(socket.AF_INET6, address)), address)
+
+    def test_ipv4_mapped_ipv6_shows_ipv4(self):
+        self.assertEqual(self.bot.decode_address(proc_hex(socket.AF_INET6, "::ffff:10.0.0.5")), "10.0.0.5")
+
+    @unittest.skipUnless(sys.byteorder == 'little', "literal /proc/net lines of a little-endian host")
+    def test_little_endian_proc_lines(self):
+        # From /proc/net/tcp and tcp6 on x86_64
+        self.assertEqual(self.bot.decode_address("0100007F"), "127.0.0.1")
+        self.assertEqual(self.bot.decode_address("00000000000000000000000001000000"), "::1")
+        self.assertEqual(self.bot.decode_address("0000000000000000FFFF00000100007F"), "127.0.0.1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""TransferMeter bandwidth from output arrival times"""
+
+import importlib.util
+import os
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_PATH = os.path.join(ROOT, 'hnm_remote_bot_production', 'hnm_remote_bot.py')
+
+KIB = 1024
+
+
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location("hnm_remote_bot", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TransferMeterTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = load_bot_module()
+
+    def setUp(self):
+        self.clock = Clock()
+        self.seen = []
+
+    def meter(self, boundary=None):
+        return self.bot.TransferMeter(lambda name, chunk: self.seen.append((name, chunk)),
+                                      boundary, clock=self.clock)
+
+    def stream(self, meter, chunks, interval):
+        for chunk in chunks:
+            meter.feed('stdout', chunk)
+            self.clock.now += interval
+
+    def test_steady_stream(self):
+        meter = self.meter()
+        # 9 chunks of 16 KiB, 0.1 s apart: the 8 after the first took 0.8 s
+        self.stream(meter, [b"x" * 16 * KIB] * 9, 0.1)
+        self.assertAlmostEqual(meter.bandwidth(), 128 * KIB / 0.8, delta=1)
+
+    def test_passes_output_on(self):
+        meter = self.meter()
+        meter.feed('stdout', b"out")
+        meter.feed('stderr', b"err")
+        self.assertEqual(self.seen, [('stdout', b"out"), ('stderr', b"err")])
+
+    def test_small_output_says_nothing(self):
+        meter = self.meter()
+        self.stream(meter, [b"x" * KIB] * 10, 0.1)
+        self.assertIsNone(meter.bandwidth())
+
+    def test_pause_splits_bursts(self):
+        meter = self.meter()
+        # A command running for 5 s between two fast bursts does not count as transfer time
+        self.stream(meter, [b"x" * 16 * KIB] * 9, 0.01)
+        self.clock.now += 5
+        self.stream(meter, [b"x" * 16 * KIB] * 9, 0.01)
+        self.assertAlmostEqual(meter.bandwidth(), 128 * KIB / 0.08, delta=1)
+
+    def test_fastest_burst_wins(self):
+        meter = self.meter()
+        self.stream(meter, [b"x" * 16 * KIB] * 9, 0.2)
+        self.clock.now += 5
+        self.stream(meter, [b"x" * 16 * KIB] * 9, 0.1)
+        self.assertAlmostEqual(meter.bandwidth(), 128 * KIB / 0.8, delta=1)
+
+    def test_boundary_splits_commands(self):
+        meter = self.meter(b"\nHNM-1 begin ")
+        # Two 60 KiB outputs sent back to back: neither alone is a full sample
+        self.stream(meter, [b"\nHNM-1 begin 0\n"] + [b"x" * 12 * KIB] * 5, 0.1)
+        self.stream(meter, [b"\nHNM-1 begin 1\n"] + [b"x" * 12 * KIB] * 5, 0.1)
+        self.assertIsNone(meter.bandwidth())
+        unsplit = self.meter()
+        self.stream(unsplit, [b"\nHNM-1 begin 0\n"] + [b"x" * 12 * KIB] * 5, 0.1)
+        self.stream(unsplit, [b"\nHNM-1 begin 1\n"] + [b"x" * 12 * KIB] * 5, 0.1)
+        self.assertIsNotNone(unsplit.bandwidth())
+
+    def test_boundary_split_across_chunks(self):
+        meter = self.meter(b"\nHNM-1 begin ")
+        self.stream(meter, [b"\nHNM-1 begin 0\n"] + [b"x" * 12 * KIB] * 5 + [b"\nHNM-1 be"], 0.1)
+        self.stream(meter, [b"gin 1\n"] + [b"x" * 12 * KIB] * 5, 0.1)
+        self.assertIsNone(meter.bandwidth())
+
+
+if __name__ == '__main__':
+    unittest.main()